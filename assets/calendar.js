@@ -0,0 +1,507 @@
+/*
+ * Client-side Dashboard calendar (CALENDAR_RENDERING = 'client', see
+ * pages/Dashboard.py). The server sends compact columnar entries per date
+ * range (backend.calendar_cache.calendar_payload); these callbacks keep
+ * them in the calendar-range-cache store and build the same day/week/month
+ * grid calendar_view renders on the server, as Dash components, so entry
+ * buttons still open the entry modal. Ranges already in the store render
+ * without a server round trip. benchmarks/bench_calendar_render.py checks
+ * that these views match calendar_view's.
+ */
+(function () {
+    'use strict';
+
+    const DAY_MS = 86400000;
+    const MAX_RANGES = 36;  // ranges kept in the store, oldest dropped first
+    const DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'];
+    const MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                    'August', 'September', 'October', 'November', 'December'];
+    const TIME_STYLE = {'fontWeight': 'bold', 'fontSize': '11px', 'color': '#1976d2', 'marginRight': '8px'};
+    const TODAY_BUTTON_STYLE = {'padding': '6px 12px', 'cursor': 'pointer', 'verticalAlign': 'middle'};
+
+    // Dates are UTC midnights so day arithmetic never crosses a DST change
+    function parseDate(text) {
+        const [y, m, d] = text.split('-').map(Number);
+        return new Date(Date.UTC(y, m - 1, d));
+    }
+
+    function isoDate(dt) {
+        return dt.toISOString().slice(0, 10);
+    }
+
+    function addDays(dt, days) {
+        return new Date(dt.getTime() + days * DAY_MS);
+    }
+
+    function today() {
+        const now = new Date();
+        return new Date(Date.UTC(now.getFullYear(), now.getMonth(), now.getDate()));
+    }
+
+    function weekday(dt) {  // Monday = 0, as in Python
+        return (dt.getUTCDay() + 6) % 7;
+    }
+
+    function pad(n) {
+        return String(n).padStart(2, '0');
+    }
+
+    // Same ranges and navigation as backend.calendar_cache
+    function calendarRange(viewMode, base) {
+        if (viewMode === 'day') {
+            return [base, base];
+        }
+        if (viewMode === 'week') {
+            const start = addDays(base, -weekday(base));
+            return [start, addDays(start, 6)];
+        }
+        return [new Date(Date.UTC(base.getUTCFullYear(), base.getUTCMonth(), 1)),
+                new Date(Date.UTC(base.getUTCFullYear(), base.getUTCMonth() + 1, 0))];
+    }
+
+    function shiftDate(viewMode, base, step) {
+        if (viewMode === 'day') {
+            return addDays(base, step);
+        }
+        if (viewMode === 'week') {
+            return addDays(base, 7 * step);
+        }
+        return new Date(Date.UTC(base.getUTCFullYear(), base.getUTCMonth() + step, 1));
+    }
+
+    function rangeKey(range) {
+        return isoDate(range[0]) + '/' + isoDate(range[1]);
+    }
+
+    function isoWeek(dt) {
+        const thursday = addDays(dt, 3 - weekday(dt));
+        return 1 + Math.floor((thursday - Date.UTC(thursday.getUTCFullYear(), 0, 1)) / DAY_MS / 7);
+    }
+
+    // strftime equivalents of the formats calendar_view uses
+    function longDate(dt) {  // %A, %B %d, %Y
+        return DAYS[weekday(dt)] + ', ' + MONTHS[dt.getUTCMonth()] + ' ' + pad(dt.getUTCDate()) +
+            ', ' + dt.getUTCFullYear();
+    }
+
+    function shortDate(dt) {  // %b %d
+        return MONTHS[dt.getUTCMonth()].slice(0, 3) + ' ' + pad(dt.getUTCDate());
+    }
+
+    function cacheValid(cache, userId, refresh) {
+        return Boolean(cache && cache.ranges && cache.user_id === userId &&
+                       cache.refresh === (refresh || 0));
+    }
+
+    function h(type, props, children) {
+        props = Object.assign({}, props);
+        if (children !== undefined) {
+            props.children = children;
+        }
+        return {namespace: 'dash_html_components', type: type, props: props};
+    }
+
+    function entryStyle(entryType) {  // get_entry_style
+        return {
+            'backgroundColor': 'white',
+            'color': entryType === 'symptom' ? '#ef5350' : '#64b5f6',
+            'border': entryType === 'symptom' ? '1px solid #ef9a9a' : '1px solid #64b5f6',
+            'display': 'block',
+            'margin': '2px',
+            'padding': '5px',
+            'fontSize': '10px',
+            'cursor': 'pointer',
+            'textAlign': 'left'
+        };
+    }
+
+    function entryButton(entry, content, style) {
+        return h('Button', {
+            id: {'type': 'entry', 'entry_type': entry.type, 'entry_id': entry.id},
+            style: style
+        }, content);
+    }
+
+    function todayButton() {
+        return h('Button', {id: 'calendar-today-btn', n_clicks: 0, style: TODAY_BUTTON_STYLE}, 'Today');
+    }
+
+    function parseTime(text) {
+        const parts = String(text).split(':').map(Number);
+        return parts.length === 2 && !isNaN(parts[0]) && !isNaN(parts[1]) ? parts : [0, 0];
+    }
+
+    /*
+     * Entries of a payload by ISO date, in calendar_view's order: meals
+     * (foods joined, in order of first food), then single foods, then symptoms.
+     */
+    function groupPayload(payload) {
+        const start = parseDate(payload.start);
+        const days = {};
+        function day(offset) {
+            return days[offset] || (days[offset] = {meals: new Map(), foods: [], symptoms: []});
+        }
+        const foods = payload.foods;
+        for (let i = 0; i < foods.id.length; i++) {
+            const entries = day(foods.day[i]);
+            const mealId = foods.meal[i];
+            if (mealId) {
+                let meal = entries.meals.get(mealId);
+                if (!meal) {
+                    meal = {type: 'meal', id: mealId, names: [], time: foods.time[i]};
+                    entries.meals.set(mealId, meal);
+                }
+                meal.names.push(foods.name[i]);
+            } else {
+                entries.foods.push({type: 'food', id: foods.id[i], name: foods.name[i], time: foods.time[i]});
+            }
+        }
+        const symptoms = payload.symptoms;
+        for (let i = 0; i < symptoms.id.length; i++) {
+            day(symptoms.day[i]).symptoms.push(
+                {type: 'symptom', id: symptoms.id[i], name: symptoms.name[i], time: symptoms.time[i]});
+        }
+        const byDate = {};
+        Object.keys(days).forEach(function (offset) {
+            const entries = days[offset];
+            const meals = Array.from(entries.meals.values()).map(function (meal) {
+                return {type: 'meal', id: meal.id, name: meal.names.join(', '), time: meal.time};
+            });
+            byDate[isoDate(addDays(start, Number(offset)))] = meals.concat(entries.foods, entries.symptoms);
+        });
+        return byDate;
+    }
+
+    function nowLabel(top) {
+        const now = new Date();
+        return h('Span', {style: {
+            'color': '#1976d2', 'fontWeight': 'bold', 'fontSize': '12px', 'position': 'absolute',
+            'left': '0', 'width': '120px', 'textAlign': 'right', 'top': (top - 8) + 'px', 'zIndex': 21
+        }}, pad(now.getHours()) + ':' + pad(now.getMinutes()));
+    }
+
+    function nowLine(left, top, width) {
+        return h('Div', {style: {
+            'position': 'absolute', 'left': left, 'top': top + 'px', 'width': width, 'height': '2px',
+            'backgroundColor': '#1976d2', 'zIndex': 20, 'border': 'none', 'boxShadow': 'none'
+        }});
+    }
+
+    function renderDay(base, entries) {
+        const hourHeight = 90;
+        const entryDurationMinutes = 30;
+        const entryDivs = (entries[isoDate(base)] || []).map(function (entry) {
+            const [hour, minute] = parseTime(entry.time);
+            const symptom = entry.type === 'symptom';
+            const style = Object.assign({
+                'position': 'absolute', 'left': '120px',
+                'top': (hour * hourHeight + (minute / 60) * hourHeight) + 'px',
+                'height': ((entryDurationMinutes / 60) * hourHeight) + 'px',
+                'width': '700px', 'borderRadius': '4px', 'padding': '2px 6px', 'fontSize': '12px',
+                'overflow': 'hidden', 'zIndex': 2, 'boxSizing': 'border-box', 'textAlign': 'left',
+                'background': '#fff', 'border': symptom ? '1px solid #ef9a9a' : '1px solid #64b5f6',
+                'color': symptom ? '#ef5350' : '#64b5f6', 'cursor': 'pointer'
+            }, entryStyle(entry.type));
+            const content = [];
+            if (entry.time !== '00:00') {
+                content.push(h('Span', {style: TIME_STYLE}, entry.time));
+            }
+            content.push(entry.name);
+            return entryButton(entry, content, style);
+        });
+
+        const hourLabels = [];
+        const gridLines = [];
+        for (let hour = 0; hour < 24; hour++) {
+            hourLabels.push(h('Div', {style: {
+                'position': 'absolute', 'top': (hour * hourHeight) + 'px', 'left': '0', 'width': '120px',
+                'color': '#888', 'textAlign': 'right', 'marginRight': '10px', 'lineHeight': '1',
+                'height': '0', 'transform': 'translateY(-50%)'
+            }}, pad(hour) + ':00'));
+            gridLines.push(h('Div', {style: {
+                'position': 'absolute', 'top': (hour * hourHeight) + 'px', 'left': '120px',
+                'width': '700px', 'height': '1px', 'backgroundColor': '#eee', 'zIndex': 1
+            }}));
+        }
+
+        const now = new Date();
+        const isToday = isoDate(base) === isoDate(today());
+        const currentTimeTop = now.getHours() * hourHeight + (now.getMinutes() / 60) * hourHeight;
+        const nowRows = isToday ? [h('Div', {style: {
+            'position': 'absolute', 'left': '0', 'top': '0', 'width': '100%', 'pointerEvents': 'none'
+        }}, [nowLabel(currentTimeTop), nowLine('120px', currentTimeTop, '700px')])] : [];
+
+        return h('Div', {'data-scroll-position': isToday ? Math.floor(currentTimeTop) : 0}, [
+            h('Div', {style: {'textAlign': 'center', 'margin': '16px 0 8px 0'}}, [
+                h('H4', {style: {'display': 'inline-block', 'margin': '0 8px 0 0', 'color': '#1976d2',
+                                 'fontWeight': 'bold'}}, longDate(base)),
+                todayButton()
+            ]),
+            h('Div', {id: 'day-hour-scroll', style: {
+                'width': '850px', 'margin': '0 auto', 'border': '1px solid #eee', 'borderRadius': '8px',
+                'background': '#fff', 'boxShadow': '0 2px 8px #eee', 'overflowY': 'auto',
+                'maxHeight': (hourHeight * 8) + 'px', 'position': 'relative',
+                'height': (hourHeight * 24) + 'px'
+            }}, hourLabels.concat(gridLines, nowRows, entryDivs))
+        ]);
+    }
+
+    function renderWeek(start, end, entries) {
+        const hourHeight = 90;
+        const entryHeight = 44;
+        const todayIso = isoDate(today());
+        const weekDays = [];
+        for (let i = 0; i < 7; i++) {
+            weekDays.push(addDays(start, i));
+        }
+        const dayEntries = weekDays.map(function (day) {
+            return entries[isoDate(day)] || [];
+        });
+        const now = new Date();
+        const currentHour = now.getHours();
+        const currentMinute = now.getMinutes();
+        const isThisWeek = weekDays.some(function (day) { return isoDate(day) === todayIso; });
+
+        const gridRows = [];
+        const rowHeights = [];
+        for (let hour = 0; hour < 24; hour++) {
+            const rowCells = [];
+            // Running maximum over the row, as on the server
+            let maxEntryHeight = 0;
+            dayEntries.forEach(function (all) {
+                const hourEntries = [];
+                all.forEach(function (entry) {
+                    const [entryHour, m] = parseTime(entry.time);
+                    if (entryHour === hour) {
+                        hourEntries.push([m, entry]);
+                    }
+                });
+                hourEntries.sort(function (a, b) { return a[0] - b[0]; });
+                const byMinute = new Map();
+                hourEntries.forEach(function ([m, entry]) {
+                    if (!byMinute.has(m)) {
+                        byMinute.set(m, []);
+                    }
+                    byMinute.get(m).push(entry);
+                });
+                const cellEntries = [];
+                byMinute.forEach(function (group, m) {
+                    const n = group.length;
+                    group.forEach(function (entry, idx) {
+                        const top = (m / 60) * hourHeight;
+                        const style = Object.assign({
+                            'position': 'absolute', 'left': (idx * (100 / n)) + '%', 'top': top + 'px',
+                            'minHeight': entryHeight + 'px', 'width': 'calc(' + (100 / n) + '% - 4px)',
+                            'borderRadius': '4px', 'padding': '4px 6px', 'fontSize': '13px',
+                            'overflow': 'hidden', 'maxWidth': '100%', 'zIndex': 2, 'boxSizing': 'border-box',
+                            'whiteSpace': 'nowrap', 'wordBreak': 'break-word', 'textOverflow': 'ellipsis'
+                        }, entryStyle(entry.type));
+                        const label = entry.time === '00:00' ? 'All day' : entry.time;
+                        cellEntries.push(entryButton(entry, [h('Span', {style: TIME_STYLE}, label), entry.name], style));
+                        maxEntryHeight = Math.max(maxEntryHeight, top + entryHeight);
+                    });
+                });
+                const cellHeight = Math.max(maxEntryHeight > 0 ? hourHeight : 28, Math.floor(maxEntryHeight));
+                rowCells.push(h('Td', {style: {
+                    'verticalAlign': 'top', 'padding': '0', 'border': '1px solid #ddd', 'minWidth': '120px'
+                }}, h('Div', {style: {'position': 'relative', 'height': cellHeight + 'px', 'width': '100%'}},
+                      cellEntries)));
+            });
+            rowHeights.push(Math.max(maxEntryHeight > 0 ? hourHeight : 28, Math.floor(maxEntryHeight)));
+            gridRows.push(h('Tr', {}, [h('Td', {style: {
+                'width': '120px', 'color': '#888', 'textAlign': 'right', 'border': 'none',
+                'paddingRight': '8px', 'verticalAlign': 'top', 'lineHeight': '1', 'position': 'relative',
+                'top': '-1px'
+            }}, pad(hour) + ':00')].concat(rowCells)));
+        }
+
+        function sumHeights(count) {
+            return rowHeights.slice(0, count).reduce(function (a, b) { return a + b; }, 0);
+        }
+
+        let nowRows = [];
+        let scrollPosition = 0;
+        if (isThisWeek) {
+            const nextHeight = currentHour + 1 < rowHeights.length ? rowHeights[currentHour + 1]
+                : rowHeights[rowHeights.length - 1];
+            const blueLineTop = sumHeights(currentHour + 1) + (currentMinute / 60) * nextHeight;
+            nowRows = [h('Tr', {}, [
+                h('Td', {style: {'border': 'none', 'padding': '0', 'width': '120px', 'position': 'relative'}},
+                  nowLabel(blueLineTop)),
+                h('Td', {colSpan: weekDays.length, style: {'position': 'relative', 'padding': '0', 'border': 'none'}},
+                  nowLine('0', blueLineTop, '100%'))
+            ])];
+            scrollPosition = sumHeights(currentHour) + (currentMinute / 60) * rowHeights[currentHour];
+        }
+
+        const headerRow = h('Tr', {}, [h('Th', {style: {'border': 'none', 'width': '120px'}}, '')].concat(
+            weekDays.map(function (day) {
+                return h('Th', {style: {
+                    'textAlign': 'center', 'color': isoDate(day) === todayIso ? '#1976d2' : 'inherit',
+                    'minWidth': '120px'
+                }}, DAYS[weekday(day)].slice(0, 3) + ', ' + shortDate(day));
+            })));
+        const weekTitle = h('Div', {style: {'position': 'relative', 'textAlign': 'center', 'margin': '16px 0 8px 0'}}, [
+            h('Div', {style: {'position': 'absolute', 'left': '60px', 'top': '50%', 'transform': 'translateY(-50%)'}}, [
+                h('Span', {style: {
+                    'display': 'inline-block', 'width': '32px', 'height': '32px', 'lineHeight': '32px',
+                    'borderRadius': '50%', 'backgroundColor': '#1976d2', 'color': 'white',
+                    'fontWeight': 'bold', 'fontSize': '14px', 'textAlign': 'center'
+                }}, String(isoWeek(start)))
+            ]),
+            h('H4', {style: {'display': 'inline-block', 'margin': '0 8px 0 0', 'color': '#1976d2', 'fontWeight': 'bold'}},
+              shortDate(start) + ' - ' + shortDate(end) + ', ' + end.getUTCFullYear()),
+            todayButton()
+        ]);
+        return h('Div', {'data-scroll-position': isThisWeek ? Math.floor(scrollPosition) : 0}, [
+            weekTitle,
+            h('Table', {id: 'week-table', style: {
+                'width': '100%', 'borderCollapse': 'collapse', 'margin': '0 auto', 'tableLayout': 'fixed',
+                'position': 'relative'
+            }}, [h('Thead', {}, [headerRow]), h('Tbody', {}, nowRows.concat(gridRows))])
+        ]);
+    }
+
+    function renderMonth(base, entries) {
+        const year = base.getUTCFullYear();
+        const month = base.getUTCMonth();
+        const now = today();
+        const thisMonth = now.getUTCFullYear() === year && now.getUTCMonth() === month;
+        const todayDay = thisMonth ? now.getUTCDate() : 0;
+
+        // calendar.monthcalendar: Monday-first weeks, 0 outside the month
+        const days = [];
+        for (let i = 0; i < weekday(new Date(Date.UTC(year, month, 1))); i++) {
+            days.push(0);
+        }
+        const lastDay = new Date(Date.UTC(year, month + 1, 0)).getUTCDate();
+        for (let day = 1; day <= lastDay; day++) {
+            days.push(day);
+        }
+        while (days.length % 7) {
+            days.push(0);
+        }
+
+        function cell(day) {
+            const style = {'height': '120px', 'verticalAlign': 'top', 'padding': '5px',
+                           'border': day && day === todayDay ? '1.5px solid #1976d2' : '1px solid #ddd',
+                           'width': '14.28%'};
+            if (day === 0) {
+                return h('Td', {style: style}, ['', '']);
+            }
+            const dayEntries = (entries[year + '-' + pad(month + 1) + '-' + pad(day)] || []).slice();
+            // Stable sort by time string, like sorted(..., key=time)
+            dayEntries.sort(function (a, b) { return a.time < b.time ? -1 : a.time > b.time ? 1 : 0; });
+            const cards = dayEntries.map(function (entry) {
+                const content = [];
+                if (entry.time !== '00:00') {
+                    content.push(h('Span', {style: TIME_STYLE}, entry.time));
+                }
+                content.push(entry.name);
+                return entryButton(entry, content, entryStyle(entry.type));
+            });
+            return h('Td', {style: style}, [
+                h('Div', {style: {'fontWeight': 'bold', 'marginBottom': '5px',
+                                  'color': day === todayDay ? '#1976d2' : 'inherit'}}, String(day)),
+                h('Div', {style: {'display': 'flex', 'flexDirection': 'column', 'gap': '2px'}}, cards)
+            ]);
+        }
+
+        const weeks = [];
+        for (let i = 0; i < days.length; i += 7) {
+            weeks.push(h('Tr', {}, days.slice(i, i + 7).map(cell)));
+        }
+        return h('Div', {}, [
+            h('Div', {style: {'textAlign': 'center', 'margin': '8px 0 8px 0'}}, [
+                h('H4', {style: {'display': 'inline-block', 'margin': '0 8px 0 0', 'color': '#1976d2',
+                                 'fontWeight': 'bold'}}, MONTHS[month] + ' ' + year),
+                todayButton()
+            ]),
+            h('Table', {style: {'width': '80%', 'borderCollapse': 'collapse', 'margin': '0 auto',
+                                'tableLayout': 'fixed'}}, [
+                h('Thead', {}, h('Tr', {}, DAYS.map(function (name, idx) {
+                    return h('Th', {style: {
+                        'textAlign': 'center', 'width': '14.28%',
+                        'color': thisMonth && idx === weekday(now) ? '#1976d2' : 'inherit'
+                    }}, name.slice(0, 3));
+                }))),
+                h('Tbody', {}, weeks)
+            ])
+        ]);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        calendar: {
+            // A new view mode jumps to today
+            switchView: function (viewMode, previousViewMode) {
+                const noUpdate = window.dash_clientside.no_update;
+                if (viewMode === previousViewMode) {
+                    return [noUpdate, noUpdate];
+                }
+                return [isoDate(today()), viewMode];
+            },
+
+            // Ask the server for the visible and adjacent ranges not in the store yet
+            request: function (viewMode, calendarDate, refresh, userId, cache) {
+                const noUpdate = window.dash_clientside.no_update;
+                if (!userId) {
+                    return noUpdate;
+                }
+                const base = calendarDate ? parseDate(calendarDate) : today();
+                const valid = cacheValid(cache, userId, refresh);
+                const missing = [base, shiftDate(viewMode, base, -1), shiftDate(viewMode, base, 1)]
+                    .map(function (day) { return calendarRange(viewMode, day); })
+                    .filter(function (range) { return !(valid && cache.ranges[rangeKey(range)]); })
+                    .map(function (range) { return [isoDate(range[0]), isoDate(range[1])]; });
+                if (!missing.length) {
+                    return noUpdate;
+                }
+                return {user_id: userId, refresh: refresh || 0, ranges: missing};
+            },
+
+            // Add fetched ranges to the store; a new user or refresh starts over
+            merge: function (response, cache) {
+                if (!response) {
+                    return window.dash_clientside.no_update;
+                }
+                const valid = cacheValid(cache, response.user_id, response.refresh);
+                const ranges = Object.assign({}, valid ? cache.ranges : {}, response.ranges);
+                const keys = Object.keys(ranges);
+                keys.slice(0, Math.max(keys.length - MAX_RANGES, 0)).forEach(function (key) {
+                    delete ranges[key];
+                });
+                return {user_id: response.user_id, refresh: response.refresh, ranges: ranges,
+                        added: Object.keys(response.ranges)};
+            },
+
+            render: function (cache, calendarDate, viewMode, refresh, userId, scrollTrigger) {
+                const noUpdate = window.dash_clientside.no_update;
+                if (!cacheValid(cache, userId, refresh)) {
+                    return [noUpdate, noUpdate];  // keep the old view until fresh data arrives
+                }
+                const base = calendarDate ? parseDate(calendarDate) : today();
+                const range = calendarRange(viewMode, base);
+                const key = rangeKey(range);
+                const payload = cache.ranges[key];
+                const triggered = window.dash_clientside.callback_context.triggered.map(function (t) {
+                    return t.prop_id;
+                });
+                // Only prefetched neighbours arrived: the visible range is unchanged
+                if (!payload || (triggered.length === 1 && triggered[0] === 'calendar-range-cache.data' &&
+                                 (cache.added || []).indexOf(key) < 0)) {
+                    return [noUpdate, noUpdate];
+                }
+                const entries = groupPayload(payload);
+                let view;
+                if (viewMode === 'day') {
+                    view = renderDay(base, entries);
+                } else if (viewMode === 'week') {
+                    view = renderWeek(range[0], range[1], entries);
+                } else {
+                    view = renderMonth(base, entries);
+                }
+                return [view, (scrollTrigger || 0) + 1];
+            }
+        }
+    });
+})();
@@ -0,0 +1,232 @@
+"""
+Symptom exposure analysis for FoodSymptoms app.
+Joins every symptom occurrence to the foods eaten in the window before it
+and aggregates ingredient/food exposure through a per-user sparse
+entry x ingredient matrix instead of re-filtering the user's full history
+once per symptom.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from datetime import timedelta
+
+EXPOSURE_WINDOW = timedelta(hours=24)  # Look-back window before each symptom
+
+
+def window_join(event_times, entry_times, window=EXPOSURE_WINDOW):
+    """
+    Pair each event with the entries that fall in [event - window, event).
+
+    entry_times must be sorted ascending. Uses two binary searches per event
+    to find the window bounds, then expands the bounds into index pairs.
+    Returns (event_idx, entry_idx) integer arrays.
+    """
+    event_times = np.asarray(event_times, dtype='datetime64[ns]')
+    entry_times = np.asarray(entry_times, dtype='datetime64[ns]')
+    window = np.timedelta64(pd.Timedelta(window).value, 'ns')
+
+    lo = np.searchsorted(entry_times, event_times - window, side='left')
+    hi = np.searchsorted(entry_times, event_times, side='left')
+    counts = hi - lo
+    counts[np.isnat(event_times)] = 0  # NaT never matches anything
+
+    event_idx = np.repeat(np.arange(len(event_times)), counts)
+    starts = np.cumsum(counts) - counts
+    entry_idx = np.repeat(lo, counts) + (np.arange(counts.sum()) - np.repeat(starts, counts))
+    return event_idx, entry_idx
+
+
+def time_slice(frame, start, end, column='datetime'):
+    """Rows of a frame sorted by `column` with start <= time < end (binary search)"""
+    times = frame[column].to_numpy(dtype='datetime64[ns]')
+    lo, hi = np.searchsorted(times, np.array([start, end], dtype='datetime64[ns]'), side='left')
+    return frame.iloc[lo:hi]
+
+
+def food_ingredient_names(ingredients, subingredients):
+    """
+    Flatten ingredient and subingredient rows into one (fdc_id, name_id,
+    name) table, as the cached food_ingredients frame holds it (from
+    "food_ingredient_set"). Rows are unique per kind, so a name that is both
+    an ingredient and a subingredient of the same food appears twice.
+    """
+    ing_names = ingredients[['fdc_id', 'name_id', 'ingredient']].rename(
+        columns={'ingredient': 'name'}).drop_duplicates(['fdc_id', 'name_id'])
+    sub_names = subingredients[['ingredient_id', 'name_id', 'sub_ingredient']].merge(
+        ingredients[['id', 'fdc_id']], left_on='ingredient_id', right_on='id', how='inner'
+    )[['fdc_id', 'name_id', 'sub_ingredient']].rename(
+        columns={'sub_ingredient': 'name'}).drop_duplicates(['fdc_id', 'name_id'])
+    return pd.concat([ing_names, sub_names], ignore_index=True)
+
+
+class ExposureMatrix:
+    """
+    Sparse per-user exposure matrix, built once from the get_user_data frames.
+
+    Rows are the user's food log entries sorted by time.
+    - ingredients: one column per ingredient/subingredient name (grouped by
+      integer name_id, see migrations/004_ingredient_name.sql); a cell counts
+      whether the entry's food lists the name as an ingredient and/or as a
+      subingredient, so column sums equal the per-kind consumption totals
+    - foods: one column per food description
+
+    Exposure counts for a window are a single sparse matrix-vector product.
+    """
+
+    def __init__(self, food_entries, foods, food_ingredients):
+        times = food_entries['datetime'].to_numpy(dtype='datetime64[ns]')
+        if food_entries['datetime'].is_monotonic_increasing:  # cached frames are pre-sorted
+            order = np.arange(len(times))
+        else:
+            order = np.argsort(times, kind='stable')
+        self.times = times[order]
+        n_entries = len(order)
+        rows = np.arange(n_entries)
+
+        # Entry -> food (fdc_id) incidence
+        fdc_codes, self.fdc_ids = pd.factorize(food_entries['fdc_id'].to_numpy()[order])
+        n_fdc = len(self.fdc_ids)
+        self.entry_foods = sparse.csr_matrix(
+            (np.ones(n_entries, dtype=np.int32), (rows, fdc_codes)), shape=(n_entries, n_fdc))
+
+        descriptions = foods.drop_duplicates('fdc_id').set_index('fdc_id')['description']
+        self.fdc_descriptions = descriptions.reindex(self.fdc_ids).to_numpy(dtype=object)
+
+        # Entry -> food description incidence (foods are reported by description)
+        desc_codes, self.food_names = pd.factorize(self.fdc_descriptions[fdc_codes])
+        known = desc_codes >= 0
+        self.foods = sparse.csr_matrix(
+            (np.ones(known.sum(), dtype=np.int32), (rows[known], desc_codes[known])),
+            shape=(n_entries, len(self.food_names)))
+
+        # Food -> ingredient name matrix; ingredient and subingredient hits add up
+        names = food_ingredients
+        food_codes = pd.Index(self.fdc_ids).get_indexer(names['fdc_id'])
+        names = names[food_codes >= 0]
+        food_codes = food_codes[food_codes >= 0]
+        name_codes, name_ids = pd.factorize(names['name_id'].to_numpy())
+        _, first = np.unique(name_codes, return_index=True)  # first row of each name
+        self.ingredient_names = names['name'].to_numpy(dtype=object)[first]
+        self.food_ingredients = sparse.csr_matrix(
+            (np.ones(len(names), dtype=np.int32), (food_codes, name_codes)),
+            shape=(n_fdc, len(self.ingredient_names)))
+
+        self.ingredients = (self.entry_foods @ self.food_ingredients).tocsr()
+        self.ingredient_totals = np.asarray(self.ingredients.sum(axis=0)).ravel()
+        self.food_totals = np.asarray(self.foods.sum(axis=0)).ravel()
+
+    @classmethod
+    def from_user_data(cls, user_data):
+        return cls(user_data['food_log_entries'], user_data['foods'], user_data['food_ingredients'])
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the matrices and lookup arrays"""
+        total = self.times.nbytes + self.ingredient_totals.nbytes + self.food_totals.nbytes
+        for m in (self.entry_foods, self.foods, self.food_ingredients, self.ingredients):
+            total += m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+        for labels in (self.fdc_ids, self.fdc_descriptions, self.food_names, self.ingredient_names):
+            total += int(pd.Index(labels).memory_usage(deep=True))
+        return total
+
+    def window_vector(self, start, end):
+        """0/1 vector over entries with start <= time < end"""
+        lo, hi = np.searchsorted(
+            self.times, np.array([start, end], dtype='datetime64[ns]'), side='left')
+        w = np.zeros(len(self.times), dtype=np.int32)
+        w[lo:hi] = 1
+        return w
+
+    def exposure_counts(self, start, end):
+        """Number of entries in [start, end) containing each ingredient name"""
+        return self.ingredients.T @ self.window_vector(start, end)
+
+    def window_matrix(self, event_times, window=EXPOSURE_WINDOW):
+        """Sparse events x entries matrix marking the entries in each event's window"""
+        event_idx, entry_idx = window_join(event_times, self.times, window)
+        return sparse.csr_matrix(
+            (np.ones(len(event_idx), dtype=np.int32), (event_idx, entry_idx)),
+            shape=(len(event_times), len(self.times)))
+
+
+def _exposed(counts):
+    """Binarize a sparse count matrix and count nonzeros per column"""
+    counts = counts.tocsr()
+    counts.data[:] = 1
+    return np.asarray(counts.sum(axis=0)).ravel()
+
+
+def compute_symptom_exposures(symptom_logs, matrix, window=EXPOSURE_WINDOW, detail_limit=None):
+    """
+    Compute what each symptom occurrence was exposed to in the preceding window.
+
+    symptom_logs needs datetime, severity and notes columns.
+    detail_limit caps how many symptom_details are built (None builds all).
+
+    Returns dict with:
+    - ingredient_frequency: {ingredient: number of symptoms it preceded}
+    - food_frequency: {food description: number of symptoms it preceded}
+    - symptom_details: per-symptom dicts (in symptom_logs order) with the
+      ingredients consumed and which foods they came from
+    - ingredient_stats / food_stats: DataFrames with before-symptom counts,
+      total consumption and correlation rate
+    """
+    n_symptoms = len(symptom_logs)
+    windows = matrix.window_matrix(
+        symptom_logs['datetime'].to_numpy(dtype='datetime64[ns]'), window)
+
+    ingredient_freq = _exposed(windows @ matrix.ingredients)
+    food_freq = _exposed(windows @ matrix.foods)
+
+    # Correlation: times before symptom / total times consumed
+    hit = ingredient_freq > 0
+    ingredient_total = np.maximum(matrix.ingredient_totals[hit], ingredient_freq[hit])
+    ingredient_stats = pd.DataFrame({
+        'ingredient': matrix.ingredient_names[hit],
+        'times_before_symptom': ingredient_freq[hit],
+        'total_occurrences': n_symptoms,
+        'percentage': ingredient_freq[hit] / n_symptoms * 100,
+        'total_consumed': ingredient_total,
+        'correlation_rate': ingredient_freq[hit] / ingredient_total * 100,
+    })
+
+    hit = food_freq > 0
+    food_total = matrix.food_totals[hit]
+    food_stats = pd.DataFrame({
+        'food': matrix.food_names[hit],
+        'times_before_symptom': food_freq[hit],
+        'total_consumed': food_total,
+        'correlation_rate': food_freq[hit] / food_total * 100,
+    })
+
+    # Details: walk each symptom's window rows back to foods and their ingredients
+    n_details = n_symptoms if detail_limit is None else min(detail_limit, n_symptoms)
+    window_foods = (windows[:n_details] @ matrix.entry_foods).tocsr()
+    food_ingredients = matrix.food_ingredients
+    symptom_details = []
+    for i, (symptom_datetime, severity, notes) in enumerate(zip(
+            symptom_logs['datetime'][:n_details], symptom_logs['severity'][:n_details],
+            symptom_logs['notes'][:n_details])):
+        ingredient_to_foods = {}
+        for food in window_foods.indices[window_foods.indptr[i]:window_foods.indptr[i + 1]]:
+            description = matrix.fdc_descriptions[food]
+            names = food_ingredients.indices[food_ingredients.indptr[food]:food_ingredients.indptr[food + 1]]
+            for name in matrix.ingredient_names[names]:
+                ingredient_to_foods.setdefault(name, set()).add(description)
+        symptom_details.append({
+            'datetime': symptom_datetime,
+            'date': symptom_datetime.date(),
+            'time': symptom_datetime.time(),
+            'severity': severity,
+            'notes': notes,
+            'ingredients': set(ingredient_to_foods),
+            'ingredient_to_foods': ingredient_to_foods
+        })
+
+    return {
+        'ingredient_frequency': dict(zip(ingredient_stats['ingredient'], ingredient_stats['times_before_symptom'])),
+        'food_frequency': dict(zip(food_stats['food'], food_stats['times_before_symptom'])),
+        'symptom_details': symptom_details,
+        'ingredient_stats': ingredient_stats,
+        'food_stats': food_stats
+    }
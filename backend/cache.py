@@ -2,130 +2,389 @@
 User data caching system for FoodSymptoms app.
 Caches user logs, entries, and food data to improve performance.
 """
+import os
+import threading
+
 import pandas as pd
+import psycopg2
 from datetime import datetime, timedelta
 from backend.utils import get_db_connection
+from backend.settings import (USER_CACHE_BACKEND, USER_CACHE_DIR,
+                              USER_CACHE_MAX_ENTRIES, USER_CACHE_MAX_BYTES,
+                              USER_CACHE_STALE_WHILE_REVALIDATE)
+from backend.cache_backends import LRUCache, DiskCacheBackend
+from backend.compact import compact_frame, concat_compact
 
-# Global cache dictionary: {user_id: {data_type: data, 'last_updated': timestamp}}
-_user_cache = {}
 CACHE_DURATION = timedelta(minutes=5)  # Cache data for 5 minutes
 
 
+def make_cache_backend(kind=None):
+    """
+    Create the user cache backend:
+    - 'memory': per-process LRU (each worker has its own copy)
+    - 'disk': files in USER_CACHE_DIR shared by all local workers
+    """
+    kind = kind or os.getenv('user_cache_backend', USER_CACHE_BACKEND)
+    if kind == 'memory':
+        return LRUCache(max_entries=USER_CACHE_MAX_ENTRIES, max_bytes=USER_CACHE_MAX_BYTES,
+                        ttl=CACHE_DURATION)
+    if kind == 'disk':
+        return DiskCacheBackend(os.getenv('user_cache_dir', USER_CACHE_DIR), max_entries=USER_CACHE_MAX_ENTRIES,
+                                max_bytes=USER_CACHE_MAX_BYTES, ttl=CACHE_DURATION)
+    raise ValueError(f"Unknown cache backend: {kind!r}")
+
+
+# Global cache: {user_id: {data_type: data, 'last_updated': timestamp}}
+_user_cache = make_cache_backend()
+
+
 def invalidate_user_cache(user_id):
-    """Invalidate (clear) cache for a specific user"""
-    if user_id in _user_cache:
-        del _user_cache[user_id]
+    """
+    Invalidate (clear) cache for a specific user. Also bumps the user's
+    generation, so other workers' delta refreshes reload the user in full
+    (call after editing or deleting rows).
+    """
+    _user_cache.pop(user_id)
+    try:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('''
+                INSERT INTO "user_data_generation" (user_id, generation) VALUES (%s, 1)
+                ON CONFLICT (user_id) DO UPDATE SET generation = "user_data_generation".generation + 1
+            ''', (user_id,))
+            conn.commit()
+    except psycopg2.Error as e:
+        print(f"Cache invalidation warning for user {user_id}: {e}")
+
+
+def _data_generation(cur, user_id):
+    cur.execute('SELECT generation FROM "user_data_generation" WHERE user_id = %s', (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else 0
 
 
 def invalidate_all_cache():
     """Clear all cached data"""
-    global _user_cache
-    _user_cache = {}
+    _user_cache.clear()
 
 
-def _is_cache_valid(user_id):
-    """Check if cache exists and is still valid"""
-    if user_id not in _user_cache:
-        return False
-    
-    last_updated = _user_cache[user_id].get('last_updated')
-    if not last_updated:
-        return False
-    
-    return (datetime.now() - last_updated) < CACHE_DURATION
+def get_cache_stats():
+    """Hit/miss/eviction counters and bytes held by the user cache"""
+    return _user_cache.stats()
+
+
+def get_user_derived(user_id, user_data, name, build):
+    """
+    Get a value derived from a user's cached frames (e.g. the exposure matrix),
+    building it once per load and counting it against the cache's byte budget.
+    """
+    value = user_data.get(name)
+    if value is None:
+        value = build(user_data)
+        user_data[name] = value
+        if _user_cache.get(user_id, record=False) is user_data:
+            _user_cache.remeasure(user_id)
+    return value
+
+
+# Frames appended incrementally by id watermark: (name, query with user_id and
+# last seen id parameters)
+_LOG_QUERIES = (
+    ('daily_logs', '''
+        SELECT id, date, user_id
+        FROM "dailylog"
+        WHERE user_id = %s AND id > %s
+    '''),
+    ('food_log_entries', '''
+        SELECT fle.id, fle.daily_log_id, fle.meal_id, fle.fdc_id, fle.notes,
+               dl.date::date + fle.time::time AS datetime
+        FROM "foodlogentry" fle
+        JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+        WHERE dl.user_id = %s AND fle.id > %s
+    '''),
+    ('symptom_log_entries', '''
+        SELECT sle.id, sle.daily_log_id, sle.symptom_id, sle.severity, sle.notes,
+               s.name as symptom_name, dl.date::date + sle.time::time AS datetime
+        FROM "symptomlogentry" sle
+        JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+        JOIN "symptom" s ON sle.symptom_id = s.id
+        WHERE dl.user_id = %s AND sle.id > %s
+    '''),
+)
+
+# Food metadata for a set of fdc_ids (used when new entries reference new foods)
+_FOOD_QUERIES = (
+    ('foods', '''
+        SELECT f.fdc_id, f.description, f.category
+        FROM "food" f
+        WHERE f.fdc_id = ANY(%s)
+    '''),
+    ('food_ingredients', '''
+        SELECT fs.fdc_id, u.name_id, n.name
+        FROM "food_ingredient_set" fs
+        CROSS JOIN LATERAL unnest(fs.ingredient_ids || fs.subingredient_ids) AS u (name_id)
+        JOIN "ingredient_name" n ON n.id = u.name_id
+        WHERE fs.fdc_id = ANY(%s)
+    '''),
+)
+
+USER_FRAMES = ('daily_logs', 'food_log_entries', 'symptom_log_entries',
+               'foods', 'food_ingredients')
+SORTED_FRAMES = ('food_log_entries', 'symptom_log_entries')
+# Max age of a delta-refreshed cache. Edits and deletes don't wait for it:
+# they bump the user's generation, which makes the next refresh a full load
+FULL_REFRESH_INTERVAL = timedelta(minutes=30)
+
+_revalidating = set()  # users with a background refresh in flight (this process)
+_revalidating_lock = threading.Lock()
+
+
+# Single round-trip loader: CTEs compute the user's logs, entries and fdc_id set
+# once, and each result set comes back as one row of typed arrays (columnar)
+_BULK_FRAMES = (
+    ('daily_logs', 'logs', ('id', 'date', 'user_id')),
+    ('food_log_entries', 'entries',
+     ('id', 'daily_log_id', 'meal_id', 'fdc_id', 'notes', 'datetime')),
+    ('symptom_log_entries', 'symptoms',
+     ('id', 'daily_log_id', 'symptom_id', 'severity', 'notes', 'symptom_name', 'datetime')),
+    ('foods', 'foods', ('fdc_id', 'description', 'category')),
+    ('food_ingredients', 'food_ings', ('fdc_id', 'name_id', 'name')),
+)
+
+_BULK_QUERY = '''
+    WITH logs AS (
+        SELECT id, date, user_id
+        FROM "dailylog"
+        WHERE user_id = %(user_id)s
+    ), entries AS (
+        SELECT fle.id, fle.daily_log_id, fle.meal_id, fle.fdc_id, fle.notes,
+               logs.date::date + fle.time::time AS datetime
+        FROM "foodlogentry" fle
+        JOIN logs ON fle.daily_log_id = logs.id
+    ), symptoms AS (
+        SELECT sle.id, sle.daily_log_id, sle.symptom_id, sle.severity, sle.notes,
+               s.name AS symptom_name, logs.date::date + sle.time::time AS datetime
+        FROM "symptomlogentry" sle
+        JOIN logs ON sle.daily_log_id = logs.id
+        JOIN "symptom" s ON sle.symptom_id = s.id
+    ), user_fdc AS MATERIALIZED (
+        SELECT DISTINCT fdc_id FROM entries
+    ), foods AS (
+        SELECT f.fdc_id, f.description, f.category
+        FROM "food" f
+        JOIN user_fdc USING (fdc_id)
+    ), food_ings AS (
+        SELECT fs.fdc_id, u.name_id, n.name
+        FROM "food_ingredient_set" fs
+        JOIN user_fdc USING (fdc_id)
+        CROSS JOIN LATERAL unnest(fs.ingredient_ids || fs.subingredient_ids) AS u (name_id)
+        JOIN "ingredient_name" n ON n.id = u.name_id
+    )
+    SELECT * FROM
+''' + ',\n'.join(
+    '        (SELECT {} FROM {}) AS {}_cols'.format(
+        ', '.join(f'array_agg({col})' for col in cols), cte, cte)
+    for _, cte, cols in _BULK_FRAMES)
+
+
+def _load_user_data(user_id):
+    """Query the user's full history in a single round trip"""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        # Read first: a bump during the load makes the next refresh a full one
+        generation = _data_generation(cur, user_id)
+        cur.execute(_BULK_QUERY, {'user_id': user_id})
+        arrays = iter(cur.fetchone())
+
+    frames = {}
+    for name, _, cols in _BULK_FRAMES:
+        columns = [next(arrays) or [] for _ in cols]
+        frames[name] = compact_frame(name, pd.DataFrame.from_records(
+            list(zip(*columns)), columns=list(cols), coerce_float=True))
+
+    now = datetime.now()
+    return _build_user_data(frames, _max_ids(frames), generation, now, now)
+
+
+def _max_ids(frames):
+    return {name: int(frames[name]['id'].max()) if not frames[name].empty else 0
+            for name, _ in _LOG_QUERIES}
+
+
+def _build_user_data(frames, watermarks, generation, full_loaded_at, last_updated):
+    """
+    Assemble a fresh user_data dict. Derived values (e.g. exposure_matrix)
+    are not carried over, so they get rebuilt from the new frames.
+    """
+    user_data = {name: frames[name] for name in USER_FRAMES}
+    # Entry frames are kept sorted by timestamp so time windows are binary searches
+    for name in SORTED_FRAMES:
+        frame = user_data[name]
+        if not frame['datetime'].is_monotonic_increasing:
+            user_data[name] = frame.sort_values('datetime', kind='stable', ignore_index=True)
+    user_data['watermarks'] = watermarks  # highest id fetched from the database
+    user_data['generation'] = generation  # user_data_generation when fully loaded
+    user_data['full_loaded_at'] = full_loaded_at
+    user_data['last_updated'] = last_updated
+    return user_data
+
+
+def _new_food_frames(conn, foods, food_log_entries):
+    """Fetch food metadata for fdc_ids in new entries that aren't cached yet"""
+    if food_log_entries is None or food_log_entries.empty:
+        return {}
+    new_ids = pd.Index(food_log_entries['fdc_id'].unique()).difference(foods['fdc_id'])
+    if new_ids.empty:
+        return {}
+    fdc_ids = [int(fdc_id) for fdc_id in new_ids]
+    return {name: compact_frame(name, pd.read_sql_query(sql, conn, params=(fdc_ids,)))
+            for name, sql in _FOOD_QUERIES}
+
+
+def _merge_frames(user_data, new_frames):
+    """Append new rows to the cached frames, skipping rows already present"""
+    frames = {}
+    for name in USER_FRAMES:
+        frame = user_data[name]
+        new = new_frames.get(name)
+        if new is not None and not new.empty:
+            key = 'fdc_id' if name in ('foods', 'food_ingredients') else 'id'
+            new = new[~new[key].isin(frame[key])]
+            if not new.empty:
+                frame = concat_compact(frame, new)
+        frames[name] = frame
+    return frames
+
+
+def refresh_user_data(user_id, user_data):
+    """
+    Incrementally refresh cached user data: fetch only log rows with an id
+    above the last one seen, plus food metadata for newly referenced foods,
+    and append them to the cached frames. If rows were edited or deleted
+    since the last full load (the user's generation moved), reload in full.
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        changed = _data_generation(cur, user_id) != user_data.get('generation')
+    if changed:
+        return _load_user_data(user_id)
+
+    watermarks = user_data['watermarks']
+    with get_db_connection() as conn:
+        new_frames = {name: compact_frame(name, pd.read_sql_query(
+                          sql, conn, params=(user_id, watermarks[name])))
+                      for name, sql in _LOG_QUERIES}
+        new_frames.update(_new_food_frames(
+            conn, user_data['foods'], new_frames['food_log_entries']))
+
+    new_watermarks = {name: max(watermarks[name], int(new_frames[name]['id'].max()))
+                      if not new_frames[name].empty else watermarks[name]
+                      for name, _ in _LOG_QUERIES}
+    return _build_user_data(_merge_frames(user_data, new_frames), new_watermarks,
+                            user_data.get('generation'), user_data['full_loaded_at'], datetime.now())
+
+
+def append_user_rows(user_id, daily_logs=None, food_log_entries=None, symptom_log_entries=None):
+    """
+    Push rows a writer just inserted into the user's cached frames instead of
+    discarding the cache. Rows are dicts keyed by the cached frame's columns
+    (e.g. from INSERT ... RETURNING). Does nothing if the user isn't cached.
+    """
+    rows = {'daily_logs': daily_logs, 'food_log_entries': food_log_entries,
+            'symptom_log_entries': symptom_log_entries}
+    with _user_cache.lock(user_id):
+        user_data = _user_cache.peek(user_id)
+        if user_data is None:
+            return
+        new_frames = {name: compact_frame(name, pd.DataFrame.from_records(records))
+                      for name, records in rows.items() if records}
+        try:
+            with get_db_connection() as conn:
+                new_frames.update(_new_food_frames(
+                    conn, user_data['foods'], new_frames.get('food_log_entries')))
+        except psycopg2.Error:
+            invalidate_user_cache(user_id)
+            return
+
+        # Pushed rows don't advance the watermarks, so a later delta refresh
+        # still picks up rows other writers inserted in between
+        _user_cache.put(user_id, _build_user_data(
+            _merge_frames(user_data, new_frames), user_data['watermarks'],
+            user_data.get('generation'), user_data['full_loaded_at'], user_data['last_updated']),
+            keep_age=True)
 
 
 def get_user_data(user_id, force_refresh=False):
     """
     Get all user data (logs, entries, foods, ingredients).
-    Returns cached data if available and valid, otherwise queries database.
+    Returns cached data if available and valid. Expired data is refreshed
+    incrementally (new rows only) unless its last full load is older than
+    FULL_REFRESH_INTERVAL or rows were edited or deleted since (see
+    invalidate_user_cache); otherwise the full history is queried. Only one
+    caller per user loads at a time; with USER_CACHE_STALE_WHILE_REVALIDATE
+    expired data is returned immediately while a background refresh runs.
     
+    Frames are compact (see backend/compact.py): repeated names are
+    per-frame categoricals, ids are int32 and entry date +
+    time are packed into one `datetime` column that the food and symptom
+    entry frames are sorted by (see backend.analysis.time_slice).
+
     Returns dict with:
     - daily_logs: DataFrame of all daily logs
     - food_log_entries: DataFrame of all food log entries
     - symptom_log_entries: DataFrame of all symptom log entries
     - foods: DataFrame of all foods consumed by user
-    - ingredients: DataFrame of all ingredients in user's foods
-    - subingredients: DataFrame of all subingredients
+    - food_ingredients: (fdc_id, name_id, name) for every ingredient and
+      subingredient of the user's foods, from "food_ingredient_set" (a name
+      that is both appears twice)
+    - exposure_matrix: added lazily via get_user_derived
     """
     # Return cached data if valid and not forcing refresh
-    if not force_refresh and _is_cache_valid(user_id):
-        return _user_cache[user_id]
-    
-    # Query all user data at once
-    conn = get_db_connection()
-    
-    try:
-        # Get all daily logs for user
-        daily_logs = pd.read_sql_query('''
-            SELECT id, date, user_id
-            FROM "dailylog"
-            WHERE user_id = %s
-        ''', conn, params=(user_id,))
-        
-        # Get all food log entries for user
-        food_log_entries = pd.read_sql_query('''
-            SELECT fle.id, fle.daily_log_id, fle.meal_id, fle.fdc_id, 
-                   fle.time, fle.notes, dl.date
-            FROM "foodlogentry" fle
-            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
-            WHERE dl.user_id = %s
-        ''', conn, params=(user_id,))
-        
-        # Get all symptom log entries for user
-        symptom_log_entries = pd.read_sql_query('''
-            SELECT sle.id, sle.daily_log_id, sle.symptom_id, sle.time, 
-                   sle.severity, sle.notes, dl.date, s.name as symptom_name
-            FROM "symptomlogentry" sle
-            JOIN "dailylog" dl ON sle.daily_log_id = dl.id
-            JOIN "symptom" s ON sle.symptom_id = s.id
-            WHERE dl.user_id = %s
-        ''', conn, params=(user_id,))
-        
-        # Get all unique foods consumed by user
-        foods = pd.read_sql_query('''
-            SELECT DISTINCT f.fdc_id, f.description, f.category
-            FROM "food" f
-            JOIN "foodlogentry" fle ON f.fdc_id = fle.fdc_id
-            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
-            WHERE dl.user_id = %s
-        ''', conn, params=(user_id,))
-        
-        # Get all ingredients for foods consumed by user
-        ingredients = pd.read_sql_query('''
-            SELECT DISTINCT i.id, i.fdc_id, i.ingredient
-            FROM "ingredient" i
-            JOIN "foodlogentry" fle ON i.fdc_id = fle.fdc_id
-            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
-            WHERE dl.user_id = %s
-        ''', conn, params=(user_id,))
-        
-        # Get all subingredients for foods consumed by user
-        subingredients = pd.read_sql_query('''
-            SELECT DISTINCT si.id, si.ingredient_id, si.sub_ingredient
-            FROM "subingredient" si
-            JOIN "ingredient" i ON si.ingredient_id = i.id
-            JOIN "foodlogentry" fle ON i.fdc_id = fle.fdc_id
-            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
-            WHERE dl.user_id = %s
-        ''', conn, params=(user_id,))
-        
-        conn.close()
-        
-        # Store in cache
-        user_data = {
-            'daily_logs': daily_logs,
-            'food_log_entries': food_log_entries,
-            'symptom_log_entries': symptom_log_entries,
-            'foods': foods,
-            'ingredients': ingredients,
-            'subingredients': subingredients,
-            'last_updated': datetime.now()
-        }
-        
-        _user_cache[user_id] = user_data
-        return user_data
-        
-    except Exception as e:
-        conn.close()
-        raise e
+    if not force_refresh:
+        user_data = _user_cache.get(user_id)
+        if user_data is not None:
+            return user_data
+
+        if USER_CACHE_STALE_WHILE_REVALIDATE:
+            stale = _user_cache.peek(user_id)
+            if stale is not None:
+                _revalidate_in_background(user_id)
+                return stale
+
+    # Single-flight: one caller per user loads, concurrent callers wait for it
+    with _user_cache.lock(user_id):
+        if not force_refresh:
+            user_data = _user_cache.get(user_id, record=False)
+            if user_data is not None:
+                return user_data
+        return _reload_user_data(user_id, force_refresh)
+
+
+def _reload_user_data(user_id, force_refresh=False):
+    """Delta-refresh or fully reload a user's data and cache it (hold the user lock)"""
+    stale = None if force_refresh else _user_cache.peek(user_id)
+    if stale is not None and datetime.now() - stale['full_loaded_at'] < FULL_REFRESH_INTERVAL:
+        user_data = refresh_user_data(user_id, stale)
+    else:
+        user_data = _load_user_data(user_id)
+    _user_cache.put(user_id, user_data)
+    return user_data
+
+
+def _revalidate_in_background(user_id):
+    """Start one background refresh for a user whose cached data has expired"""
+    with _revalidating_lock:
+        if user_id in _revalidating:
+            return
+        _revalidating.add(user_id)
+
+    def run():
+        try:
+            with _user_cache.lock(user_id):
+                # Another caller (or worker) may have refreshed it already
+                if _user_cache.get(user_id, record=False) is None:
+                    _reload_user_data(user_id)
+        except psycopg2.Error as e:
+            print(f"Cache refresh warning for user {user_id}: {e}")
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(user_id)
+
+    threading.Thread(target=run, name=f'user-cache-refresh-{user_id}', daemon=True).start()
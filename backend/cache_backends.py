@@ -0,0 +1,452 @@
+"""
+Storage backends for the user data cache (backend/cache.py).
+The memory backend is a per-process LRU; the disk backend keeps entries in
+files shared by every worker process on the host.
+"""
+import abc
+import getpass
+import hashlib
+import os
+import pickle
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks are per process only
+    fcntl = None
+
+
+def estimate_bytes(value):
+    """
+    Estimate memory held by a cached value (DataFrames are measured deep).
+    Categorical columns count their codes and their own categories.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.index.memory_usage(deep=True)) + sum(
+            estimate_bytes(value[col]) for col in value.columns)
+    if isinstance(value, pd.Series) and isinstance(value.dtype, pd.CategoricalDtype):
+        return int(value.cat.codes.nbytes) + int(value.cat.categories.memory_usage(deep=True))
+    if isinstance(value, (pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(v) for v in value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class CacheBackend(abc.ABC):
+    """
+    Interface every user cache backend implements.
+
+    - get returns a fresh value (None/default once `ttl` has passed)
+    - peek returns a value even if expired (used for incremental refresh)
+    - put(keep_age=True) replaces a value without resetting its age
+    - remeasure re-estimates an entry after its value was mutated in place
+    - lock(key) serializes loads of one key so concurrent callers single-flight
+    """
+
+    def __init__(self):
+        self._key_locks = {}  # key -> [lock, holders and waiters]
+        self._key_locks_guard = threading.Lock()
+
+    @contextmanager
+    def lock(self, key):
+        # A key's lock only exists while someone holds or waits for it, so
+        # evicted and deleted keys leave nothing behind
+        with self._key_locks_guard:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._key_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    @abc.abstractmethod
+    def get(self, key, default=None, record=True):
+        pass
+
+    @abc.abstractmethod
+    def peek(self, key, default=None):
+        pass
+
+    @abc.abstractmethod
+    def put(self, key, value, keep_age=False):
+        pass
+
+    def remeasure(self, key):
+        pass
+
+    @abc.abstractmethod
+    def pop(self, key, default=None):
+        pass
+
+    @abc.abstractmethod
+    def clear(self):
+        pass
+
+    @abc.abstractmethod
+    def stats(self):
+        pass
+
+
+def _seconds(ttl):
+    return ttl.total_seconds() if isinstance(ttl, timedelta) else ttl
+
+
+class LRUCache(CacheBackend):
+    """
+    Capacity-bounded, thread-safe LRU cache.
+
+    - evicts least recently used entries once max_entries or max_bytes
+      (estimated with `sizeof`) is exceeded; None disables a limit
+    - entries older than `ttl` are treated as misses
+    - the most recent entry is always kept, even if it alone exceeds max_bytes
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None, sizeof=estimate_bytes):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = _seconds(ttl)
+        self._sizeof = sizeof
+        self._data = OrderedDict()  # key -> [value, nbytes, stored_at]
+        self._lock = threading.RLock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, record=False) is not None
+
+    def get(self, key, default=None, record=True):
+        """Get a fresh value and mark it most recently used"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[2] >= self.ttl:
+                if record:
+                    self.expirations += 1
+                item = None
+            if item is None:
+                if record:
+                    self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            if record:
+                self.hits += 1
+            return item[0]
+
+    def peek(self, key, default=None):
+        """Get a value even if expired, without touching LRU order or counters"""
+        with self._lock:
+            item = self._data.get(key)
+            return default if item is None else item[0]
+
+    def put(self, key, value, keep_age=False):
+        """Store a value, evicting LRU entries if over capacity"""
+        nbytes = self._sizeof(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            stored_at = time.monotonic()
+            if old is not None:
+                self.bytes -= old[1]
+                if keep_age:
+                    stored_at = old[2]
+            self._data[key] = [value, nbytes, stored_at]
+            self.bytes += nbytes
+            self._evict()
+
+    def remeasure(self, key):
+        """Re-estimate an entry's size after its value was mutated in place"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return
+            nbytes = self._sizeof(item[0])
+            self.bytes += nbytes - item[1]
+            item[1] = nbytes
+            self._evict()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            self.bytes -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def _evict(self):
+        while len(self._data) > 1 and (
+                (self.max_entries is not None and len(self._data) > self.max_entries) or
+                (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            _, item = self._data.popitem(last=False)
+            self.bytes -= item[1]
+            self.evictions += 1
+
+    def stats(self):
+        """Snapshot of cache size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def default_cache_dir():
+    """
+    tmpfs (/dev/shm) when available so entries live in shared memory; one
+    directory per OS user
+    """
+    root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    owner = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+    return os.path.join(root, f'mealmap-cache-{owner}')
+
+
+def private_cache_dir(directory):
+    """
+    Create `directory` (0700) if needed and refuse it unless it is a real
+    directory owned by us that nobody else can access: entries are
+    unpickled, so anyone able to write there could run code in the workers
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"Cache directory {directory} is not a directory")
+    if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) != 0o700):
+        raise PermissionError(
+            f"Cache directory {directory} must be owned by uid {os.getuid()} with mode 0700 "
+            f"(found uid {st.st_uid}, mode {stat.S_IMODE(st.st_mode):o})")
+    return directory
+
+
+class DiskCacheBackend(CacheBackend):
+    """
+    Cache shared by every worker process on the host.
+
+    Each key is one pickle file in `directory`, written to a temp file and
+    renamed into place so readers never see a partial entry. Invalidation
+    unlinks the file, which every process notices on its next lookup.
+    Unpickled values are memoized per process and reused until the file is
+    replaced. When over
+    max_entries/max_bytes the least recently written files are removed.
+    lock(key) also takes a file lock, so only one worker on the host loads a
+    given key at a time. Keys share lock_stripes lock files by hash, so lock
+    files don't pile up as keys come and go. The directory must be private
+    to the app's user (see private_cache_dir).
+    """
+
+    lock_stripes = 64
+
+    def __init__(self, directory=None, max_entries=None, max_bytes=None, ttl=None):
+        super().__init__()
+        self.directory = private_cache_dir(directory or default_cache_dir())
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = _seconds(ttl)
+        # key -> (file version, value); bounded like the memory backend
+        self._memo = LRUCache(max_entries=max_entries, max_bytes=max_bytes,
+                              sizeof=lambda item: estimate_bytes(item[1]))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, quote(str(key), safe='') + '.pkl')
+
+    def _lock_path(self, key):
+        # Not hash(): it differs between processes for str keys
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        return os.path.join(self.directory, f"{int.from_bytes(digest, 'big') % self.lock_stripes}.lock")
+
+    @staticmethod
+    def _version(st):
+        # A rename always brings a new inode, even when keep_age preserves mtime
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    @contextmanager
+    def lock(self, key):
+        with super().lock(key):
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path(key), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self, key):
+        """Return (value, mtime) or (None, None) if there is no entry"""
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._memo.pop(key)
+            return None, None
+        memo = self._memo.get(key, record=False)
+        if memo is not None and memo[0] == self._version(st):
+            return memo[1], st.st_mtime
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None, None
+        self._memo.put(key, (self._version(st), value))
+        return value, st.st_mtime
+
+    def get(self, key, default=None, record=True):
+        value, mtime = self._load(key)
+        with self._lock:
+            if value is not None and self.ttl is not None and time.time() - mtime >= self.ttl:
+                if record:
+                    self.expirations += 1
+                value = None
+            if record:
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        return default if value is None else value
+
+    def peek(self, key, default=None):
+        value, _ = self._load(key)
+        return default if value is None else value
+
+    def put(self, key, value, keep_age=False):
+        path = self._path(key)
+        old_mtime = None
+        if keep_age:
+            try:
+                old_mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if old_mtime is not None:
+                os.utime(tmp, ns=(old_mtime, old_mtime))
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        self._memo.put(key, (self._version(os.stat(path)), value))
+        self._evict(keep=path)
+
+    def remeasure(self, key):
+        # Derived values stay in this process's memo; the file is unchanged
+        self._memo.remeasure(key)
+
+    def pop(self, key, default=None):
+        memo = self._memo.pop(key)
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+        return default if memo is None else memo[1]
+
+    def clear(self):
+        self._memo.clear()
+        for path, _ in self._entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self):
+        """[(path, stat)] for every cache file, oldest write first"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl'):
+                    try:
+                        entries.append((entry.path, entry.stat()))
+                    except FileNotFoundError:
+                        pass
+        return sorted(entries, key=lambda e: e[1].st_mtime_ns)
+
+    def _evict(self, keep=None):
+        entries = self._entries()
+        total = sum(st.st_size for _, st in entries)
+        for path, st in entries:
+            if len(entries) <= 1 or not (
+                    (self.max_entries is not None and len(entries) > self.max_entries) or
+                    (self.max_bytes is not None and total > self.max_bytes)):
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            entries = [e for e in entries if e[0] != path]
+            total -= st.st_size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        """Snapshot of shared entries/bytes and this process's counters"""
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'disk',
+                'directory': self.directory,
+                'entries': len(entries),
+                'max_entries': self.max_entries,
+                'bytes': sum(st.st_size for _, st in entries),
+                'max_bytes': self.max_bytes,
+                'memo_bytes': self._memo.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,302 @@
+"""
+Per-process cache of the Dashboard calendar's grouped entries.
+Entries are cached per (user, start, end) of a day/week/month view. After a
+view is rendered the previous and next periods are loaded in the background,
+so paging through the calendar doesn't wait on the database. Writers call
+invalidate_calendar_cache after changing a user's entries; it bumps the
+user's generation in "calendar_generation" (migration 007), part of every
+cache key, and NOTIFYs it. A listener thread per worker keeps the known
+generations current, so a cache hit needs no database round trip.
+"""
+import calendar
+import select
+import threading
+import time
+from datetime import date, timedelta
+
+import psycopg2
+
+from backend.utils import get_db_connection, open_db_connection
+from backend.cache_backends import LRUCache
+from backend.settings import (CALENDAR_CACHE_MAX_ENTRIES, CALENDAR_CACHE_MAX_BYTES,
+                              CALENDAR_CACHE_TTL, CALENDAR_LISTEN_RETRY)
+
+_ranges = LRUCache(max_entries=CALENDAR_CACHE_MAX_ENTRIES,
+                   max_bytes=CALENDAR_CACHE_MAX_BYTES, ttl=CALENDAR_CACHE_TTL)
+
+_prefetching = set()  # (user_id, start, end) being loaded in the background
+_prefetching_lock = threading.Lock()
+
+# user_id -> generation, kept current by _listen while it is connected
+_generations = {}
+_generations_lock = threading.Lock()
+_listen_epoch = None  # bumped per listener connection; None while disconnected
+_listener_started = False
+
+
+def calendar_range(view_mode, base_date):
+    """First and last date shown by a day, week or month view of base_date"""
+    if view_mode == 'day':
+        return base_date, base_date
+    if view_mode == 'week':
+        start_date = base_date - timedelta(days=base_date.weekday())
+        return start_date, start_date + timedelta(days=6)
+    last_day = calendar.monthrange(base_date.year, base_date.month)[1]
+    return date(base_date.year, base_date.month, 1), date(base_date.year, base_date.month, last_day)
+
+
+def shift_date(view_mode, base_date, step):
+    """The date the calendar shows after moving `step` (-1 or 1) periods"""
+    if view_mode == 'day':
+        return base_date + timedelta(days=step)
+    if view_mode == 'week':
+        return base_date + timedelta(weeks=step)
+    month = base_date.year * 12 + base_date.month - 1 + step
+    return date(month // 12, month % 12 + 1, 1)
+
+
+# Dates and times come back as the strings the calendar shows, so grouping is
+# plain tuple unpacking
+_FOOD_ENTRIES_SQL = '''
+    SELECT to_char(dl.date::date, 'YYYY-MM-DD'), fle.id, f.description,
+           to_char(fle.time::time, 'HH24:MI'), fle.notes, fle.meal_id
+    FROM "dailylog" dl
+    JOIN "foodlogentry" fle ON dl.id = fle.daily_log_id
+    JOIN "food" f ON fle.fdc_id = f.fdc_id
+    WHERE dl.user_id = %s AND dl.date BETWEEN %s AND %s
+    ORDER BY dl.date::date, fle.time::time
+'''
+
+_SYMPTOM_ENTRIES_SQL = '''
+    SELECT to_char(dl.date::date, 'YYYY-MM-DD'), sle.id, s.name,
+           to_char(sle.time::time, 'HH24:MI'), sle.severity, sle.notes
+    FROM "dailylog" dl
+    JOIN "symptomlogentry" sle ON dl.id = sle.daily_log_id
+    JOIN "symptom" s ON sle.symptom_id = s.id
+    WHERE dl.user_id = %s AND dl.date BETWEEN %s AND %s
+    ORDER BY dl.date::date, sle.time::time
+'''
+
+
+def group_calendar_entries(food_rows, symptom_rows):
+    """
+    Group entry rows by date:
+    {date: {'meals': {meal_id: {'time', 'foods'}}, 'foods': [...], 'symptoms': [...]}}
+
+    food_rows are (date, id, name, time, notes, meal_id) and symptom_rows
+    (date, id, name, time, severity, notes) tuples, with dates and times
+    already formatted (YYYY-MM-DD, HH:MM). Foods without a meal_id (NULL or
+    0) are listed individually; a meal takes the time of its first food.
+    """
+    entries = {}
+    for d, entry_id, name, time, notes, meal_id in food_rows:
+        day = entries.get(d)
+        if day is None:
+            day = entries[d] = {'meals': {}, 'symptoms': [], 'foods': []}
+        if meal_id:
+            meal = day['meals'].get(meal_id)
+            if meal is None:
+                meal = day['meals'][meal_id] = {'time': time, 'foods': []}
+            meal['foods'].append({'id': entry_id, 'name': name, 'notes': notes})
+        else:
+            day['foods'].append({'id': entry_id, 'name': name, 'time': time, 'notes': notes})
+
+    for d, entry_id, name, time, severity, notes in symptom_rows:
+        day = entries.get(d)
+        if day is None:
+            day = entries[d] = {'meals': {}, 'symptoms': [], 'foods': []}
+        day['symptoms'].append({'id': entry_id, 'name': name, 'time': time,
+                                'severity': severity, 'notes': notes})
+    return entries
+
+
+def load_calendar_entries(user_id, start_date, end_date):
+    """Query and group a user's food and symptom entries between two dates"""
+    params = (user_id, start_date.isoformat(), end_date.isoformat())
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(_FOOD_ENTRIES_SQL, params)
+        food_rows = cur.fetchall()
+        cur.execute(_SYMPTOM_ENTRIES_SQL, params)
+        symptom_rows = cur.fetchall()
+    return group_calendar_entries(food_rows, symptom_rows)
+
+
+def calendar_payload(entries, start_date):
+    """
+    Grouped entries in the compact, columnar form the client-side calendar
+    (assets/calendar.js) renders: one list per field, `day` counted from
+    start_date. Foods in a meal carry its id and time; other foods have meal None.
+    """
+    foods = {'day': [], 'id': [], 'name': [], 'time': [], 'meal': []}
+    symptoms = {'day': [], 'id': [], 'name': [], 'time': []}
+
+    def add(columns, **values):
+        for name, value in values.items():
+            columns[name].append(value)
+
+    for d, day in entries.items():
+        offset = (date.fromisoformat(d) - start_date).days
+        for meal_id, meal in day['meals'].items():
+            for food in meal['foods']:
+                add(foods, day=offset, id=food['id'], name=food['name'], time=meal['time'], meal=meal_id)
+        for food in day['foods']:
+            add(foods, day=offset, id=food['id'], name=food['name'], time=food['time'], meal=None)
+        for symptom in day['symptoms']:
+            add(symptoms, day=offset, id=symptom['id'], name=symptom['name'], time=symptom['time'])
+    return {'start': start_date.isoformat(), 'foods': foods, 'symptoms': symptoms}
+
+
+def _remember(user_id, generation, epoch):
+    """Record a generation seen while the listener of `epoch` was connected"""
+    with _generations_lock:
+        if epoch is not None and epoch == _listen_epoch and generation > _generations.get(user_id, -1):
+            _generations[user_id] = generation
+
+
+def _listen():
+    """Follow calendar_generation notifications; reconnects after errors"""
+    global _listen_epoch
+    epoch = 0
+    while True:
+        conn = None
+        try:
+            conn = open_db_connection()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute('LISTEN calendar_generation')
+                epoch += 1
+                with _generations_lock:
+                    _listen_epoch = epoch
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        cur.execute('SELECT 1')  # notice a dead connection
+                    conn.poll()
+                    while conn.notifies:
+                        user_id, generation = conn.notifies.pop(0).payload.split(':')
+                        _remember(int(user_id), int(generation), epoch)
+        except (psycopg2.Error, OSError, ValueError) as e:
+            print(f"Calendar invalidation listener warning: {e}")
+        finally:
+            # Notifications may be missed until we listen again: forget what we know
+            with _generations_lock:
+                _listen_epoch = None
+                _generations.clear()
+            if conn is not None:
+                conn.close()
+        time.sleep(CALENDAR_LISTEN_RETRY)
+
+
+def _start_listener():
+    global _listener_started
+    with _generations_lock:
+        if _listener_started:
+            return
+        _listener_started = True
+    threading.Thread(target=_listen, name='calendar-invalidation', daemon=True).start()
+
+
+def calendar_generation(user_id):
+    """
+    The user's calendar generation, shared by all workers. It is part of every
+    cache key and read before loading, so a load that started before a write
+    can't store its (stale) result under a live key. Known generations come
+    from memory; others (and all while the listener is down) from the database.
+    """
+    _start_listener()
+    with _generations_lock:
+        epoch = _listen_epoch
+        generation = _generations.get(user_id) if epoch is not None else None
+    if generation is not None:
+        return generation
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('SELECT generation FROM "calendar_generation" WHERE user_id = %s', (user_id,))
+        row = cur.fetchone()
+    generation = row[0] if row else 0
+    # Only kept if the listener was already connected before the read, so no
+    # later bump can be missed
+    if epoch is not None:
+        _remember(user_id, generation, epoch)
+    return generation
+
+
+def get_calendar_entries(user_id, start_date, end_date, generation=None):
+    """
+    Grouped entries for a date range (see load_calendar_entries), from the
+    cache when possible. The result is shared with other callers: don't
+    modify it.
+    """
+    if generation is None:
+        generation = calendar_generation(user_id)
+    key = (user_id, generation, start_date, end_date)
+    entries = _ranges.get(key)
+    if entries is None:
+        # Waits for a prefetch of the same range that is already running
+        with _ranges.lock((user_id, start_date, end_date)):
+            entries = _ranges.get(key, record=False)
+            if entries is None:
+                entries = load_calendar_entries(user_id, start_date, end_date)
+                _ranges.put(key, entries)
+    return entries
+
+
+def prefetch_adjacent_ranges(user_id, view_mode, base_date):
+    """Load the periods before and after base_date's view in a background thread"""
+    generation = calendar_generation(user_id)
+    ranges = []
+    for step in (1, -1):
+        start_date, end_date = calendar_range(view_mode, shift_date(view_mode, base_date, step))
+        if _ranges.get((user_id, generation, start_date, end_date), record=False) is not None:
+            continue
+        with _prefetching_lock:
+            if (user_id, start_date, end_date) in _prefetching:
+                continue
+            _prefetching.add((user_id, start_date, end_date))
+        ranges.append((start_date, end_date))
+    if not ranges:
+        return
+
+    def run():
+        for start_date, end_date in ranges:
+            try:
+                get_calendar_entries(user_id, start_date, end_date, generation)
+            except psycopg2.Error as e:
+                print(f"Calendar prefetch warning for user {user_id}: {e}")
+            finally:
+                with _prefetching_lock:
+                    _prefetching.discard((user_id, start_date, end_date))
+
+    threading.Thread(target=run, name=f'calendar-prefetch-{user_id}', daemon=True).start()
+
+
+def invalidate_calendar_cache(user_id):
+    """
+    Drop a user's cached ranges in every worker (call after their entries
+    change). Failures are printed, not raised: the change is already saved.
+    """
+    try:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('''
+                INSERT INTO "calendar_generation" (user_id, generation) VALUES (%s, 1)
+                ON CONFLICT (user_id) DO UPDATE SET generation = "calendar_generation".generation + 1
+                RETURNING generation
+            ''', (user_id,))
+            generation = cur.fetchone()[0]
+            # Delivered to every listening worker when the bump commits
+            cur.execute('SELECT pg_notify(%s, %s)', ('calendar_generation', f"{user_id}:{generation}"))
+            conn.commit()
+    except psycopg2.Error as e:
+        print(f"Calendar invalidation warning for user {user_id}: {e}")
+        return
+    with _generations_lock:
+        epoch = _listen_epoch
+    _remember(user_id, generation, epoch)
+
+
+def invalidate_all_calendar_cache():
+    """Clear all cached ranges"""
+    _ranges.clear()
+
+
+def get_calendar_cache_stats():
+    """Hit/miss/eviction counters and hit rate of the calendar range cache"""
+    return _ranges.stats()
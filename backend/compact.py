@@ -0,0 +1,63 @@
+"""
+Compact columnar representation for cached user frames.
+Repeated strings (descriptions, categories, ingredient and symptom names,
+notes) are stored as categoricals over only the strings that frame uses,
+ids are downcast to int32 and date + time are packed into one datetime64
+column. Every frame is self-contained: nothing is
+shared between users or processes, so evicting a user frees all of it and a
+pickled frame only carries its own strings.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Per cached frame: string columns, int32 id columns, nullable int columns
+FRAME_SCHEMAS = {
+    'daily_logs': ((), ('id', 'user_id'), ()),
+    'food_log_entries': (('notes',), ('id', 'daily_log_id', 'fdc_id'), ('meal_id',)),
+    'symptom_log_entries': (('notes', 'symptom_name'),
+                            ('id', 'daily_log_id', 'symptom_id', 'severity'), ()),
+    'foods': (('description', 'category'), ('fdc_id',), ()),
+    'food_ingredients': (('name',), ('fdc_id', 'name_id'), ()),
+}
+
+
+def pack_datetime(dates, times):
+    """Combine date and time columns (objects or strings) into datetime64[ns]"""
+    if len(dates) == 0:
+        return pd.Series(pd.to_datetime([]).astype('datetime64[ns]'), index=dates.index)
+    return pd.to_datetime(dates.astype(str) + ' ' + times.astype(str)).astype('datetime64[ns]')
+
+
+def compact_frame(name, frame):
+    """Return a compact copy of a cached user frame"""
+    strings, ints, nullable_ints = FRAME_SCHEMAS[name]
+    frame = frame.copy()
+    if 'time' in frame.columns and 'date' in frame.columns:
+        frame['datetime'] = pack_datetime(frame['date'], frame['time'])
+        frame = frame.drop(columns=['date', 'time'])
+    for col in ('datetime', 'date'):
+        if col in frame.columns:
+            frame[col] = pd.to_datetime(frame[col]).astype('datetime64[ns]')
+    for col in strings:
+        frame[col] = pd.Categorical(frame[col].to_numpy(dtype=object))
+    for col in ints:
+        frame[col] = pd.to_numeric(frame[col]).astype(np.int32)
+    for col in nullable_ints:
+        frame[col] = pd.to_numeric(frame[col]).astype('Int32')
+    return frame
+
+
+def concat_compact(frame, new):
+    """Append compact rows to a compact frame, merging categoricals' categories"""
+    if frame.empty:
+        return new[frame.columns].reset_index(drop=True)
+    new = new[frame.columns]
+    columns = {}
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([frame[col], new[col]], ignore_order=True)
+    merged = pd.concat([frame, new], ignore_index=True)
+    for col, values in columns.items():
+        merged[col] = values
+    return merged
@@ -0,0 +1,350 @@
+"""
+In-process word-prefix index over food descriptions for type-ahead search.
+
+Every description is split into lowercase words. The distinct words are
+sorted and each word id has a posting list of the foods containing it,
+stored back to back in one int32 array (CSR), so all words starting with a
+prefix are one contiguous slice of postings. Descriptions and words live in
+one UTF-8 blob each plus an offsets array; there is one Python object per
+index, not per food.
+
+Foods added after the index was built (create_food_item, saved meal
+combinations) go into a small delta list that is scanned linearly, and
+removed foods are masked out, so the index never needs a rebuild to stay
+current.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from backend.utils import get_db_connection
+from backend.search import normalize_query
+from backend.settings import BATCH_SIZE
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Upper bound for a prefix range in the sorted vocabulary
+_MAX_CHAR = '\U0010ffff'
+
+# Rank like backend/search.py: exact > starts with the query > contains it
+EXACT, PREFIX, CONTAINS = 0, 1, 2
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class StringBlob:
+    """Immutable list of strings stored as one UTF-8 blob plus offsets"""
+
+    def __init__(self, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        self.blob = b''.join(encoded)
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    @property
+    def nbytes(self):
+        return len(self.blob) + self.offsets.nbytes
+
+
+def _segment_positions(starts, counts):
+    """Positions starts[i] .. starts[i] + counts[i] - 1 for every i, concatenated"""
+    total = int(counts.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+
+
+def _csr(keys, values, n_keys):
+    """Group values by key (keeping their order within a key) as (offsets, values)"""
+    perm = np.argsort(keys, kind='stable')
+    offsets = np.searchsorted(keys[perm], np.arange(n_keys + 1)).astype(np.int64)
+    return offsets, values[perm]
+
+
+class FoodIndex:
+    """
+    Word-prefix index over (fdc_id, description, category).
+
+    Every query word must be a prefix of some word of the description.
+    Results are ranked exact > description starts with the first query
+    word > contains, then shorter descriptions first, then alphabetically.
+
+    Foods are numbered in that (length, description) order, and posting
+    lists are sorted by that number, so the best k matches for a prefix
+    are among the first k entries of each matching word's list; no query
+    has to look at every food matching a short prefix.
+    """
+
+    def __init__(self, fdc_ids, descriptions, categories):
+        descriptions = pd.Series(descriptions, dtype=object).fillna('')
+        lowered = descriptions.str.lower()
+        order = pd.DataFrame({'length': descriptions.str.len(), 'lowered': lowered}) \
+            .sort_values(['length', 'lowered'], kind='stable').index.to_numpy()
+        descriptions = descriptions.iloc[order].reset_index(drop=True)
+        lowered = lowered.iloc[order].reset_index(drop=True)
+
+        self.fdc_ids = np.asarray(fdc_ids, dtype=np.int64)[order]
+        self.descriptions = StringBlob(descriptions)
+        self.lengths = descriptions.str.len().to_numpy(dtype=np.int32)
+        category_codes, category_names = pd.factorize(
+            pd.Series(np.asarray(categories, dtype=object)[order], dtype=object))
+        self.category_codes = category_codes.astype(np.int32)
+        self.category_names = list(category_names)
+        self.alive = np.ones(len(self.fdc_ids), dtype=bool)
+        self._removed = 0
+        self._by_fdc_id = np.argsort(self.fdc_ids, kind='stable')
+
+        words = lowered.str.findall(TOKEN_RE).explode().dropna()
+        docs = words.index.to_numpy(dtype=np.int32)
+        codes, uniques = pd.factorize(words.to_numpy(dtype=object))
+        vocab_order = np.argsort(uniques)
+        word_ids = np.empty(len(vocab_order), dtype=np.int32)
+        word_ids[vocab_order] = np.arange(len(vocab_order), dtype=np.int32)
+        word_ids = word_ids[codes]
+        n_words = len(vocab_order)
+        self.vocab = StringBlob(uniques[vocab_order])
+
+        # Inverted index: foods per word, and foods per first word
+        self.word_offsets, self.postings = _csr(word_ids, docs, n_words)
+        first = np.r_[True, docs[1:] != docs[:-1]] if len(docs) else np.zeros(0, dtype=bool)
+        self.first_offsets, self.first_postings = _csr(word_ids[first], docs[first], n_words)
+        # Forward index: words per food, to check further query words
+        self.doc_offsets = np.searchsorted(docs, np.arange(len(self.fdc_ids) + 1)).astype(np.int64)
+        self.doc_words = word_ids
+
+        self._added = []  # (fdc_id, description, category, words) since the build
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.fdc_ids) - self._removed + len(self._added)
+
+    @property
+    def nbytes(self):
+        arrays = (self.fdc_ids, self.lengths, self.category_codes, self.alive, self._by_fdc_id,
+                  self.word_offsets, self.postings, self.first_offsets, self.first_postings,
+                  self.doc_offsets, self.doc_words)
+        return self.descriptions.nbytes + self.vocab.nbytes + sum(a.nbytes for a in arrays)
+
+    def _word_range(self, prefix):
+        """Range of word ids starting with prefix"""
+        lo = bisect_left(self.vocab, prefix)
+        return lo, bisect_left(self.vocab, prefix + _MAX_CHAR, lo)
+
+    def _unique(self, docs):
+        """Sorted distinct foods; a bitmap over all foods beats hashing large inputs"""
+        if len(docs) * 64 < len(self.fdc_ids):
+            return np.unique(docs)
+        seen = np.zeros(len(self.fdc_ids), dtype=bool)
+        seen[docs] = True
+        return np.flatnonzero(seen)
+
+    def _has_word(self, docs, word_range):
+        """For each food, whether it has a word in word_range"""
+        lo, hi = word_range
+        starts = self.doc_offsets[docs]
+        counts = self.doc_offsets[docs + 1] - starts
+        words = self.doc_words[_segment_positions(starts, counts)]
+        return np.logical_or.reduceat((words >= lo) & (words < hi), np.cumsum(counts) - counts)
+
+    def _first_k(self, offsets, postings, word_range, k, filters=(), exclude=()):
+        """
+        The k smallest live foods in the posting lists of word_range that
+        also have a word in every range of filters.
+
+        Reads only the first t entries of the m lists with the smallest first
+        entries, growing both until k matches are found below the smallest
+        entry not yet read, so a short prefix costs about k entries per
+        list, not every food.
+        """
+        lo, hi = word_range
+        starts = offsets[lo:hi]
+        sizes = offsets[lo + 1:hi + 1] - starts
+        starts, sizes = starts[sizes > 0], sizes[sizes > 0]
+        heads = postings[starts]
+        t = m = k
+        while True:
+            if m < len(heads):
+                # Lists starting after the m-th smallest head are not read yet
+                bound = np.partition(heads, m - 1)[m - 1]
+                selected = heads <= bound
+                list_starts, list_sizes = starts[selected], sizes[selected]
+            else:
+                bound = np.inf
+                list_starts, list_sizes = starts, sizes
+            counts = np.minimum(list_sizes, t)
+            docs = self._unique(postings[_segment_positions(list_starts, counts)])
+            truncated = list_sizes > t
+            if truncated.any():
+                bound = min(bound, postings[list_starts[truncated] + t - 1].min())
+            # Every food up to bound has been seen
+            docs = docs[docs <= bound]
+            docs = docs[self.alive[docs]]
+            if len(exclude):
+                docs = docs[~np.isin(docs, exclude)]
+            for word_range in filters:
+                if len(docs):
+                    docs = docs[self._has_word(docs, word_range)]
+            if len(docs) >= k or bound == np.inf:
+                return docs[:k]
+            t *= 8
+            m *= 8
+
+    def _search_main(self, words, k):
+        """Best k foods as (prefix matches, other matches), each in rank order"""
+        first, *others = [self._word_range(word) for word in words]
+        # Most selective words first, so each filter sees fewer candidates
+        others.sort(key=lambda r: self.word_offsets[r[1]] - self.word_offsets[r[0]])
+        prefix = self._first_k(self.first_offsets, self.first_postings, first, k, filters=others)
+        if len(prefix) == k:
+            return prefix, prefix[:0]
+        # Fewer than k foods start with the first word, so prefix holds all
+        # of them; fill up starting from the word with the fewest postings
+        ranges = sorted([first] + others,
+                        key=lambda r: self.word_offsets[r[1]] - self.word_offsets[r[0]])
+        rest = self._first_k(self.word_offsets, self.postings, ranges[0], k - len(prefix),
+                             filters=ranges[1:], exclude=prefix)
+        return prefix, rest
+
+    def _search_added(self, words):
+        with self._lock:
+            added = list(self._added)
+        matches = []
+        for fdc_id, description, category, food_words in added:
+            if all(any(w.startswith(word) for w in food_words) for word in words):
+                starts = bool(food_words) and food_words[0].startswith(words[0])
+                matches.append((starts, {'fdc_id': fdc_id, 'description': description,
+                                         'category': category}))
+        return matches
+
+    def _food(self, i):
+        code = self.category_codes[i]
+        return {'fdc_id': int(self.fdc_ids[i]),
+                'description': self.descriptions[i],
+                'category': self.category_names[code] if code >= 0 else None}
+
+    def search(self, query, k=10):
+        """Top k foods for query as dicts with fdc_id, description, category"""
+        words = tokenize(query or '')
+        if not words:
+            return []
+        prefix, rest = self._search_main(words, k)
+        matches = [(True, self._food(i)) for i in prefix.tolist()]
+        matches += [(False, self._food(i)) for i in rest.tolist()]
+        matches += self._search_added(words)
+
+        query = normalize_query(query)
+
+        def rank(match):
+            starts, food = match
+            description = food['description']
+            lowered = description.lower()
+            if lowered == query:
+                return EXACT, len(description), lowered
+            return PREFIX if starts else CONTAINS, len(description), lowered
+
+        return [food for _, food in sorted(matches, key=rank)[:k]]
+
+    def _position(self, fdc_id):
+        """Index of fdc_id among the foods the index was built from, or None"""
+        pos = np.searchsorted(self.fdc_ids, fdc_id, sorter=self._by_fdc_id)
+        if pos < len(self.fdc_ids) and self.fdc_ids[self._by_fdc_id[pos]] == fdc_id:
+            return self._by_fdc_id[pos]
+        return None
+
+    def add(self, fdc_id, description, category=None):
+        """Make a newly created food searchable"""
+        if self._position(fdc_id) is not None:
+            return
+        with self._lock:
+            self._added.append((int(fdc_id), description, category, tokenize(description)))
+
+    def remove(self, fdc_id):
+        """Hide a deleted food from results"""
+        pos = self._position(fdc_id)
+        if pos is not None and self.alive[pos]:
+            self.alive[pos] = False
+            self._removed += 1
+        with self._lock:
+            self._added = [food for food in self._added if food[0] != fdc_id]
+
+
+def load_food_index():
+    """Build a FoodIndex over the whole food table"""
+    fdc_ids, descriptions, categories = [], [], []
+    with get_db_connection() as conn, conn.cursor(name='food_index') as cur:
+        cur.itersize = BATCH_SIZE
+        cur.execute('SELECT fdc_id, description, category FROM "food"')
+        for fdc_id, description, category in cur:
+            fdc_ids.append(fdc_id)
+            descriptions.append(description)
+            categories.append(category)
+    return FoodIndex(fdc_ids, descriptions, categories)
+
+
+_index = None
+_loader = None
+_pending = []  # changes made while the index was loading
+_index_lock = threading.Lock()
+
+
+def _load():
+    global _index, _loader
+    try:
+        index = load_food_index()
+    except Exception as e:
+        print(f"Warning: could not build food index: {e}")
+        with _index_lock:
+            _loader = None
+        return
+    with _index_lock:
+        for change, args in _pending:
+            getattr(index, change)(*args)
+        _pending.clear()
+        _index, _loader = index, None
+
+
+def get_food_index(wait=False):
+    """
+    The process-wide food index, or None while it is still loading.
+
+    The first call starts loading it in a background thread; pass wait=True
+    to block until it is ready.
+    """
+    global _loader
+    with _index_lock:
+        if _index is None and _loader is None:
+            _loader = threading.Thread(target=_load, name='food-index', daemon=True)
+            _loader.start()
+        loader = _loader
+    if _index is None and wait and loader is not None:
+        loader.join()
+    return _index
+
+
+def _apply(change, *args):
+    with _index_lock:
+        if _index is not None:
+            getattr(_index, change)(*args)
+        elif _loader is not None:
+            _pending.append((change, args))
+
+
+def food_added(fdc_id, description, category=None):
+    """Tell the index (if loaded or loading) about a new food"""
+    _apply('add', fdc_id, description, category)
+
+
+def food_removed(fdc_id):
+    """Tell the index (if loaded or loading) about a deleted food"""
+    _apply('remove', fdc_id)
@@ -0,0 +1,540 @@
+"""
+Bulk load the USDA FoodData Central CSVs into PostgreSQL.
+
+Streams food.csv and branded_food.csv in BATCH_SIZE chunks and loads
+"food", "ingredient" and "subingredient" with COPY FROM STDIN (new names go
+to the "ingredient_name" vocabulary first). Ingredient and subingredient ids
+are assigned here (under a table lock, with the id sequences moved past
+them) so no row needs INSERT ... RETURNING.
+Ingredients are parsed in a process pool that feeds a single writer thread
+through a bounded queue.
+
+Each chunk commits together with a checkpoint in "fdc_import" (see
+migrations/003_fdc_import_state.sql), so re-running a crashed import of the
+same release resumes after the last committed chunk. --incremental applies
+a new release on top of a loaded one: changed descriptions and categories
+are updated in place, only foods whose ingredient statement hash changed
+are re-parsed, and foods missing from the release are deleted (unless a
+meal log references them). A plain import only adds foods and ingredients
+that aren't loaded yet. Foods created in the app (no fdc_import_food row)
+are never updated, re-parsed or deleted; FDC rows that collide with one are
+skipped and reported.
+
+Usage: python -m backend.ingest [--food-csv data/food.csv] [--branded-csv ...]
+                                [--category-csv ...] [--batch-size 50000] [--workers N]
+                                [--parse-cache data/parse_cache.sqlite]
+                                [--incremental] [--release NAME]
+"""
+import argparse
+import hashlib
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import psycopg2
+
+from backend.utils import get_db_connection, parse_ingredients
+from backend.ingredient_names import ingredient_name_ids, refresh_food_ingredient_sets
+from backend.parse_cache import flush_parse_cache, get_parse_cache_stats, set_parse_cache_path
+from backend.settings import (FOOD_CSV, BRANDED_CSV, FOOD_CATEGORY_CSV, BATCH_SIZE,
+                              INGEST_WORKERS, INGEST_QUEUE_SIZE)
+
+
+class Throughput:
+    """Row counter that prints rows/sec per chunk and overall"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, rows, chunk_started):
+        self.rows += rows
+        now = time.perf_counter()
+        print(f"{self.name}: +{rows} rows ({rows / max(now - chunk_started, 1e-9):,.0f} rows/s), "
+              f"{self.rows} total ({self.rate:,.0f} rows/s)")
+
+    @property
+    def rate(self):
+        return self.rows / max(time.perf_counter() - self.started, 1e-9)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return f"{self.name}: {self.rows} rows in {elapsed:.1f}s ({self.rate:,.0f} rows/s)"
+
+
+def read_chunks(path, columns, batch_size):
+    """Stream a FoodData Central CSV as strings (fdc_id as int); empty fields are NaN"""
+    dtype = {column: 'int64' if column == 'fdc_id' else object for column in columns}
+    return pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=batch_size,
+                       keep_default_na=False, na_values=[''])
+
+
+def copy_frame(cur, table, frame):
+    """COPY a DataFrame into table (columns matched by name)"""
+    buf = io.StringIO()
+    frame.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    columns = ', '.join(frame.columns)
+    cur.copy_expert(f'COPY "{table}" ({columns}) FROM STDIN WITH (FORMAT csv)', buf)
+
+
+def sync_sequence(cur, table, column):
+    """Move a serial column's sequence past the ids assigned here"""
+    cur.execute(f'''
+        SELECT setval(seq::regclass, COALESCE((SELECT max({column}) FROM "{table}"), 0) + 1, false)
+        FROM pg_get_serial_sequence(%s, %s) AS seq
+        WHERE seq IS NOT NULL
+    ''', (f'"{table}"', column))
+
+
+def available_cpus():
+    """CPUs this process may run on (sched_getaffinity is Linux-only)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def release_fingerprint(paths):
+    """Release id for a set of CSVs: changes whenever any file does"""
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        st = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def ingredients_hash(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).digest() if isinstance(text, str) else None
+
+
+def start_import(release_id, incremental, batch_size):
+    """
+    Create or resume the import of a release. Returns (phase, chunk,
+    batch_size); a resumed import keeps its original batch size so chunk
+    numbers line up.
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('''
+            INSERT INTO "fdc_import" (release_id, incremental, batch_size, phase)
+            VALUES (%s, %s, %s, 'foods')
+            ON CONFLICT (release_id) DO NOTHING
+        ''', (release_id, incremental, batch_size))
+        cur.execute('SELECT phase, chunk, batch_size FROM "fdc_import" WHERE release_id = %s',
+                    (release_id,))
+        phase, chunk, saved_batch_size = cur.fetchone()
+        cur.execute('UPDATE "fdc_import" SET incremental = %s WHERE release_id = %s AND phase <> %s',
+                    (incremental, release_id, 'done'))
+        conn.commit()
+    if phase != 'done' and (phase, chunk) != ('foods', 0):
+        print(f"Resuming import of release {release_id} at {phase} chunk {chunk}")
+    return phase, chunk, saved_batch_size
+
+
+def checkpoint(cur, release_id, phase, chunk=0):
+    """Record progress; call inside the transaction that did the work"""
+    cur.execute('''
+        UPDATE "fdc_import"
+        SET phase = %s, chunk = %s, updated_at = now(),
+            finished_at = CASE WHEN %s = 'done' THEN now() END
+        WHERE release_id = %s
+    ''', (phase, chunk, phase, release_id))
+
+
+def food_categories(category_csv, branded_csv, batch_size):
+    """
+    Category for every food: branded_food_category for branded foods,
+    food_category.description (via food_category_id) for the rest.
+    Returns (Series of branded categories by fdc_id, {food_category_id: description}).
+    """
+    by_id = pd.read_csv(category_csv, usecols=['id', 'description'], dtype=str, keep_default_na=False)
+    by_id = dict(zip(by_id['id'], by_id['description']))
+    branded = [chunk.set_index('fdc_id')['branded_food_category'].astype('category')
+               for chunk in read_chunks(branded_csv, ['fdc_id', 'branded_food_category'], batch_size)]
+    branded = pd.concat(branded) if branded else pd.Series(dtype=object)
+    return branded[~branded.index.duplicated(keep='last')], by_id
+
+
+def food_rows(chunk, branded_categories, category_names):
+    """(fdc_id, description, category) rows for a chunk of food.csv"""
+    category = branded_categories.reindex(chunk['fdc_id']).astype(object).to_numpy()
+    fallback = chunk['food_category_id'].map(category_names).to_numpy()
+    return pd.DataFrame({
+        'fdc_id': chunk['fdc_id'].to_numpy(),
+        'description': chunk['description'].to_numpy(),
+        'category': pd.Series(category).fillna(pd.Series(fallback)).to_numpy(),
+    })
+
+
+def skip_app_food_conflicts(cur):
+    """
+    Drop staged FDC foods whose fdc_id is taken by a food created in the app
+    (before app foods got their own id range, migration 006) and return
+    their ids. A food counts as FDC's when fdc_import_food records it, or when
+    its description matches (loaded before imports were recorded).
+    """
+    cur.execute('''
+        DELETE FROM food_stage s USING "food" f
+        WHERE f.fdc_id = s.fdc_id
+          AND f.description IS DISTINCT FROM s.description
+          AND NOT EXISTS (SELECT 1 FROM "fdc_import_food" i WHERE i.fdc_id = f.fdc_id)
+        RETURNING s.fdc_id
+    ''')
+    return [row[0] for row in cur.fetchall()]
+
+
+def ingest_foods(food_csv, branded_categories, category_names, batch_size, release_id,
+                 incremental=False, start_chunk=0):
+    """Load food.csv from chunk start_chunk on, recording the release each food is in"""
+    progress = Throughput('food')
+    # Incremental imports also update foods whose description or category changed
+    on_conflict = '''
+        DO UPDATE SET description = EXCLUDED.description, category = EXCLUDED.category
+        WHERE ("food".description, "food".category)
+            IS DISTINCT FROM (EXCLUDED.description, EXCLUDED.category)
+    ''' if incremental else 'DO NOTHING'
+    conflicts = []
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('CREATE TEMP TABLE food_stage (fdc_id BIGINT, description TEXT, category TEXT)')
+        chunks = read_chunks(food_csv, ['fdc_id', 'description', 'food_category_id'], batch_size)
+        for chunk_no, chunk in enumerate(chunks):
+            if chunk_no < start_chunk:
+                continue
+            chunk_started = time.perf_counter()
+            copy_frame(cur, 'food_stage', food_rows(chunk, branded_categories, category_names))
+            conflicts.extend(skip_app_food_conflicts(cur))
+            cur.execute(f'''
+                INSERT INTO "food" (fdc_id, description, category)
+                SELECT fdc_id, description, category FROM food_stage
+                ON CONFLICT (fdc_id) {on_conflict}
+            ''')
+            written = cur.rowcount
+            cur.execute('''
+                INSERT INTO "fdc_import_food" (fdc_id, release_id)
+                SELECT fdc_id, %s FROM food_stage
+                ON CONFLICT (fdc_id) DO UPDATE SET release_id = EXCLUDED.release_id
+            ''', (release_id,))
+            cur.execute('TRUNCATE food_stage')
+            checkpoint(cur, release_id, 'foods', chunk_no + 1)
+            conn.commit()
+            progress.add(written, chunk_started)
+        if conflicts:
+            print(f"Skipped {len(conflicts)} FDC foods whose fdc_id belongs to a food created in "
+                  f"the app (first: {', '.join(map(str, conflicts[:10]))})")
+        checkpoint(cur, release_id, 'ingredients')
+        conn.commit()
+    return progress
+
+
+def _cache_counts():
+    stats = get_parse_cache_stats()
+    return stats['hits'] + stats['disk_hits'], stats['hits'] + stats['disk_hits'] + stats['misses']
+
+
+def parse_chunk(fdc_ids, texts):
+    """
+    Parse ingredient strings (runs in worker processes). Returns
+    ([(fdc_id, ingredient, subs)], parse cache hits, parse cache lookups).
+    """
+    hits, lookups = _cache_counts()
+    parsed = [(fdc_id, ingredient, subs)
+              for fdc_id, text in zip(fdc_ids, texts) if isinstance(text, str)
+              for ingredient, subs in parse_ingredients(text)]
+    flush_parse_cache()
+    after_hits, after_lookups = _cache_counts()
+    return parsed, after_hits - hits, after_lookups - lookups
+
+
+def _pool_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def parallel_parse(batches, workers, max_pending=None):
+    """
+    Parse (fdc_ids, texts) batches in `workers` processes, yielding the
+    parse_chunk results in input order. At most max_pending batches (default one more
+    than the workers) are in flight, so the reader can't run ahead of the
+    parsers and fill memory. workers <= 1 parses in this process.
+    """
+    if workers <= 1:
+        for fdc_ids, texts in batches:
+            yield parse_chunk(fdc_ids, texts)
+        return
+    max_pending = max_pending or workers + 1
+    # Workers come from a fork server, not a fork of this process: the
+    # ingest writer thread is running here by then, and a fork could copy a
+    # lock it holds or its database connection into every worker
+    with ProcessPoolExecutor(workers, mp_context=_pool_context()) as pool:
+        pending = deque()
+        for fdc_ids, texts in batches:
+            pending.append(pool.submit(parse_chunk, fdc_ids, texts))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def ingredient_frames(parsed, name_ids):
+    """
+    Turn parsed (fdc_id, ingredient, subs) tuples into ingredient and
+    subingredient frames (names as ids from name_ids), numbering both from
+    0 (shift by the real starting ids to load)
+    """
+    ingredients, subingredients = [], []
+    for ingredient_id, (fdc_id, ingredient, subs) in enumerate(parsed):
+        ingredients.append((ingredient_id, fdc_id, name_ids[ingredient]))
+        first_sub_id = len(subingredients)
+        subingredients.extend((first_sub_id + i, ingredient_id, name_ids[sub]) for i, sub in enumerate(subs))
+    return (pd.DataFrame(ingredients, columns=['id', 'fdc_id', 'name_id']),
+            pd.DataFrame(subingredients, columns=['id', 'ingredient_id', 'name_id']))
+
+
+def ingredient_batches(branded_csv, batch_size, incremental=False, start_chunk=0):
+    """
+    (chunk number, fdc_ids, ingredient texts, text hashes) per chunk of
+    branded_food.csv, for loaded FDC foods whose ingredients need loading:
+    those with none yet or, incremental, those whose statement hash changed.
+    Foods not recorded in fdc_import_food (created in the app) are left alone.
+    """
+    if incremental:
+        pending_sql = '''
+            SELECT s.fdc_id, s.ingredients_hash FROM "fdc_import_food" s
+            WHERE s.fdc_id = ANY(%s)
+        '''
+    else:
+        pending_sql = '''
+            SELECT s.fdc_id, NULL FROM "fdc_import_food" s
+            WHERE s.fdc_id = ANY(%s)
+              AND NOT EXISTS (SELECT 1 FROM "ingredient" i WHERE i.fdc_id = s.fdc_id)
+        '''
+    with get_db_connection() as conn, conn.cursor() as cur:
+        chunks = read_chunks(branded_csv, ['fdc_id', 'ingredients'], batch_size)
+        for chunk_no, chunk in enumerate(chunks):
+            if chunk_no < start_chunk:
+                continue
+            cur.execute(pending_sql, (chunk['fdc_id'].tolist(),))
+            conn.commit()
+            stored = {fdc_id: None if h is None else bytes(h) for fdc_id, h in cur.fetchall()}
+            fdc_ids, texts, hashes = [], [], []
+            for fdc_id, text in zip(chunk['fdc_id'].tolist(), chunk['ingredients'].tolist()):
+                text_hash = ingredients_hash(text)
+                if fdc_id in stored and (not incremental or stored[fdc_id] != text_hash):
+                    fdc_ids.append(fdc_id)
+                    texts.append(text)
+                    hashes.append(text_hash)
+            yield chunk_no, fdc_ids, texts, hashes
+
+
+def delete_ingredients(cur, fdc_ids):
+    """Remove the ingredient and subingredient rows (and ingredient sets) of foods"""
+    cur.execute('DELETE FROM "food_ingredient_set" WHERE fdc_id = ANY(%s)', (fdc_ids,))
+    cur.execute('''
+        DELETE FROM "subingredient"
+        WHERE ingredient_id IN (SELECT id FROM "ingredient" WHERE fdc_id = ANY(%s))
+    ''', (fdc_ids,))
+    cur.execute('DELETE FROM "ingredient" WHERE fdc_id = ANY(%s)', (fdc_ids,))
+
+
+def write_ingredients(cur, parsed):
+    """Load one parsed chunk; returns (ingredient rows, subingredient rows)"""
+    name_ids = ingredient_name_ids({name for _, ingredient, subs in parsed for name in (ingredient, *subs)})
+    ingredients, subingredients = ingredient_frames(parsed, name_ids)
+
+    # Ids are read and the sequences moved under a lock that blocks
+    # concurrent inserts until this chunk commits
+    cur.execute('LOCK TABLE "ingredient", "subingredient" IN SHARE ROW EXCLUSIVE MODE')
+    cur.execute('SELECT COALESCE(max(id), 0) FROM "ingredient"')
+    ingredient_base = cur.fetchone()[0] + 1
+    cur.execute('SELECT COALESCE(max(id), 0) FROM "subingredient"')
+    sub_base = cur.fetchone()[0] + 1
+    ingredients['id'] += ingredient_base
+    subingredients['ingredient_id'] += ingredient_base
+    subingredients['id'] += sub_base
+
+    copy_frame(cur, 'ingredient', ingredients)
+    copy_frame(cur, 'subingredient', subingredients)
+    sync_sequence(cur, 'ingredient', 'id')
+    sync_sequence(cur, 'subingredient', 'id')
+    return len(ingredients), len(subingredients)
+
+
+def _writer(parsed_queue, release_id, incremental, progress, sub_progress, errors):
+    """Database writer thread: load parsed chunks from the queue until None"""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        while True:
+            item = parsed_queue.get()
+            if item is None:
+                return
+            if errors:
+                continue  # drain so the producer never blocks
+            chunk_no, fdc_ids, hashes, parsed = item
+            chunk_started = time.perf_counter()
+            try:
+                rows = sub_rows = 0
+                if incremental and fdc_ids:
+                    delete_ingredients(cur, fdc_ids)
+                if parsed:
+                    rows, sub_rows = write_ingredients(cur, parsed)
+                    refresh_food_ingredient_sets(cur, fdc_ids)
+                cur.execute('''
+                    INSERT INTO "fdc_import_food" (fdc_id, release_id, ingredients_hash)
+                    SELECT fdc_id, %s, ingredients_hash
+                    FROM unnest(%s::bigint[], %s::bytea[]) AS t (fdc_id, ingredients_hash)
+                    ON CONFLICT (fdc_id) DO UPDATE SET ingredients_hash = EXCLUDED.ingredients_hash
+                ''', (release_id, fdc_ids, [h and psycopg2.Binary(h) for h in hashes]))
+                checkpoint(cur, release_id, 'ingredients', chunk_no + 1)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                errors.append(e)
+                continue
+            progress.add(rows, chunk_started)
+            sub_progress.rows += sub_rows
+
+
+def ingest_ingredients(branded_csv, batch_size, release_id, incremental=False, start_chunk=0,
+                       workers=None):
+    """
+    Parse and load ingredients: reader -> process pool -> bounded queue ->
+    one writer thread doing COPY, so parsing, reading and loading overlap.
+    """
+    workers = workers or INGEST_WORKERS or available_cpus()
+    progress = Throughput('ingredient')
+    sub_progress = Throughput('subingredient')
+    parsed_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    errors = []
+    writer = threading.Thread(target=_writer, name='ingest-writer',
+                              args=(parsed_queue, release_id, incremental, progress, sub_progress, errors))
+    writer.start()
+
+    # parallel_parse keeps batch order, so each result belongs to the oldest chunk read
+    chunks = deque()
+
+    def batches():
+        for chunk_no, fdc_ids, texts, hashes in ingredient_batches(branded_csv, batch_size,
+                                                                   incremental, start_chunk):
+            chunks.append((chunk_no, fdc_ids, hashes))
+            yield fdc_ids, texts
+
+    cache_hits = cache_lookups = 0
+    try:
+        for parsed, hits, lookups in parallel_parse(batches(), workers):
+            if errors:
+                break
+            parsed_queue.put(chunks.popleft() + (parsed,))
+            cache_hits += hits
+            cache_lookups += lookups
+    finally:
+        parsed_queue.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
+    with get_db_connection() as conn, conn.cursor() as cur:
+        checkpoint(cur, release_id, 'deletes')
+        conn.commit()
+    print(f"parse cache: {cache_hits} of {cache_lookups} ingredient statements reused "
+          f"({cache_hits / max(cache_lookups, 1):.1%} hit rate)")
+    return progress, sub_progress
+
+
+def delete_missing_foods(release_id, batch_size):
+    """
+    Delete FDC foods that are not in this release, batch_size per commit.
+    Foods a meal log references are kept.
+    """
+    progress = Throughput('deleted food')
+    with get_db_connection() as conn, conn.cursor() as cur:
+        chunk_no = 0
+        while True:
+            chunk_started = time.perf_counter()
+            cur.execute('''
+                SELECT s.fdc_id FROM "fdc_import_food" s
+                WHERE s.release_id <> %s
+                  AND NOT EXISTS (SELECT 1 FROM "foodlogentry" e WHERE e.fdc_id = s.fdc_id)
+                LIMIT %s
+            ''', (release_id, batch_size))
+            fdc_ids = [row[0] for row in cur.fetchall()]
+            if not fdc_ids:
+                break
+            delete_ingredients(cur, fdc_ids)
+            cur.execute('DELETE FROM "food" WHERE fdc_id = ANY(%s)', (fdc_ids,))
+            cur.execute('DELETE FROM "fdc_import_food" WHERE fdc_id = ANY(%s)', (fdc_ids,))
+            chunk_no += 1
+            checkpoint(cur, release_id, 'deletes', chunk_no)
+            conn.commit()
+            progress.add(len(fdc_ids), chunk_started)
+
+        cur.execute('SELECT count(*) FROM "fdc_import_food" WHERE release_id <> %s', (release_id,))
+        kept = cur.fetchone()[0]
+        if kept:
+            print(f"Kept {kept} foods that are not in release {release_id}: meals reference them")
+        checkpoint(cur, release_id, 'done')
+        conn.commit()
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--food-csv', default=FOOD_CSV)
+    parser.add_argument('--branded-csv', default=BRANDED_CSV)
+    parser.add_argument('--category-csv', default=FOOD_CATEGORY_CSV)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='ingredient parser processes (default: INGEST_WORKERS or all cores)')
+    parser.add_argument('--parse-cache', default=None,
+                        help='SQLite file of parsed ingredient statements to reuse across imports')
+    parser.add_argument('--incremental', action='store_true',
+                        help='update changed foods and delete foods missing from this release')
+    parser.add_argument('--release', default=None,
+                        help='release name for checkpoints (default: fingerprint of the CSV files)')
+    parser.add_argument('--skip-foods', action='store_true', help='only load ingredients')
+    args = parser.parse_args()
+    if args.parse_cache:
+        set_parse_cache_path(args.parse_cache)
+
+    release_id = args.release or release_fingerprint([args.food_csv, args.branded_csv,
+                                                      args.category_csv])
+    phase, chunk, batch_size = start_import(release_id, args.incremental, args.batch_size)
+    if phase == 'done':
+        print(f"Release {release_id} is already imported.")
+        return
+
+    reports = []
+    if phase == 'foods':
+        if args.skip_foods:
+            with get_db_connection() as conn, conn.cursor() as cur:
+                checkpoint(cur, release_id, 'ingredients')
+                conn.commit()
+        else:
+            branded, by_id = food_categories(args.category_csv, args.branded_csv, batch_size)
+            reports.append(ingest_foods(args.food_csv, branded, by_id, batch_size, release_id,
+                                        args.incremental, chunk))
+        phase, chunk = 'ingredients', 0
+    if phase == 'ingredients':
+        reports.extend(ingest_ingredients(args.branded_csv, batch_size, release_id,
+                                          args.incremental, chunk, args.workers))
+    if args.incremental:
+        reports.append(delete_missing_foods(release_id, batch_size))
+    else:
+        # A plain import (or an incremental one resumed as plain) deletes nothing
+        with get_db_connection() as conn, conn.cursor() as cur:
+            checkpoint(cur, release_id, 'done')
+            conn.commit()
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('ANALYZE "food"; ANALYZE "ingredient"; ANALYZE "subingredient"')
+        conn.commit()
+    for report in reports:
+        print(report.summary())
+
+
+if __name__ == '__main__':
+    main()
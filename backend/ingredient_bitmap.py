@@ -0,0 +1,149 @@
+"""
+Per-process bitmap of which foods have ingredients, keyed by fdc_id.
+Answers "does this food have ingredients?" (View Ingredients buttons) with
+no database round trip. Loaded on first use and reloaded in the background
+every INGREDIENT_BITMAP_TTL seconds to pick up other workers' changes;
+changes made in this process are applied immediately.
+"""
+import threading
+import time
+
+import numpy as np
+
+from backend.utils import get_db_connection
+from backend.settings import APP_FOOD_ID_START, INGREDIENT_BITMAP_TTL
+
+
+class FdcBitmap:
+    """
+    Growable packed bitset of fdc_ids (one bit per id). Ids of foods created
+    in the app (APP_FOOD_ID_START and up) are kept in a set instead.
+    """
+
+    def __init__(self, fdc_ids=()):
+        fdc_ids = np.asarray(fdc_ids, dtype=np.int64)
+        app = fdc_ids >= APP_FOOD_ID_START
+        self.app_ids = set(fdc_ids[app].tolist())
+        fdc_ids = fdc_ids[~app]
+        size = int(fdc_ids.max()) + 1 if len(fdc_ids) else 0
+        flags = np.zeros(size, dtype=bool)
+        flags[fdc_ids] = True
+        self.bits = np.packbits(flags, bitorder='little')
+
+    def __contains__(self, fdc_id):
+        return bool(self.contains([fdc_id])[0])
+
+    def contains(self, fdc_ids):
+        """Boolean array: which of fdc_ids are set"""
+        fdc_ids = np.asarray(fdc_ids, dtype=np.int64)
+        inside = (fdc_ids >= 0) & (fdc_ids >> 3 < len(self.bits))
+        result = np.zeros(len(fdc_ids), dtype=bool)
+        ids = fdc_ids[inside]
+        result[inside] = (self.bits[ids >> 3] >> (ids & 7)) & 1
+        if self.app_ids:
+            app = fdc_ids >= APP_FOOD_ID_START
+            result[app] = [fdc_id in self.app_ids for fdc_id in fdc_ids[app].tolist()]
+        return result
+
+    def set(self, fdc_id, value=True):
+        if fdc_id >= APP_FOOD_ID_START:
+            if value:
+                self.app_ids.add(fdc_id)
+            else:
+                self.app_ids.discard(fdc_id)
+            return
+        byte, bit = fdc_id >> 3, fdc_id & 7
+        if byte >= len(self.bits):
+            if not value:
+                return
+            self.bits = np.concatenate([self.bits, np.zeros(byte + 1 - len(self.bits), dtype=np.uint8)])
+        if value:
+            self.bits[byte] |= np.uint8(1 << bit)
+        else:
+            self.bits[byte] &= np.uint8(~(1 << bit) & 0xFF)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes + 8 * len(self.app_ids)
+
+
+def load_ingredient_bitmap():
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('SELECT DISTINCT fdc_id FROM "ingredient"')
+        return FdcBitmap([row[0] for row in cur.fetchall()])
+
+
+_bitmap = None
+_loaded_at = 0.0
+_loading = False
+_changes = []  # (fdc_id, value) made while a load was running
+_lock = threading.Lock()
+_first_load = threading.Lock()
+
+
+def _load():
+    global _bitmap, _loaded_at, _loading
+    with _lock:
+        _loading = True
+    try:
+        bitmap = load_ingredient_bitmap()
+    except BaseException:
+        with _lock:
+            _loading = False
+            _changes.clear()
+        raise
+    with _lock:
+        for fdc_id, value in _changes:
+            bitmap.set(fdc_id, value)
+        _changes.clear()
+        _bitmap, _loaded_at, _loading = bitmap, time.monotonic(), False
+
+
+def _reload_in_background():
+    try:
+        _load()
+    except Exception as e:
+        print(f"Warning: could not reload ingredient bitmap: {e}")
+
+
+def get_ingredient_bitmap():
+    """The process-wide bitmap: loaded on first use, refreshed in the background"""
+    global _loading
+    if _bitmap is None:
+        with _first_load:
+            if _bitmap is None:
+                _load()
+    elif time.monotonic() - _loaded_at >= INGREDIENT_BITMAP_TTL and not _loading:
+        with _lock:
+            start, _loading = not _loading, True
+        if start:
+            threading.Thread(target=_reload_in_background, name='ingredient-bitmap',
+                             daemon=True).start()
+    return _bitmap
+
+
+def preload_ingredient_bitmap():
+    """Start the first load in the background so no request waits for it"""
+    if _bitmap is None and not _loading:
+        threading.Thread(target=_preload, name='ingredient-bitmap', daemon=True).start()
+
+
+def _preload():
+    try:
+        get_ingredient_bitmap()
+    except Exception as e:
+        print(f"Warning: could not load ingredient bitmap: {e}")
+
+
+def has_ingredients(fdc_ids):
+    """Boolean array: which of fdc_ids have at least one ingredient row"""
+    return get_ingredient_bitmap().contains(fdc_ids)
+
+
+def set_has_ingredients(fdc_id, value=True):
+    """Record that a food gained (or lost) its ingredients in this process"""
+    with _lock:
+        if _bitmap is not None:
+            _bitmap.set(fdc_id, value)
+        if _loading:
+            _changes.append((fdc_id, value))
@@ -0,0 +1,80 @@
+"""
+Canonical ingredient vocabulary ("ingredient_name", see
+migrations/004_ingredient_name.sql). ingredient and subingredient rows
+reference names by integer id; names are only ever added, so resolved ids
+are memoized per process. Also maintains each food's flattened set of name
+ids ("food_ingredient_set", migrations/005_food_ingredient_set.sql).
+"""
+import threading
+
+from backend.utils import get_db_connection
+
+_ids = {}  # name -> ingredient_name.id
+_lock = threading.Lock()
+
+
+def ingredient_name_ids(names):
+    """
+    {name: id} for names, adding new names to the vocabulary. New names are
+    committed on their own connection, so the ids stay valid even if the
+    caller's transaction rolls back.
+    """
+    names = set(names)
+    with _lock:
+        missing = [name for name in names if name not in _ids]
+    if missing:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('''
+                INSERT INTO "ingredient_name" (name) SELECT unnest(%s::text[])
+                ON CONFLICT (name) DO NOTHING
+            ''', (missing,))
+            conn.commit()
+            # A separate statement, so it also sees names other sessions just added
+            cur.execute('SELECT name, id FROM "ingredient_name" WHERE name = ANY(%s)', (missing,))
+            found = dict(cur.fetchall())
+            conn.commit()
+        with _lock:
+            _ids.update(found)
+    with _lock:
+        return {name: _ids[name] for name in names}
+
+
+# Same query as the backfill in migrations/005_food_ingredient_set.sql,
+# restricted to some foods
+_REFRESH_SETS = '''
+    INSERT INTO "food_ingredient_set" (fdc_id, ingredient_ids, subingredient_ids)
+    SELECT ings.fdc_id, ings.name_ids, COALESCE(subs.name_ids, '{}')
+    FROM (
+        SELECT fdc_id, array_agg(name_id ORDER BY first_id) AS name_ids
+        FROM (
+            SELECT fdc_id, name_id, min(id) AS first_id
+            FROM "ingredient"
+            WHERE fdc_id = ANY(%(fdc_ids)s)
+            GROUP BY fdc_id, name_id
+        ) firsts
+        GROUP BY fdc_id
+    ) ings
+    LEFT JOIN (
+        SELECT fdc_id, array_agg(name_id ORDER BY first_id) AS name_ids
+        FROM (
+            SELECT i.fdc_id, s.name_id, min(s.id) AS first_id
+            FROM "subingredient" s
+            JOIN "ingredient" i ON i.id = s.ingredient_id
+            WHERE i.fdc_id = ANY(%(fdc_ids)s)
+            GROUP BY i.fdc_id, s.name_id
+        ) firsts
+        GROUP BY fdc_id
+    ) subs USING (fdc_id)
+'''
+
+
+def refresh_food_ingredient_sets(cur, fdc_ids):
+    """
+    Rebuild the "food_ingredient_set" rows of foods from their ingredient
+    and subingredient rows (call in the transaction that changed them)
+    """
+    fdc_ids = [int(fdc_id) for fdc_id in fdc_ids]
+    if not fdc_ids:
+        return
+    cur.execute('DELETE FROM "food_ingredient_set" WHERE fdc_id = ANY(%s)', (fdc_ids,))
+    cur.execute(_REFRESH_SETS, {'fdc_ids': fdc_ids})
@@ -0,0 +1,79 @@
+"""
+Apply the SQL migrations in backend/migrations/ in filename order.
+Applied migrations are recorded in "schema_migration" so each runs once;
+every migration runs in its own transaction.
+
+Usage: python -m backend.migrate [--list]
+"""
+import argparse
+import os
+
+import psycopg2
+
+from backend.utils import get_db_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+
+def migration_files():
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith('.sql'))
+
+
+def applied_migrations(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS "schema_migration" (
+            name TEXT PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    ''')
+    cur.execute('SELECT name FROM "schema_migration"')
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate():
+    """Apply pending migrations; returns the names applied"""
+    applied = []
+    with get_db_connection() as conn, conn.cursor() as cur:
+        done = applied_migrations(cur)
+        conn.commit()
+        for name in migration_files():
+            if name in done:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                sql = f.read()
+            try:
+                cur.execute(sql)
+                cur.execute('INSERT INTO "schema_migration" (name) VALUES (%s)', (name,))
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+                raise
+            finally:
+                # RAISE NOTICE / WARNING output, e.g. rows a migration dropped
+                for notice in conn.notices:
+                    print(f"{name}: {notice.strip()}")
+                del conn.notices[:]
+            applied.append(name)
+            print(f"Applied migration {name}")
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--list', action='store_true', help='show migration status and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            done = applied_migrations(cur)
+            conn.commit()
+        for name in migration_files():
+            print(f"{'applied' if name in done else 'pending':>8}  {name}")
+        return
+
+    if not migrate():
+        print("No pending migrations.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+-- Trigram index for ranked food search (backend/search.py).
+-- pg_trgm may be unavailable (extension not installed or no privilege to
+-- create it); search then falls back to a bounded ILIKE scan.
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN insufficient_privilege OR undefined_file OR feature_not_supported THEN
+    RAISE NOTICE 'pg_trgm unavailable (%), food search will use the ILIKE fallback', SQLERRM;
+END
+$$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        -- Serves ILIKE '%q%', ILIKE 'q%' and the word-similarity operator
+        EXECUTE 'CREATE INDEX IF NOT EXISTS food_description_trgm_idx
+                 ON "food" USING gin (description gin_trgm_ops)';
+    END IF;
+END
+$$;
+
+-- Exact / prefix matches on lower(description) without pg_trgm
+CREATE INDEX IF NOT EXISTS food_description_lower_idx
+    ON "food" (lower(description) text_pattern_ops);
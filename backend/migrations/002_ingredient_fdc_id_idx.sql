@@ -0,0 +1,3 @@
+-- Per-food ingredient lookups (search has_ingredients flag, ingredient
+-- lists, user data loads) probe ingredient by fdc_id.
+CREATE INDEX IF NOT EXISTS ingredient_fdc_id_idx ON "ingredient" (fdc_id);
@@ -0,0 +1,25 @@
+-- State for resumable and incremental FoodData Central imports
+-- (backend/ingest.py).
+
+-- Foods that came from FDC: the release they were last seen in and a hash
+-- of their ingredient statement. Foods created in the app have no row here,
+-- so an incremental import never deletes them.
+CREATE TABLE IF NOT EXISTS "fdc_import_food" (
+    fdc_id BIGINT PRIMARY KEY,
+    release_id TEXT NOT NULL,
+    ingredients_hash BYTEA
+);
+CREATE INDEX IF NOT EXISTS fdc_import_food_release_idx ON "fdc_import_food" (release_id);
+
+-- One row per import run; the phase and chunk reached are committed with
+-- each chunk's data, so a crashed import resumes from its last chunk.
+CREATE TABLE IF NOT EXISTS "fdc_import" (
+    release_id TEXT PRIMARY KEY,
+    incremental BOOLEAN NOT NULL,
+    batch_size INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    chunk INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NOT NULL DEFAULT now(),
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at TIMESTAMP
+);
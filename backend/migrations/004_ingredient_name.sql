@@ -0,0 +1,62 @@
+-- Canonical ingredient vocabulary (backend/ingredient_names.py).
+-- ingredient and subingredient rows store an integer name_id instead of
+-- repeating the same text ("SALT", "WATER", ...) millions of times, so
+-- analysis groups and joins on integers and both tables shrink.
+CREATE TABLE IF NOT EXISTS "ingredient_name" (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+INSERT INTO "ingredient_name" (name)
+SELECT ingredient FROM "ingredient" WHERE ingredient IS NOT NULL
+UNION
+SELECT sub_ingredient FROM "subingredient" WHERE sub_ingredient IS NOT NULL
+ON CONFLICT (name) DO NOTHING;
+
+-- Backfill the ids, then drop the text columns
+ALTER TABLE "ingredient" ADD COLUMN name_id INTEGER REFERENCES "ingredient_name" (id);
+UPDATE "ingredient" i SET name_id = n.id
+FROM "ingredient_name" n WHERE n.name = i.ingredient;
+ALTER TABLE "subingredient" ADD COLUMN name_id INTEGER REFERENCES "ingredient_name" (id);
+UPDATE "subingredient" s SET name_id = n.id
+FROM "ingredient_name" n WHERE n.name = s.sub_ingredient;
+
+-- A named row left without an id would be lost: fail the migration instead.
+-- Rows with no name at all can't be kept once name_id is NOT NULL; they are
+-- deleted and counted (backend.migrate prints the warning).
+DO $$
+DECLARE
+    unmapped BIGINT;
+    unnamed_ingredients BIGINT;
+    unnamed_subingredients BIGINT;
+BEGIN
+    SELECT (SELECT count(*) FROM "ingredient" WHERE name_id IS NULL AND ingredient IS NOT NULL)
+         + (SELECT count(*) FROM "subingredient" WHERE name_id IS NULL AND sub_ingredient IS NOT NULL)
+    INTO unmapped;
+    IF unmapped > 0 THEN
+        RAISE EXCEPTION '% ingredient/subingredient names have no ingredient_name id', unmapped;
+    END IF;
+    SELECT count(*) INTO unnamed_ingredients FROM "ingredient" WHERE name_id IS NULL;
+    SELECT count(*) INTO unnamed_subingredients FROM "subingredient"
+    WHERE name_id IS NULL
+       OR ingredient_id IN (SELECT id FROM "ingredient" WHERE name_id IS NULL);
+    IF unnamed_ingredients + unnamed_subingredients > 0 THEN
+        RAISE WARNING 'Deleting % ingredient and % subingredient rows without a name',
+            unnamed_ingredients, unnamed_subingredients;
+    END IF;
+END $$;
+
+DELETE FROM "subingredient"
+WHERE name_id IS NULL
+   OR ingredient_id IN (SELECT id FROM "ingredient" WHERE name_id IS NULL);
+DELETE FROM "ingredient" WHERE name_id IS NULL;
+ALTER TABLE "ingredient" DROP COLUMN ingredient, ALTER COLUMN name_id SET NOT NULL;
+ALTER TABLE "subingredient" DROP COLUMN sub_ingredient, ALTER COLUMN name_id SET NOT NULL;
+
+-- Subingredients are always read through their ingredient
+CREATE INDEX IF NOT EXISTS subingredient_ingredient_id_idx ON "subingredient" (ingredient_id);
+
+-- Rewrite both tables (reclaims the dropped text and the backfill's dead
+-- rows) in the order they are read: by food, then by ingredient
+CLUSTER "ingredient" USING ingredient_fdc_id_idx;
+CLUSTER "subingredient" USING subingredient_ingredient_id_idx;
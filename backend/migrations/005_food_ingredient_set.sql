@@ -0,0 +1,33 @@
+-- Each food's flattened ingredient set (backend/ingredient_names.py), so a
+-- food's full exposure is a single-row lookup instead of a join of
+-- ingredient and subingredient. Name ids are distinct per kind and kept in
+-- label order (first occurrence). Foods without ingredients have no row.
+-- Maintained by every writer through refresh_food_ingredient_sets.
+CREATE TABLE IF NOT EXISTS "food_ingredient_set" (
+    fdc_id BIGINT PRIMARY KEY,
+    ingredient_ids INTEGER[] NOT NULL,
+    subingredient_ids INTEGER[] NOT NULL
+);
+
+INSERT INTO "food_ingredient_set" (fdc_id, ingredient_ids, subingredient_ids)
+SELECT ings.fdc_id, ings.name_ids, COALESCE(subs.name_ids, '{}')
+FROM (
+    SELECT fdc_id, array_agg(name_id ORDER BY first_id) AS name_ids
+    FROM (
+        SELECT fdc_id, name_id, min(id) AS first_id
+        FROM "ingredient"
+        GROUP BY fdc_id, name_id
+    ) firsts
+    GROUP BY fdc_id
+) ings
+LEFT JOIN (
+    SELECT fdc_id, array_agg(name_id ORDER BY first_id) AS name_ids
+    FROM (
+        SELECT i.fdc_id, s.name_id, min(s.id) AS first_id
+        FROM "subingredient" s
+        JOIN "ingredient" i ON i.id = s.ingredient_id
+        GROUP BY i.fdc_id, s.name_id
+    ) firsts
+    GROUP BY fdc_id
+) subs USING (fdc_id)
+ON CONFLICT (fdc_id) DO NOTHING;
@@ -0,0 +1,10 @@
+-- Foods created in the app (create_food_item, saved meal combinations) take
+-- their fdc_id from a sequence that starts far above FoodData Central's ids
+-- (APP_FOOD_ID_START in backend/settings.py), so a later FDC release can't
+-- reuse one of them. The import no longer moves this sequence.
+CREATE SEQUENCE IF NOT EXISTS "app_food_id_seq" START WITH 1000000000;
+ALTER SEQUENCE "app_food_id_seq" OWNED BY "food".fdc_id;
+ALTER TABLE "food" ALTER COLUMN fdc_id SET DEFAULT nextval('app_food_id_seq');
+
+-- App foods created before this migration keep their ids; the import skips
+-- FDC rows that collide with them (see ingest_foods).
@@ -0,0 +1,8 @@
+-- Per-user generation of the Dashboard calendar's cached entries
+-- (backend/calendar_cache.py). Every worker reads it before using its cache
+-- and writers bump it, so a change made through one worker invalidates the
+-- ranges every other worker holds for that user.
+CREATE TABLE IF NOT EXISTS "calendar_generation" (
+    user_id INTEGER PRIMARY KEY,
+    generation BIGINT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,7 @@
+-- Per-user generation of the cached user data (backend/cache.py). Writers
+-- that edit or delete log entries bump it; a worker's delta refresh only
+-- sees new rows, so when the generation moved it reloads the user in full.
+CREATE TABLE IF NOT EXISTS "user_data_generation" (
+    user_id INTEGER PRIMARY KEY,
+    generation BIGINT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,168 @@
+"""
+Memoized ingredient parsing.
+
+Many branded foods share an ingredient statement (store brands, package
+sizes), so parse results are cached by a blake2b hash of the statement in
+the form the parser sees (upper-cased). The per-process LRU can be backed
+by a SQLite file (PARSE_CACHE_PATH, or parse_cache_path in backend/.env)
+shared by all processes on the host and kept across imports. The parser
+version is part of the key, so changing the parser never serves stale
+results from the file.
+"""
+import atexit
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+
+from backend.utils import parse_ingredients_uncached
+from backend.cache_backends import LRUCache
+from backend.settings import (PARSE_CACHE_PATH, PARSE_CACHE_MAX_ENTRIES, PARSE_CACHE_MAX_BYTES,
+                              PARSE_CACHE_FLUSH_EVERY)
+
+# Bump whenever parse_ingredients_uncached changes its output
+PARSER_VERSION = b'2'
+
+
+def parse_key(ingredient_str):
+    """Cache key of an ingredient statement"""
+    return hashlib.blake2b(ingredient_str.upper().encode(), digest_size=16,
+                           key=PARSER_VERSION).digest()
+
+
+class ParseCache:
+    """
+    LRU of parse results in front of an optional SQLite store. New results
+    are written to the store in batches of flush_every (and by flush()).
+    """
+
+    def __init__(self, parse, path=None, max_entries=None, max_bytes=None, flush_every=1000):
+        self._parse = parse
+        self.path = path
+        self.flush_every = flush_every
+        self._memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._pending = {}
+        self._db = None
+        self._db_pid = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _store(self):
+        # One connection per process (a forked worker must not reuse its parent's)
+        if self._db is None or self._db_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS parse (key BLOB PRIMARY KEY, value BLOB)')
+            self._db_pid = os.getpid()
+            self._pending = {}
+        return self._db
+
+    def parse(self, ingredient_str):
+        """Parsed [(ingredient, [subs])]; shared with the cache, don't modify it"""
+        if not ingredient_str:
+            return []
+        key = parse_key(ingredient_str)
+        parsed = self._memory.get(key)
+        if parsed is not None:
+            with self._lock:
+                self.hits += 1
+            return parsed
+        if self.path:
+            with self._lock:
+                row = self._store().execute('SELECT value FROM parse WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                parsed = pickle.loads(row[0])
+                self._memory.put(key, parsed)
+                with self._lock:
+                    self.disk_hits += 1
+                return parsed
+        parsed = self._parse(ingredient_str)
+        self._memory.put(key, parsed)
+        with self._lock:
+            self.misses += 1
+            if self.path:
+                self._store()
+                self._pending[key] = pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL)
+                if len(self._pending) >= self.flush_every:
+                    self._flush()
+        return parsed
+
+    def flush(self):
+        """Write pending results to the SQLite store"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending or self._db_pid != os.getpid():
+            return
+        try:
+            with self._db:
+                self._db.executemany('INSERT OR IGNORE INTO parse (key, value) VALUES (?, ?)',
+                                     self._pending.items())
+        except sqlite3.Error as e:
+            print(f"Warning: could not save parse cache: {e}")
+        self._pending = {}
+
+    def set_path(self, path):
+        """Switch to another SQLite store (None for memory only)"""
+        with self._lock:
+            self._flush()
+            self.path, self._db, self._db_pid = path, None, None
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._pending = {}
+            if self.path:
+                with self._store():
+                    self._db.execute('DELETE FROM parse')
+
+    def stats(self):
+        """Memory/disk hits, misses and hit rate in this process"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._memory),
+                'bytes': self._memory.bytes,
+                'path': self.path,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_parse_cache = ParseCache(parse_ingredients_uncached,
+                          path=os.getenv('parse_cache_path', PARSE_CACHE_PATH),
+                          max_entries=PARSE_CACHE_MAX_ENTRIES, max_bytes=PARSE_CACHE_MAX_BYTES,
+                          flush_every=PARSE_CACHE_FLUSH_EVERY)
+atexit.register(_parse_cache.flush)
+
+
+def cached_parse(ingredient_str):
+    return _parse_cache.parse(ingredient_str)
+
+
+def set_parse_cache_path(path):
+    """Persist parse results in a SQLite file, here and in worker processes started later"""
+    os.environ['parse_cache_path'] = path
+    _parse_cache.set_path(path)
+
+
+def clear_parse_cache():
+    """Forget all parse results (including the SQLite store, if any)"""
+    _parse_cache.clear()
+
+
+def flush_parse_cache():
+    _parse_cache.flush()
+
+
+def get_parse_cache_stats():
+    return _parse_cache.stats()
@@ -0,0 +1,204 @@
+"""
+Ranked food search for FoodSymptoms app.
+Matches are ranked exact > prefix > substring > fuzzy. Uses the pg_trgm GIN
+index from migrations/001_food_search_trgm.sql when the extension is
+installed, and a bounded ILIKE scan otherwise.
+
+Results are paged with a keyset cursor: the sort key (rank, score,
+description, fdc_id) of the last row of a page, so fetching page N+1 never
+re-reads or ships pages 1..N. Pages and counts are cached per normalized
+query (lowercase, single spaces) until a food is created or removed.
+"""
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+
+from backend.utils import get_db_connection
+from backend.cache_backends import LRUCache
+from backend.settings import (FOOD_SEARCH_LIMIT, FOOD_SEARCH_PAGE_SIZE, FOOD_SEARCH_COUNT_LIMIT,
+                              FOOD_SEARCH_CACHE_MAX_ENTRIES, FOOD_SEARCH_CACHE_MAX_BYTES,
+                              FOOD_SEARCH_CACHE_TTL)
+
+SEARCH_COLUMNS = ['fdc_id', 'description', 'category', 'has_ingredients']
+
+# Trigrams need at least 3 characters; shorter queries only match prefixes
+MIN_TRIGRAM_QUERY = 3
+
+_RANK = '''
+    CASE
+        WHEN lower(description) = lower(%(query)s) THEN 0
+        WHEN lower(description) LIKE lower(%(prefix)s) THEN 1
+        WHEN description ILIKE %(contains)s THEN 2
+        ELSE 3
+    END
+'''
+
+# Per search mode: WHERE clause and secondary sort key (ascending). The
+# trigram score is float8 so it survives the JSON round trip in a cursor.
+_MATCH = {
+    'trigram': 'description ILIKE %(contains)s OR %(query)s <%% description',
+    'ilike': 'description ILIKE %(contains)s',
+    'prefix': 'lower(description) LIKE lower(%(prefix)s)',
+}
+_SCORE = {
+    'trigram': '-word_similarity(%(query)s, description)::float8',
+    'ilike': 'length(description)',
+    'prefix': 'length(description)',
+}
+
+# has_ingredients is computed for the page rows only, after the LIMIT
+_PAGE_SQL = '''
+    SELECT page.*,
+           EXISTS (SELECT 1 FROM "ingredient" i WHERE i.fdc_id = page.fdc_id) AS has_ingredients
+    FROM (
+        SELECT fdc_id, description, category, rank, score
+        FROM (
+            SELECT fdc_id, description, category, {rank} AS rank, {score} AS score
+            FROM "food"
+            WHERE {match}
+        ) matches
+        {after}
+        ORDER BY rank, score, description, fdc_id
+        LIMIT %(limit)s
+    ) page
+    ORDER BY rank, score, description, fdc_id
+'''
+
+_AFTER = '''
+    WHERE (rank, score, description, fdc_id)
+        > (%(after_rank)s, %(after_score)s, %(after_description)s, %(after_fdc_id)s)
+'''
+
+_COUNT_SQL = '''
+    SELECT count(*) FROM (
+        SELECT 1 FROM "food" WHERE {match} LIMIT %(limit)s
+    ) matches
+'''
+
+_trigram = None  # whether pg_trgm is installed (checked once per process)
+
+_result_cache = LRUCache(max_entries=FOOD_SEARCH_CACHE_MAX_ENTRIES,
+                         max_bytes=FOOD_SEARCH_CACHE_MAX_BYTES, ttl=FOOD_SEARCH_CACHE_TTL)
+
+
+def normalize_query(query):
+    """Cache key form of a query; matching is case-insensitive anyway"""
+    return ' '.join((query or '').lower().split())
+
+
+def invalidate_search_cache():
+    """Drop cached results (call after foods are created or removed)"""
+    _result_cache.clear()
+
+
+def get_search_cache_stats():
+    """Hit/miss/eviction counters and hit rate of the search result cache"""
+    return _result_cache.stats()
+
+
+def _cached(key, compute):
+    value = _result_cache.get(key)
+    if value is None:
+        value = compute()
+        _result_cache.put(key, value)
+    return value
+
+
+def like_escape(text):
+    """Escape LIKE wildcards so user input matches literally"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def trigram_available():
+    """Whether the pg_trgm extension is installed in the database"""
+    global _trigram
+    if _trigram is None:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram = cur.fetchone() is not None
+    return _trigram
+
+
+def search_mode(query, use_trigram):
+    if len(query) < MIN_TRIGRAM_QUERY:
+        return 'prefix'
+    return 'trigram' if use_trigram else 'ilike'
+
+
+def search_params(query, limit, after=None):
+    escaped = like_escape(query)
+    params = {'query': query, 'prefix': f'{escaped}%', 'contains': f'%{escaped}%', 'limit': limit}
+    if after is not None:
+        params.update(zip(('after_rank', 'after_score', 'after_description', 'after_fdc_id'), after))
+    return params
+
+
+def search_sql(query, use_trigram, after=None):
+    mode = search_mode(query, use_trigram)
+    return _PAGE_SQL.format(rank=_RANK, score=_SCORE[mode], match=_MATCH[mode],
+                            after=_AFTER if after is not None else '')
+
+
+def _fetch(build, use_trigram, params):
+    """Run build(use_trigram), retrying without pg_trgm if it has gone away"""
+    global _trigram
+    with get_db_connection() as conn, conn.cursor() as cur:
+        try:
+            cur.execute(build(use_trigram), params)
+        except psycopg2.errors.UndefinedFunction:
+            # Extension dropped since we checked; use the fallback from now on
+            conn.rollback()
+            _trigram = False
+            cur.execute(build(False), params)
+        return cur.fetchall()
+
+
+def search_page(query, after=None, page_size=FOOD_SEARCH_PAGE_SIZE, use_trigram=None):
+    """
+    One page of search results, best matches first.
+
+    `after` is the cursor returned for the previous page (None for the
+    first page). Returns (DataFrame with fdc_id, description, category,
+    has_ingredients, cursor for the next page or None if this is the last page). The
+    DataFrame may be shared with the cache; don't modify it.
+    """
+    query = normalize_query(query)
+    if not query:
+        return pd.DataFrame(columns=SEARCH_COLUMNS), None
+    if use_trigram is None:
+        use_trigram = trigram_available()
+    key = ('page', query, use_trigram, page_size, tuple(after) if after is not None else None)
+    return _cached(key, lambda: _search_page(query, after, page_size, use_trigram))
+
+
+def _search_page(query, after, page_size, use_trigram):
+    rows = _fetch(lambda trigram: search_sql(query, trigram, after), use_trigram,
+                  search_params(query, page_size + 1, after))
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        fdc_id, description, _, rank, score, _ = rows[-1]
+        next_cursor = [rank, score, description, fdc_id]
+    return pd.DataFrame([row[:3] + row[5:] for row in rows], columns=SEARCH_COLUMNS), next_cursor
+
+
+def count_matches(query, limit=FOOD_SEARCH_COUNT_LIMIT, use_trigram=None):
+    """Number of foods matching query, counting at most `limit`"""
+    query = normalize_query(query)
+    if not query:
+        return 0
+    if use_trigram is None:
+        use_trigram = trigram_available()
+    build = lambda trigram: _COUNT_SQL.format(match=_MATCH[search_mode(query, trigram)])
+    return _cached(('count', query, use_trigram, limit),
+                   lambda: _fetch(build, use_trigram, search_params(query, limit))[0][0])
+
+
+def search_foods(query, limit=FOOD_SEARCH_LIMIT, use_trigram=None):
+    """
+    Search foods by description, best matches first.
+
+    Returns DataFrame with fdc_id, description, category, has_ingredients
+    (at most `limit` rows). use_trigram=None detects pg_trgm; False forces the ILIKE fallback.
+    """
+    return search_page(query, page_size=limit, use_trigram=use_trigram)[0]
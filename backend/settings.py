@@ -3,4 +3,73 @@ FOOD_CSV = 'data/food.csv'
 BRANDED_CSV = 'data/branded_food.csv'
 FOOD_CATEGORY_CSV = 'data/food_category.csv'
 
-BATCH_SIZE = 50000
\ No newline at end of file
+BATCH_SIZE = 50000
+
+# FDC import (backend/ingest.py): ingredient parser processes (None = all
+# cores) and how many parsed chunks may wait for the database writer
+INGEST_WORKERS = None
+INGEST_QUEUE_SIZE = 2
+# Foods created in the app get fdc_ids from this number up (migration 006),
+# far above FoodData Central's, so an import never collides with them
+APP_FOOD_ID_START = 1_000_000_000
+# Memoized ingredient parsing (backend/parse_cache.py): per-process LRU
+# limits, and an optional SQLite file (override with parse_cache_path in
+# backend/.env) that keeps results across processes and imports
+PARSE_CACHE_PATH = None
+PARSE_CACHE_MAX_ENTRIES = 200000
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PARSE_CACHE_FLUSH_EVERY = 1000
+
+# PostgreSQL connection pool (override with db_pool_min / db_pool_max /
+# db_pool_timeout in backend/.env)
+DB_POOL_MIN = 1
+DB_POOL_MAX = 10
+DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_INTERVAL = 30  # ping connections idle longer than this
+
+# Per-user data cache (backend/cache.py); least recently used users are
+# evicted once either limit is exceeded. 'memory' keeps a cache per worker
+# process, 'disk' shares one cache between all workers on the host via files
+# in USER_CACHE_DIR (None = /dev/shm/mealmap-cache-<uid> or the temp dir;
+# it must be owned by the app's user with mode 0700).
+# Override with user_cache_backend / user_cache_dir in backend/.env
+USER_CACHE_BACKEND = 'memory'
+USER_CACHE_DIR = None
+USER_CACHE_MAX_ENTRIES = 200
+USER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Serve expired user data immediately while one background refresh reloads it
+USER_CACHE_STALE_WHILE_REVALIDATE = False
+
+# Food search (backend/search.py): max rows returned by search_foods, rows
+# per results page, and how far to count matches before showing "N+"
+FOOD_SEARCH_LIMIT = 500
+FOOD_SEARCH_PAGE_SIZE = 10
+FOOD_SEARCH_COUNT_LIMIT = 1000
+# Per-process cache of search results by normalized query. Cleared when a
+# food is created or removed in this process; other workers pick up new
+# foods once their entries expire.
+FOOD_SEARCH_CACHE_MAX_ENTRIES = 2000
+FOOD_SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024
+FOOD_SEARCH_CACHE_TTL = 600  # seconds
+# Which foods have ingredients (backend/ingredient_bitmap.py); reloaded in
+# the background this often to pick up other workers' new foods
+INGREDIENT_BITMAP_TTL = 600  # seconds
+
+# Dashboard calendar (backend/calendar_cache.py): grouped entries per user and
+# visible date range, per process. Writers bump the user's generation in the
+# database and NOTIFY every worker, which invalidates the user's ranges
+# everywhere; while a worker's listener is down it reads generations from
+# the database and reconnects after CALENDAR_LISTEN_RETRY.
+CALENDAR_CACHE_MAX_ENTRIES = 2000
+CALENDAR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+CALENDAR_CACHE_TTL = 300  # seconds
+CALENDAR_LISTEN_RETRY = 5  # seconds
+# 'server' renders the calendar grid in calendar_view; 'client' sends only
+# columnar entries per range and builds the grid in assets/calendar.js,
+# reusing ranges the browser already has. Override with calendar_rendering
+# in backend/.env
+CALENDAR_RENDERING = 'server'
+
+# Type-ahead suggestions on the log-food page (backend/food_index.py)
+FOOD_SUGGESTION_LIMIT = 8
+FOOD_SUGGESTION_MIN_CHARS = 2
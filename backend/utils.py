@@ -1,173 +1,213 @@
 import psycopg2
 import os
+import threading
 from dotenv import load_dotenv
 import re
 import pandas as pd
 from .settings import *
+from .pool import ConnectionPool
 
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
 
-def get_db_connection():
-    """Get a PostgreSQL database connection using .env credentials."""
-    conn = psycopg2.connect(
+def _connect():
+    """Open a new PostgreSQL connection using .env credentials."""
+    return psycopg2.connect(
         dbname=os.getenv('dbname'),
         user=os.getenv('user'),
         password=os.getenv('password'),
         host=os.getenv('host'),
         port=os.getenv('port')
     )
-    return conn
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    min_size=int(os.getenv('db_pool_min', DB_POOL_MIN)),
+                    max_size=int(os.getenv('db_pool_max', DB_POOL_MAX)),
+                    timeout=float(os.getenv('db_pool_timeout', DB_POOL_TIMEOUT)),
+                    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL
+                )
+    return _pool
+
+
+def get_db_connection():
+    """
+    Check out a pooled PostgreSQL connection.
+
+    Use as a context manager; the connection goes back to the pool (with any
+    uncommitted transaction rolled back) when the block exits:
+
+        with get_db_connection() as conn:
+            ...
+    """
+    return get_pool().connection()
+
+
+def open_db_connection():
+    """
+    Open a dedicated connection outside the pool, for work that holds one
+    for a long time (e.g. LISTEN). The caller closes it.
+    """
+    return _connect()
+
+
+def get_pool_stats():
+    """Connection pool counters (size, idle, in_use, waiters, checkout latency)."""
+    return get_pool().stats()
+
+
+def fetchone_dict(cur, **extra):
+    """Fetch one row as a dict keyed by column name (e.g. after INSERT ... RETURNING)"""
+    row = dict(zip([col.name for col in cur.description], cur.fetchone()))
+    row.update(extra)
+    return row
 
 
 # Removed legacy sqlite3 connection. Only PostgreSQL connection remains.
 
 
+# Unimportant disclaimers and silly prefixes, removed wherever they appear.
+# One alternation instead of a re.sub per phrase; order matters where two
+# phrases start at the same place (CONTAINS 2% wins over the longer form).
+_DISCLAIMERS = [
+    r'EXCEPT FOR .*',
+    r'FOR COLOR',
+    r'CONTAINS TRACES OF .*',
+    r'MAY CONTAIN .*',
+    r'CANADA GRADE .*',
+    r'SEASONING INGREDIENTS?:',
+    r'SOLUTION INGREDIENTS?:',
+    r'CONTAINS:',
+    r'MADE WITH SMILES',
+    r'MADE WITH:',
+    r'LESS OF:',
+    r'BASTED WITH UP TO 16% ADDED SOLUTION OF',
+    r'BASTED NTE 16% ADDED SOLUTION OF',
+    r'5% OR LESS OF THE FOLLOWING:',
+    r'CONTAINS 2%',
+    r'BASTED WITH UP TO 16% SOLUTION OF',
+    r'BREADED WITH',
+    r'NOT MORE THAN 2% SILICON DIOXIDE ADDED TO PREVENT CAKING',
+    r'CONTAINING UP TO 15% OF A SOLUTION OF WATER',
+    r'PREBROWNED IN',
+    r'CONTAINING UP TO 12% OF A SOLUTION OF WATER',
+    r'IINGREDIENTS:',
+    r'CONTAIN UP TO 18% SOLUTION OF WATER',
+    r'COATING INGREDIENTS:',
+    r'ADDED AS A PRESERVATIVE',
+    r'CONTAINS UP TO 7%',
+    r'MECHANICALLY SEPARATED',
+    r'ADDS A DIETARILY INSIGNIFICANT AMOUNT OF SATURATED FAT',
+    r'OF EACH OF THE FOLLOWING:',
+    r'ADDED TO PROTECT FLAVOR',
+    # "contains less than" / "2% or less of" prefixes
+    r'CONTAINS LESS THAN [\d% ]*OF:',
+    r'CONTAINS 2% OR LESS OF:',
+]
+
+
+def _disclaimer_pattern(patterns):
+    """
+    One alternation for all patterns, grouped by (literal) first character
+    and behind a lookahead on those characters so most positions are
+    rejected with a single class test. Order within a group is kept.
+    """
+    groups = {}
+    for pattern in patterns:
+        groups.setdefault(pattern[0], []).append(pattern[1:])
+    alternatives = '|'.join(f"{first}(?:{'|'.join(rests)})" for first, rests in groups.items())
+    return f"(?=[{''.join(groups)}])(?:{alternatives})"
+
+
+_DISCLAIMER_RE = re.compile(_disclaimer_pattern(_DISCLAIMERS), re.IGNORECASE | re.DOTALL)
+_PREFIX_RES = [re.compile(p, re.IGNORECASE) for p in (r'^INGREDIENTS?:', r'^MADE FROM:')]
+_PUNCTUATION = str.maketrans({'*': None, '.': ','})
+_DELIMITER_RE = re.compile(r'[()\[\],]')
+_SUBS_RE = re.compile(r'^(.*?)\((.*)\)$')
+_BRACKET_SUBS_RE = re.compile(r'^(.*?)\[(.*)\]$')
+_AND_OR_RE = re.compile(r'\s+AND/OR\s+|\s+AND\s+|\s+OR\s+')
+
+
+def _split_top_level(text):
+    """Split on commas outside () and [] (tokens stripped, empty ones dropped)"""
+    if '(' not in text and '[' not in text and ')' not in text and ']' not in text:
+        return [token.strip() for token in text.split(',') if token.strip()]
+    tokens = []
+    level = 0
+    start = 0
+    for m in _DELIMITER_RE.finditer(text):
+        char = m.group()
+        if char in '([':
+            level += 1
+        elif char in ')]':
+            level -= 1
+        elif level == 0:
+            token = text[start:m.start()].strip()
+            if token:
+                tokens.append(token)
+            start = m.end()
+    token = text[start:].strip()
+    if token:
+        tokens.append(token)
+    return tokens
+
+
+def _split_and_or(text):
+    if 'AND' not in text and 'OR' not in text:
+        stripped = text.strip()
+        return [stripped] if stripped else []
+    return [part.strip() for part in _AND_OR_RE.split(text) if part.strip()]
+
+
 def parse_ingredients(ingredient_str):
+    """
+    Parse an ingredient statement into [(ingredient, [sub-ingredients])].
+    Sub-ingredients come from () or [] after an ingredient; top-level
+    "A AND B" / "A OR B" become separate ingredients. Results are memoized
+    (see backend/parse_cache.py) and shared; don't modify them.
+    """
+    from .parse_cache import cached_parse
+    return cached_parse(ingredient_str)
+
+
+def parse_ingredients_uncached(ingredient_str):
     if not ingredient_str:
         return []
 
-    s = ingredient_str.upper()
-
-    # Remove unimportant disclaimers and silly prefixes
-    disclaimers = [
-        r'EXCEPT FOR .*',
-        r'FOR COLOR',
-        r'CONTAINS TRACES OF .*',
-        r'MAY CONTAIN .*',
-        r'CANADA GRADE .*',
-        r'SEASONING INGREDIENTS?:',
-        r'SOLUTION INGREDIENTS?:',
-        r'CONTAINS:',
-        r'MADE WITH SMILES',
-        r'MADE WITH:',
-        r'LESS OF:',
-        r'BASTED WITH UP TO 16% ADDED SOLUTION OF',
-        r'BASTED NTE 16% ADDED SOLUTION OF',
-        r'5% OR LESS OF THE FOLLOWING:',
-        r'CONTAINS 2%',
-        r'BASTED WITH UP TO 16% SOLUTION OF',
-        r'BREADED WITH',
-        r'NOT MORE THAN 2% SILICON DIOXIDE ADDED TO PREVENT CAKING',
-        r'CONTAINING UP TO 15% OF A SOLUTION OF WATER',
-        r'PREBROWNED IN',
-        r'CONTAINING UP TO 12% OF A SOLUTION OF WATER',
-        r'IINGREDIENTS:',
-        r'CONTAIN UP TO 18% SOLUTION OF WATER',
-        r'COATING INGREDIENTS:',
-        r'ADDED AS A PRESERVATIVE',
-        r'CONTAINS UP TO 7%',
-        r'MECHANICALLY SEPARATED',
-        r'ADDS A DIETARILY INSIGNIFICANT AMOUNT OF SATURATED FAT',
-        r'OF EACH OF THE FOLLOWING:',
-        r'ADDED TO PROTECT FLAVOR',
-    ]
-    for d in disclaimers:
-        s = re.sub(d, '', s, flags=re.IGNORECASE | re.DOTALL)
-
-    # Remove "contains less than" / "2% or less of" prefixes
-    s = re.sub(r'CONTAINS LESS THAN [\d% ]*OF:', '', s, flags=re.IGNORECASE)
-    s = re.sub(r'CONTAINS 2% OR LESS OF:', '', s, flags=re.IGNORECASE)
-
-    # Remove other prefixes
-    prefixes = [r'^INGREDIENTS?:', r'^MADE FROM:']
-    for p in prefixes:
-        s = re.sub(p, '', s, flags=re.IGNORECASE).strip()
-
-    s = s.replace('*', '').replace('.', ',')  # normalize punctuation
-
-    # Support both () and [] for sub-ingredients
-    def split_top_level(text):
-        tokens = []
-        buf = ''
-        level = 0
-        for char in text:
-            if char in '([':
-                level += 1
-                buf += char
-            elif char in ')]':
-                level -= 1
-                buf += char
-            elif char == ',' and level == 0:
-                if buf.strip():
-                    tokens.append(buf.strip())
-                buf = ''
-            else:
-                buf += char
-        if buf.strip():
-            tokens.append(buf.strip())
-        return tokens
-
-    def parse_token(token):
-        # Check for parentheses or brackets
-        m = re.match(r'^(.*?)\((.*)\)$',
-                     token) or re.match(r'^(.*?)\[(.*)\]$', token)
+    s = _DISCLAIMER_RE.sub('', ingredient_str.upper())
+    for prefix in _PREFIX_RES:
+        s = prefix.sub('', s).strip()
+    s = s.translate(_PUNCTUATION)
+
+    result = []
+    for token in _split_top_level(s):
+        m = _SUBS_RE.match(token) or _BRACKET_SUBS_RE.match(token)
         if m:
             parent = m.group(1).strip()
-            inside = m.group(2).strip()
-            sub_tokens = split_top_level(inside)
-            subs = []
-            for t in sub_tokens:
-                subs += re.split(r'\s+AND/OR\s+|\s+AND\s+|\s+OR\s+', t)
-            subs = [s.strip() for s in subs if s.strip()]
-            return [(parent, subs)]
+            if parent:
+                subs = [sub for t in _split_top_level(m.group(2).strip()) for sub in _split_and_or(t)]
+                result.append((parent, subs))
         else:
-            # Split AND/OR at top level
-            parts = re.split(r'\s+AND/OR\s+|\s+AND\s+|\s+OR\s+', token)
-            return [(p.strip(), []) for p in parts if p.strip()]
-
-    # Main parsing
-    top_tokens = split_top_level(s)
-    result = []
-    for tok in top_tokens:
-        result += parse_token(tok)
-
-    # Final clean-up
-    cleaned = []
-    for ing, subs in result:
-        ing = ing.strip()
-        subs = [s.strip() for s in subs if s.strip()]
-        if ing:
-            cleaned.append((ing, subs))
-
-    return cleaned
-
-
-def insert_ingredients(c, ingredient_batch, subingredient_batch):
-    ing_values = [(fdc, ing) for fdc, ing, _ in ingredient_batch]
-    c.executemany(
-        'INSERT INTO Ingredient(fdc_id, ingredient) VALUES (?, ?)', ing_values)
-    c.execute('SELECT id, fdc_id, ingredient FROM Ingredient WHERE rowid >= last_insert_rowid() - ?',
-              (len(ingredient_batch)-1,))
-    rows = c.fetchall()
-    ing_map = {(fdc, ing): ing_id for ing_id, fdc, ing in rows}
-    for fdc, ing, subs in ingredient_batch:
-        ing_id = ing_map.get((fdc, ing))
-        if ing_id and subs:
-            subingredient_batch.extend([(ing_id, sub) for sub in subs])
-    if subingredient_batch:
-        c.executemany(
-            'INSERT INTO SubIngredient(ingredient_id, sub_ingredient) VALUES (?, ?)', subingredient_batch)
-        subingredient_batch.clear()
+            result.extend((part, []) for part in _split_and_or(token))
+    return result
 
 
 def search_foods_by_description(query, limit=None):
-    conn = get_db_connection()
-    sql = """
-        SELECT fdc_id, description, category
-        FROM "Food"
-        WHERE description ILIKE %s
-        ORDER BY description
-    """
-    param = f"%{query}%"
-    if limit is not None:
-        sql += " LIMIT %s"
-        df = pd.read_sql_query(sql, conn, params=(param, limit))
-    else:
-        df = pd.read_sql_query(sql, conn, params=(param,))
-    conn.close()
-    return df
+    """Ranked description search (see backend/search.py)"""
+    from .search import search_foods
+    return search_foods(query, limit=limit or FOOD_SEARCH_LIMIT)
 
 
 def print_food_search(query, db_path=DB_PATH, limit=None):
@@ -179,16 +219,17 @@ def print_food_search(query, db_path=DB_PATH, limit=None):
 
 
 def get_ingredients_by_fdc_id(fdc_id):
-    conn = get_db_connection()
     sql = '''
-        SELECT i.ingredient, s.sub_ingredient
-        FROM "Ingredient" i
-        LEFT JOIN "SubIngredient" s ON i.id = s.ingredient_id
+        SELECT n.name AS ingredient, sn.name AS sub_ingredient
+        FROM "ingredient" i
+        JOIN "ingredient_name" n ON n.id = i.name_id
+        LEFT JOIN "subingredient" s ON i.id = s.ingredient_id
+        LEFT JOIN "ingredient_name" sn ON sn.id = s.name_id
         WHERE i.fdc_id = %s
         ORDER BY i.id, s.id
     '''
-    df = pd.read_sql_query(sql, conn, params=(fdc_id,))
-    conn.close()
+    with get_db_connection() as conn:
+        df = pd.read_sql_query(sql, conn, params=(fdc_id,))
     # Group by ingredient, collect sub-ingredients
     grouped = {}
     for _, row in df.iterrows():
@@ -212,12 +253,10 @@ def print_ingredients_by_fdc_id(fdc_id, db_path=DB_PATH):
     ingredients = get_ingredients_by_fdc_id(fdc_id)
     if not ingredients:
         # Try to get the description from the Food table
-        conn = get_db_connection()
-        with conn.cursor() as cur:
+        with get_db_connection() as conn, conn.cursor() as cur:
             cur.execute(
-                'SELECT description FROM "Food" WHERE fdc_id = %s', (fdc_id,))
+                'SELECT description FROM "food" WHERE fdc_id = %s', (fdc_id,))
             desc = cur.fetchone()
-        conn.close()
         if desc and desc[0]:
             print(f"No ingredients found for: {desc[0]}, with ID: {fdc_id}")
         else:
@@ -227,50 +266,62 @@ def print_ingredients_by_fdc_id(fdc_id, db_path=DB_PATH):
 
 
 def create_food_item(description, ingredients_str, db_path=DB_PATH, category=None):
-    conn = get_db_connection()
-    with conn.cursor() as cur:
+    with get_db_connection() as conn, conn.cursor() as cur:
         # Check if food already exists
-        cur.execute('SELECT fdc_id FROM "Food" WHERE description = %s',
+        cur.execute('SELECT fdc_id FROM "food" WHERE description = %s',
                     (description.strip(),))
         row = cur.fetchone()
         if row:
             fdc_id = row[0]
             print(f"Food item already exists: {description} (fdc_id={fdc_id})")
-            conn.close()
             return fdc_id
         # Insert new food item
-        cur.execute('INSERT INTO "Food"(description, category) VALUES (%s, %s) RETURNING fdc_id',
+        cur.execute('INSERT INTO "food"(description, category) VALUES (%s, %s) RETURNING fdc_id',
                     (description.strip(), category))
         fdc_id = cur.fetchone()[0]
         # Parse and insert ingredients
         parsed_ings = parse_ingredients(ingredients_str)
+        from .ingredient_names import ingredient_name_ids, refresh_food_ingredient_sets
+        name_ids = ingredient_name_ids(name for ing, subs in parsed_ings for name in (ing, *subs))
         for ing, subs in parsed_ings:
             cur.execute(
-                'INSERT INTO "Ingredient"(fdc_id, ingredient) VALUES (%s, %s) RETURNING id', (fdc_id, ing.strip()))
+                'INSERT INTO "ingredient"(fdc_id, name_id) VALUES (%s, %s) RETURNING id', (fdc_id, name_ids[ing]))
             ingredient_id = cur.fetchone()[0]
             for sub in subs:
                 cur.execute(
-                    'INSERT INTO "SubIngredient"(ingredient_id, sub_ingredient) VALUES (%s, %s)', (ingredient_id, sub.strip()))
+                    'INSERT INTO "subingredient"(ingredient_id, name_id) VALUES (%s, %s)', (ingredient_id, name_ids[sub]))
+        refresh_food_ingredient_sets(cur, [fdc_id])
         conn.commit()
-    conn.close()
+    from .food_index import food_added
+    from .ingredient_bitmap import set_has_ingredients
+    from .search import invalidate_search_cache
+    food_added(fdc_id, description.strip(), category)
+    if parsed_ings:
+        set_has_ingredients(fdc_id)
+    invalidate_search_cache()
     print(f"Created food item: {description} (fdc_id={fdc_id})")
     return fdc_id
 
 
 def remove_food_item(fdc_id, db_path=DB_PATH):
-    conn = get_db_connection()
-    with conn.cursor() as cur:
+    with get_db_connection() as conn, conn.cursor() as cur:
         # Find all ingredient ids for this food item
-        cur.execute('SELECT id FROM "Ingredient" WHERE fdc_id = %s', (fdc_id,))
+        cur.execute('SELECT id FROM "ingredient" WHERE fdc_id = %s', (fdc_id,))
         ingredient_ids = [row[0] for row in cur.fetchall()]
         # Remove sub-ingredients
         for ing_id in ingredient_ids:
             cur.execute(
-                'DELETE FROM "SubIngredient" WHERE ingredient_id = %s', (ing_id,))
+                'DELETE FROM "subingredient" WHERE ingredient_id = %s', (ing_id,))
         # Remove ingredients
-        cur.execute('DELETE FROM "Ingredient" WHERE fdc_id = %s', (fdc_id,))
+        cur.execute('DELETE FROM "ingredient" WHERE fdc_id = %s', (fdc_id,))
+        cur.execute('DELETE FROM "food_ingredient_set" WHERE fdc_id = %s', (fdc_id,))
         # Remove food item
-        cur.execute('DELETE FROM "Food" WHERE fdc_id = %s', (fdc_id,))
+        cur.execute('DELETE FROM "food" WHERE fdc_id = %s', (fdc_id,))
         conn.commit()
-    conn.close()
+    from .food_index import food_removed
+    from .ingredient_bitmap import set_has_ingredients
+    from .search import invalidate_search_cache
+    food_removed(fdc_id)
+    set_has_ingredients(fdc_id, False)
+    invalidate_search_cache()
     print(f"Removed food item and all related ingredients for fdc_id={fdc_id}")
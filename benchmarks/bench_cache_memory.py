@@ -0,0 +1,96 @@
+"""
+Measure per-user cache memory before and after compact_frame.
+
+Builds synthetic user frames shaped like the old get_user_data output (one
+Python str/date/time object per cell, as psycopg2 returns them) and reports
+deep memory per frame for the raw and compact representations, counted
+the way the user cache's byte budget counts them (estimate_bytes:
+categorical codes plus each frame's own categories).
+
+Usage: python -m benchmarks.bench_cache_memory [--sizes 10000 100000]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from backend.cache_backends import estimate_bytes
+from backend.analysis import food_ingredient_names
+from backend.compact import compact_frame
+from benchmarks.bench_symptom_window import make_user_data
+
+SYMPTOMS = ['Headache', 'Bloating', 'Nausea', 'Fatigue', 'Stomach Pain', 'Heartburn']
+NOTES = [None, None, None, 'after lunch', 'felt fine', 'ate out', 'skipped breakfast']
+
+
+def fresh(value):
+    """A distinct str object per cell, like rows fetched from the database"""
+    return None if value is None else (value + ' ')[:-1]
+
+
+def raw_user_frames(n_entries, seed=0):
+    rng = np.random.default_rng(seed)
+    symptom_logs, food_entries, foods, ingredients, subingredients = make_user_data(n_entries)
+
+    dates = sorted(set(food_entries['date']) | set(symptom_logs['date']))
+    log_ids = {d: i + 1 for i, d in enumerate(dates)}
+    daily_logs = pd.DataFrame({'id': list(log_ids.values()), 'date': dates, 'user_id': 1})
+
+    food_entries = food_entries.assign(
+        daily_log_id=food_entries['date'].map(log_ids),
+        meal_id=np.arange(len(food_entries)) // 3 + 1,
+        notes=[fresh(NOTES[i]) for i in rng.integers(0, len(NOTES), len(food_entries))],
+    )[['id', 'daily_log_id', 'meal_id', 'fdc_id', 'time', 'notes', 'date']]
+
+    symptom_logs = symptom_logs.assign(
+        daily_log_id=symptom_logs['date'].map(log_ids),
+        symptom_id=rng.integers(1, len(SYMPTOMS) + 1, len(symptom_logs)),
+        notes=[fresh(NOTES[i]) for i in rng.integers(0, len(NOTES), len(symptom_logs))],
+    )
+    symptom_logs['symptom_name'] = [fresh(SYMPTOMS[i - 1]) for i in symptom_logs['symptom_id']]
+    symptom_logs = symptom_logs[['id', 'daily_log_id', 'symptom_id', 'time', 'severity',
+                                 'notes', 'date', 'symptom_name']]
+
+    # The old loader returned ingredient rows for every food the user logged,
+    # with one str object per row
+    foods = foods.assign(description=[fresh(d) for d in foods['description']],
+                         category=[fresh(c) for c in foods['category']])
+    food_ingredients = food_ingredient_names(ingredients, subingredients)
+    food_ingredients = food_ingredients.assign(name=[fresh(n) for n in food_ingredients['name']])
+
+    return {
+        'daily_logs': daily_logs,
+        'food_log_entries': food_entries,
+        'symptom_log_entries': symptom_logs,
+        'foods': foods,
+        'food_ingredients': food_ingredients,
+    }
+
+
+def raw_bytes(frame):
+    return int(frame.memory_usage(deep=True).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        frames = raw_user_frames(n)
+        print(f"\n{n} food log entries")
+        print(f"{'frame':>20} {'rows':>8} {'raw KiB':>10} {'compact KiB':>12} {'ratio':>7}")
+        raw_total = compact_total = 0
+        for name, frame in frames.items():
+            compact = compact_frame(name, frame)
+            before, after = raw_bytes(frame), estimate_bytes(compact)
+            raw_total += before
+            compact_total += after
+            print(f"{name:>20} {len(frame):>8} {before / 1024:>10.1f} {after / 1024:>12.1f} "
+                  f"{before / after:>6.1f}x")
+        print(f"{'total':>20} {'':>8} {raw_total / 1024:>10.1f} {compact_total / 1024:>12.1f} "
+              f"{raw_total / compact_total:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
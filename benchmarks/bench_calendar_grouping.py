@@ -0,0 +1,173 @@
+"""
+Benchmark month-view calendar grouping against the old iterrows loops.
+
+Generates a month of entries for a heavy logger (--per-day food entries per
+day, grouped into meals with some standalone foods, plus symptoms) and
+checks both implementations build the same per-day `entries` structure
+before timing them. The old loops get the DataFrames read_sql_query used to
+return (date/time objects); group_calendar_entries gets cursor tuples with
+dates and times already formatted by PostgreSQL, as load_calendar_entries
+does. Database time is not included.
+
+A second pass times what a month view costs end to end: grouping plus
+calendar_view building the month's components from the result, once with
+each grouping. It needs Dash and is skipped without it (or with --no-render).
+
+Usage: python -m benchmarks.bench_calendar_grouping [--per-day 50] [--repeat 20] [--no-render]
+"""
+import argparse
+import calendar
+import time
+from datetime import date, time as dtime
+
+import numpy as np
+import pandas as pd
+
+from backend.calendar_cache import group_calendar_entries
+
+
+def make_month(per_day, symptoms_per_day, year=2024, month=5, seed=0):
+    rng = np.random.default_rng(seed)
+    food_rows, symptom_rows = [], []
+    meal_id = 0
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        d = date(year, month, day)
+        logged = 0
+        while logged < per_day:
+            minute = int(rng.integers(0, 24 * 60))
+            t = dtime(minute // 60, minute % 60)
+            if rng.random() < 0.2:
+                size, meal = 1, None
+            else:
+                meal_id += 1
+                size, meal = min(int(rng.integers(1, 6)), per_day - logged), meal_id
+            for _ in range(size):
+                food_rows.append((d, len(food_rows) + 1, f"FOOD {int(rng.integers(1, 500))}",
+                                  t, None if rng.random() < 0.8 else 'note', meal))
+            logged += size
+        for _ in range(symptoms_per_day):
+            minute = int(rng.integers(0, 24 * 60))
+            symptom_rows.append((d, len(symptom_rows) + 1, f"SYMPTOM {int(rng.integers(1, 20))}",
+                                 dtime(minute // 60, minute % 60), int(rng.integers(1, 11)), None))
+    food_rows.sort(key=lambda r: (r[0], r[3]))
+    symptom_rows.sort(key=lambda r: (r[0], r[3]))
+    return food_rows, symptom_rows
+
+
+def as_frames(food_rows, symptom_rows):
+    """What the old read_sql_query calls returned"""
+    food_df = pd.DataFrame(food_rows, columns=['date', 'entry_id', 'name', 'time', 'notes', 'meal_id'])
+    symptom_df = pd.DataFrame(symptom_rows, columns=['date', 'entry_id', 'name', 'time', 'severity', 'notes'])
+    # Kept as objects: from read_sql NULLs became NaN (a NaN meal_id was even
+    # grouped as a meal), which group_calendar_entries doesn't reproduce
+    food_df['meal_id'] = pd.Series([r[5] for r in food_rows], dtype=object)
+    food_df['notes'] = pd.Series([r[4] for r in food_rows], dtype=object)
+    symptom_df['notes'] = pd.Series([r[5] for r in symptom_rows], dtype=object)
+    return food_df, symptom_df
+
+
+def as_cursor_rows(food_rows, symptom_rows):
+    """What load_calendar_entries' queries return (to_char dates and times)"""
+    return ([(d.isoformat(), i, n, t.strftime('%H:%M'), notes, m) for d, i, n, t, notes, m in food_rows],
+            [(d.isoformat(), i, n, t.strftime('%H:%M'), s, notes) for d, i, n, t, s, notes in symptom_rows])
+
+
+def legacy_group(food_df, symptom_df):
+    """The iterrows grouping calendar_view used to run"""
+    entries = {}
+    for _, row in food_df.iterrows():
+        d = row['date'].isoformat() if hasattr(
+            row['date'], 'isoformat') else str(row['date'])
+        if d not in entries:
+            entries[d] = {'meals': {}, 'symptoms': [], 'foods': []}
+        meal_id = row['meal_id']
+        if meal_id is not None and str(meal_id).strip() not in ('', 'None', 'none', 'null', '0') and meal_id != 0:
+            if meal_id not in entries[d]['meals']:
+                entries[d]['meals'][meal_id] = {
+                    'time': row['time'].strftime('%H:%M') if hasattr(row['time'], 'strftime') else str(row['time']),
+                    'foods': []
+                }
+            entries[d]['meals'][meal_id]['foods'].append({
+                'id': row['entry_id'],
+                'name': row['name'],
+                'notes': row['notes']
+            })
+        else:
+            entries[d]['foods'].append({
+                'id': row['entry_id'],
+                'name': row['name'],
+                'time': row['time'].strftime('%H:%M') if hasattr(row['time'], 'strftime') else str(row['time']),
+                'notes': row['notes']
+            })
+
+    for _, row in symptom_df.iterrows():
+        d = row['date'].isoformat() if hasattr(
+            row['date'], 'isoformat') else str(row['date'])
+        if d not in entries:
+            entries[d] = {'meals': {}, 'symptoms': [], 'foods': []}
+        entries[d]['symptoms'].append({
+            'id': row['entry_id'],
+            'name': row['name'],
+            'time': row['time'].strftime('%H:%M') if hasattr(row['time'], 'strftime') else str(row['time']),
+            'severity': row['severity'],
+            'notes': row['notes']
+        })
+    return entries
+
+
+def best_of(repeat, fn, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def render_month(group, rows, base_date):
+    """Group rows and render the month view from them, as calendar_view does per request"""
+    from benchmarks.bench_calendar_render import render_server
+    return render_server(group(*rows), 'month', base_date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-day', type=int, nargs='+', default=[50])
+    parser.add_argument('--symptoms-per-day', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--no-render', action='store_true', help='skip the month render pass')
+    args = parser.parse_args()
+
+    print(f"{'per day':>8} {'rows':>7} {'legacy ms':>10} {'tuples ms':>10} {'speedup':>8}  match")
+    for per_day in args.per_day:
+        food_rows, symptom_rows = make_month(per_day, args.symptoms_per_day)
+        old, old_s = best_of(args.repeat, legacy_group, *as_frames(food_rows, symptom_rows))
+        new, new_s = best_of(args.repeat, group_calendar_entries, *as_cursor_rows(food_rows, symptom_rows))
+        rows = len(food_rows) + len(symptom_rows)
+        print(f"{per_day:>8} {rows:>7} {old_s * 1000:>10.2f} {new_s * 1000:>10.2f} "
+              f"{old_s / new_s:>7.1f}x  {old == new}")
+
+    if args.no_render:
+        return
+    try:
+        import dash  # noqa: F401
+    except ImportError:
+        print("Dash is not installed: skipping the month render pass")
+        return
+    print("\nMonth view (grouping + calendar_view components)")
+    print(f"{'per day':>8} {'rows':>7} {'legacy ms':>10} {'tuples ms':>10} {'speedup':>8}")
+    base_date = date(2024, 5, 15)
+    for per_day in args.per_day:
+        food_rows, symptom_rows = make_month(per_day, args.symptoms_per_day,
+                                             year=base_date.year, month=base_date.month)
+        _, old_s = best_of(args.repeat, render_month, legacy_group,
+                           as_frames(food_rows, symptom_rows), base_date)
+        _, new_s = best_of(args.repeat, render_month, group_calendar_entries,
+                           as_cursor_rows(food_rows, symptom_rows), base_date)
+        rows = len(food_rows) + len(symptom_rows)
+        print(f"{per_day:>8} {rows:>7} {old_s * 1000:>10.2f} {new_s * 1000:>10.2f} "
+              f"{old_s / new_s:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
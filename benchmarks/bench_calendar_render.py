@@ -0,0 +1,140 @@
+"""
+Check the client-side calendar (assets/calendar.js) against calendar_view.
+
+Renders month, week and day views of the same synthetic entries (see
+bench_calendar_grouping.make_month) with the server's calendar_view and
+with calendar.js under node, fed calendar_payload as the browser is, and
+compares the two component trees. Pixel values only need to be equal as
+numbers ("45.0px" and "45px"). Then times both renderers and prints the size
+of the payload against the size of the tree the server sends instead.
+Views of the current period include the "now" line, so a run that crosses
+a minute boundary can differ there; re-run it.
+
+Needs Dash and node. Usage:
+python -m benchmarks.bench_calendar_render [--per-day 20] [--repeat 10] [--date 2024-05-15]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import time
+from datetime import date
+
+import plotly.utils
+
+import app  # noqa: F401 (registers the pages)
+import pages.Dashboard as dashboard
+from backend.calendar_cache import calendar_payload, calendar_range, group_calendar_entries
+from benchmarks.bench_calendar_grouping import as_cursor_rows, best_of, make_month
+
+CALENDAR_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'assets', 'calendar.js')
+VIEWS = ('month', 'week', 'day')
+
+# Renders each case `repeat` times with calendar.js; prints the trees and best times (ms)
+NODE_RENDER = '''
+const fs = require('fs');
+global.window = {dash_clientside: {no_update: null,
+                                   callback_context: {triggered: [{prop_id: 'calendar-date.data'}]}}};
+require(process.argv[1]);
+const {cases, repeat} = JSON.parse(fs.readFileSync(0, 'utf8'));
+const render = window.dash_clientside.calendar.render;
+const results = cases.map(function (c) {
+    let view, best = Infinity;
+    for (let i = 0; i < repeat; i++) {
+        const started = process.hrtime.bigint();
+        view = render(c.cache, c.date, c.view, 0, 1, 0)[0];
+        best = Math.min(best, Number(process.hrtime.bigint() - started) / 1e6);
+    }
+    return {view: view, ms: best};
+});
+process.stdout.write(JSON.stringify(results));
+'''
+
+
+def as_json(component):
+    """A Dash component tree as the JSON the browser receives"""
+    return json.loads(json.dumps(component, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def normalize(value):
+    return re.sub(r'(\d+)\.0(?=px|%)', r'\1', value)
+
+
+def first_difference(server, client, path='view'):
+    """Path and both values of the first place the trees differ, or None"""
+    if isinstance(server, str) and isinstance(client, str):
+        return None if normalize(server) == normalize(client) else (path, server, client)
+    if isinstance(server, dict) and isinstance(client, dict):
+        for key in sorted(set(server) | set(client)):
+            found = first_difference(server.get(key), client.get(key), f"{path}.{key}")
+            if found:
+                return found
+        return None
+    if isinstance(server, list) and isinstance(client, list):
+        if len(server) != len(client):
+            return f"{path} (length)", len(server), len(client)
+        for i, (a, b) in enumerate(zip(server, client)):
+            found = first_difference(a, b, f"{path}[{i}]")
+            if found:
+                return found
+        return None
+    return None if server == client else (path, server, client)
+
+
+def render_server(entries, view_mode, base_date):
+    dashboard.get_calendar_entries = lambda user_id, start_date, end_date: entries
+    dashboard.prefetch_adjacent_ranges = lambda *args: None
+    return dashboard.calendar_view(1, 0, view_mode, base_date.isoformat(), '/dashboard', view_mode, 0)[0]
+
+
+def render_client(cases, repeat):
+    result = subprocess.run(['node', '-e', NODE_RENDER, CALENDAR_JS], input=json.dumps(
+        {'cases': cases, 'repeat': repeat}), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-day', type=int, default=20)
+    parser.add_argument('--symptoms-per-day', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--date', type=date.fromisoformat, nargs='+',
+                        default=[date.today(), date(2024, 5, 15)])
+    args = parser.parse_args()
+
+    print(f"{'date':>10} {'view':>6} {'server ms':>10} {'client ms':>10} "
+          f"{'payload KB':>11} {'tree KB':>8}  same")
+    mismatches = 0
+    for base_date in args.date:
+        food_rows, symptom_rows = make_month(args.per_day, args.symptoms_per_day,
+                                             year=base_date.year, month=base_date.month)
+        entries = group_calendar_entries(*as_cursor_rows(food_rows, symptom_rows))
+        cases, servers = [], []
+        for view_mode in VIEWS:
+            start_date, end_date = calendar_range(view_mode, base_date)
+            in_range = {d: day for d, day in entries.items()
+                        if start_date.isoformat() <= d <= end_date.isoformat()}
+            payload = calendar_payload(in_range, start_date)
+            cases.append({'cache': {'user_id': 1, 'refresh': 0,
+                                    'ranges': {f"{start_date}/{end_date}": payload}},
+                          'date': base_date.isoformat(), 'view': view_mode})
+            view, server_s = best_of(args.repeat, render_server, in_range, view_mode, base_date)
+            servers.append((as_json(view), server_s, len(json.dumps(payload))))
+        for view_mode, (server, server_s, payload_bytes), client in zip(
+                VIEWS, servers, render_client(cases, args.repeat)):
+            difference = first_difference(server, client['view'])
+            mismatches += difference is not None
+            print(f"{base_date.isoformat():>10} {view_mode:>6} {server_s * 1000:>10.2f} "
+                  f"{client['ms']:>10.2f} {payload_bytes / 1024:>11.1f} "
+                  f"{len(json.dumps(server)) / 1024:>8.1f}  {difference is None}")
+            if difference:
+                path, server_value, client_value = difference
+                print(f"    {path}: server {server_value!r:.80} client {client_value!r:.80}")
+    if mismatches:
+        raise SystemExit(f"{mismatches} views differ between calendar_view and calendar.js")
+
+
+if __name__ == '__main__':
+    main()
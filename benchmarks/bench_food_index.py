@@ -0,0 +1,104 @@
+"""
+Benchmark the in-process type-ahead food index (backend/food_index.py).
+
+Builds a FoodIndex over synthetic FDC-like descriptions (branded foods are
+a few words drawn from a Zipf-distributed vocabulary plus a brand) and
+replays queries one keystroke at a time, as the log-food type-ahead sends
+them. Checks results against a brute-force scan on a sample, then reports
+build time, index memory and per-keystroke p50/p99 latency.
+
+Usage: python -m benchmarks.bench_food_index [--sizes 400000 2000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.food_index import FoodIndex, tokenize
+from backend.search import normalize_query
+
+WORDS = ['milk', 'cheese', 'chicken', 'breast', 'apple', 'juice', 'yogurt', 'greek', 'peanut',
+         'butter', 'bread', 'whole', 'wheat', 'orange', 'chocolate', 'chip', 'cookie', 'oat',
+         'almond', 'rice', 'bean', 'black', 'sauce', 'tomato', 'pasta', 'spaghetti', 'beef',
+         'ground', 'pork', 'salad', 'dressing', 'ranch', 'vanilla', 'ice', 'cream', 'frozen',
+         'pizza', 'pepperoni', 'cheddar', 'mozzarella', 'organic', 'low', 'fat', 'sugar', 'free',
+         'original', 'crunchy', 'creamy', 'roasted', 'salted', 'unsalted', 'honey', 'maple']
+QUERIES = ['milk', 'cheddar cheese', 'chicken breast', 'greek yogurt', 'peanut butter',
+           'choc chip cookie', 'whole wheat bread', 'orange juice', 'vanilla ice cream', 'salsa']
+
+
+def make_foods(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array(WORDS + [f"w{i:05d}" for i in range(50000)], dtype=object)
+    brands = np.array([f"BRAND{i}" for i in range(20000)], dtype=object)
+    n_words = rng.integers(2, 8, n)
+    picks = np.minimum(rng.zipf(1.3, n_words.sum()) - 1, len(vocab) - 1)
+    splits = np.split(vocab[picks], np.cumsum(n_words)[:-1])
+    brand = brands[rng.integers(0, len(brands), n)]
+    descriptions = [f"{b} {' '.join(ws).upper()}" for b, ws in zip(brand, splits)]
+    categories = rng.choice(['Dairy', 'Snacks', 'Beverages', 'Frozen', 'Bakery'], n)
+    return np.arange(1, n + 1), sorted(descriptions, key=str.lower), categories
+
+
+def keystrokes(queries):
+    return [q[:i] for q in queries for i in range(1, len(q) + 1)]
+
+
+def brute_force(fdc_ids, descriptions, query, k):
+    """Reference ranking: exact, starts with the first word, contains; shorter, alphabetical"""
+    words, query = tokenize(query), normalize_query(query)
+    matches = []
+    for fdc_id, description in zip(fdc_ids, descriptions):
+        food_words = tokenize(description)
+        if words and all(any(w.startswith(word) for w in food_words) for word in words):
+            starts = food_words[0].startswith(words[0])
+            rank = 0 if description.lower() == query else 1 if starts else 2
+            matches.append((rank, len(description), description.lower(), int(fdc_id)))
+    return [m[3] for m in sorted(matches)[:k]]
+
+
+def check(n, queries, k):
+    fdc_ids, descriptions, categories = make_foods(n, seed=1)
+    index = FoodIndex(fdc_ids, descriptions, categories)
+    for fdc_id in fdc_ids[::7]:
+        index.remove(fdc_id)
+    live = [(f, d) for f, d in zip(fdc_ids, descriptions) if f % 7 != 1]
+    for query in queries:
+        got = [food['fdc_id'] for food in index.search(query, k)]
+        want = brute_force(*zip(*live), query, k)
+        # Equal (length, description) ties may come back in either order
+        key = dict(zip(fdc_ids, descriptions))
+        assert [key[f] for f in got] == [key[f] for f in want], (query, got, want)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[400000, 2000000])
+    parser.add_argument('--k', type=int, default=8)
+    args = parser.parse_args()
+
+    # Whole descriptions, with other case and spacing, must rank exact
+    _, descriptions, _ = make_foods(20000, seed=1)
+    exact = [' '.join(d.title().split()) + ' ' for d in descriptions[3::2000]]
+    typed = keystrokes(QUERIES) + exact
+    check(20000, typed, args.k)
+    print(f"results match a brute-force scan for {len(typed)} queries")
+    for n in args.sizes:
+        fdc_ids, descriptions, categories = make_foods(n)
+        started = time.perf_counter()
+        index = FoodIndex(fdc_ids, descriptions, categories)
+        build = time.perf_counter() - started
+
+        samples = []
+        for query in typed:
+            started = time.perf_counter()
+            index.search(query, args.k)
+            samples.append((time.perf_counter() - started) * 1000)
+        ms = np.array(samples)
+        print(f"{n} foods: build {build:.1f}s, {index.nbytes / 2**20:.0f} MiB, "
+              f"{len(typed)} keystrokes p50 {np.percentile(ms, 50):.2f} ms, "
+              f"p99 {np.percentile(ms, 99):.2f} ms, max {ms.max():.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
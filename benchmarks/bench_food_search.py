@@ -0,0 +1,105 @@
+"""
+Benchmark food search latency (p50/p99) against the full FoodData Central
+food table.
+
+Needs the PostgreSQL database configured in backend/.env, loaded with FDC
+data and migrated (python -m backend.migrate). Compares the old unbounded
+ILIKE '%q%' ORDER BY description query with backend.search in trigram and
+ILIKE-fallback modes (capped at FOOD_SEARCH_LIMIT rows) and with keyset
+paging (count + first two pages), over a mix of common terms, prefixes and typos.
+Those modes bypass the search result cache; a last run replays a
+Zipf-distributed stream of the same queries through it and reports the hit
+rate.
+
+Usage: python -m benchmarks.bench_food_search [--repeat 20] [--queries milk ...]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.search import (search_foods, search_page, count_matches, trigram_available,
+                            invalidate_search_cache, get_search_cache_stats)
+from backend.utils import get_db_connection
+
+QUERIES = [
+    'milk', 'cheddar cheese', 'chicken breast', 'apple', 'greek yogurt',
+    'peanut butter', 'oat', 'ch', 'tortilla chips', 'brocoli', 'chocolat chip cookie',
+    'whole wheat bread', 'orange juice', 'almond', 'spaghetti sauce',
+]
+
+
+def legacy_search(query):
+    """The query search_foods_for_log used to run"""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('''
+            SELECT fdc_id, description, category
+            FROM "food"
+            WHERE description ILIKE %s
+            ORDER BY description
+        ''', (f'%{query}%',))
+        return cur.fetchall()
+
+
+def uncached(fn):
+    def run(query):
+        invalidate_search_cache()
+        return fn(query)
+    return run
+
+
+def keyset_page_two(query):
+    """Count + page 1 + page 2, what a search followed by Next costs now"""
+    count_matches(query)
+    _, cursor = search_page(query)
+    if cursor is not None:
+        search_page(query, after=cursor)
+
+
+def latencies(fn, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            fn(query)
+            samples.append((time.perf_counter() - started) * 1000)
+    return np.array(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--queries', nargs='+', default=QUERIES)
+    args = parser.parse_args()
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('SELECT count(*) FROM "food"')
+        n_foods = cur.fetchone()[0]
+    print(f"{n_foods} foods, {len(args.queries)} queries x {args.repeat}, "
+          f"pg_trgm {'installed' if trigram_available() else 'NOT installed'}")
+
+    modes = [('legacy ILIKE', legacy_search),
+             ('ranked ILIKE fallback', uncached(lambda q: search_foods(q, use_trigram=False)))]
+    if trigram_available():
+        modes.append(('ranked trigram', uncached(lambda q: search_foods(q, use_trigram=True))))
+    modes.append(('keyset count+2 pages', uncached(keyset_page_two)))
+
+    print(f"{'mode':>22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, fn in modes:
+        fn(args.queries[0])  # warm up connection and caches
+        ms = latencies(fn, args.queries, args.repeat)
+        print(f"{name:>22} {np.percentile(ms, 50):>8.1f} {np.percentile(ms, 99):>8.1f} {ms.max():>8.1f}")
+
+    # Popular terms repeat: replay a Zipf-distributed stream through the cache
+    rng = np.random.default_rng(0)
+    stream = [args.queries[min(i, len(args.queries)) - 1]
+              for i in rng.zipf(1.5, len(args.queries) * args.repeat)]
+    invalidate_search_cache()
+    ms = latencies(keyset_page_two, stream, 1)
+    stats = get_search_cache_stats()
+    print(f"{'cached, Zipf stream':>22} {np.percentile(ms, 50):>8.1f} {np.percentile(ms, 99):>8.1f} "
+          f"{ms.max():>8.1f}  hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark the compiled ingredient parser (backend/utils.parse_ingredients_uncached).
+
+Times it against the previous parser (kept below as legacy_parse_ingredients:
+one re.sub per disclaimer, character-by-character tokenizer) on a synthetic
+sample with every disclaimer mixed in. What the parser returns is pinned by
+tests/test_parse_ingredients.py.
+
+Usage: python -m benchmarks.bench_parse_ingredients [--foods 20000]
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+
+from backend.utils import parse_ingredients_uncached as parse_ingredients, _DISCLAIMERS
+from benchmarks.bench_parse_parallel import make_texts
+
+
+def synthetic(n, seed=0):
+    """make_texts statements with a random disclaimer phrase spliced in"""
+    rng = np.random.default_rng(seed)
+    phrases = [re.sub(r'\[.*?\]\*|\?|\.\*', '', d).replace('\\', '') + ' 2%' for d in _DISCLAIMERS]
+    texts = make_texts(n, seed)
+    for i in range(0, n, 3):
+        parts = texts[i].split(', ')
+        parts.insert(rng.integers(0, len(parts) + 1), str(rng.choice(phrases)))
+        texts[i] = ', '.join(parts)
+    return texts
+
+
+def timed(parse, texts):
+    started = time.perf_counter()
+    for text in texts:
+        parse(text)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--foods', type=int, default=20000)
+    args = parser.parse_args()
+
+    texts = synthetic(args.foods)
+    legacy = timed(legacy_parse_ingredients, texts)
+    compiled = timed(parse_ingredients, texts)
+    print(f"legacy:   {legacy:.2f}s ({len(texts) / legacy:,.0f} statements/s)")
+    print(f"compiled: {compiled:.2f}s ({len(texts) / compiled:,.0f} statements/s), "
+          f"{legacy / compiled:.1f}x faster")
+
+
+# The parser as it was before the compiled version, for comparison
+def legacy_parse_ingredients(ingredient_str):
+    if not ingredient_str:
+        return []
+
+    s = ingredient_str.upper()
+
+    # Remove unimportant disclaimers and silly prefixes
+    disclaimers = [
+        r'EXCEPT FOR .*',
+        r'FOR COLOR',
+        r'CONTAINS TRACES OF .*',
+        r'MAY CONTAIN .*',
+        r'CANADA GRADE .*',
+        r'SEASONING INGREDIENTS?:',
+        r'SOLUTION INGREDIENTS?:',
+        r'CONTAINS:',
+        r'MADE WITH SMILES',
+        r'MADE WITH:',
+        r'LESS OF:',
+        r'BASTED WITH UP TO 16% ADDED SOLUTION OF',
+        r'BASTED NTE 16% ADDED SOLUTION OF',
+        r'5% OR LESS OF THE FOLLOWING:',
+        r'CONTAINS 2%',
+        r'BASTED WITH UP TO 16% SOLUTION OF',
+        r'BREADED WITH',
+        r'NOT MORE THAN 2% SILICON DIOXIDE ADDED TO PREVENT CAKING',
+        r'CONTAINING UP TO 15% OF A SOLUTION OF WATER',
+        r'PREBROWNED IN',
+        r'CONTAINING UP TO 12% OF A SOLUTION OF WATER',
+        r'IINGREDIENTS:',
+        r'CONTAIN UP TO 18% SOLUTION OF WATER',
+        r'COATING INGREDIENTS:',
+        r'ADDED AS A PRESERVATIVE',
+        r'CONTAINS UP TO 7%',
+        r'MECHANICALLY SEPARATED',
+        r'ADDS A DIETARILY INSIGNIFICANT AMOUNT OF SATURATED FAT',
+        r'OF EACH OF THE FOLLOWING:',
+        r'ADDED TO PROTECT FLAVOR',
+    ]
+    for d in disclaimers:
+        s = re.sub(d, '', s, flags=re.IGNORECASE | re.DOTALL)
+
+    # Remove "contains less than" / "2% or less of" prefixes
+    s = re.sub(r'CONTAINS LESS THAN [\d% ]*OF:', '', s, flags=re.IGNORECASE)
+    s = re.sub(r'CONTAINS 2% OR LESS OF:', '', s, flags=re.IGNORECASE)
+
+    # Remove other prefixes
+    prefixes = [r'^INGREDIENTS?:', r'^MADE FROM:']
+    for p in prefixes:
+        s = re.sub(p, '', s, flags=re.IGNORECASE).strip()
+
+    s = s.replace('*', '').replace('.', ',')  # normalize punctuation
+
+    # Support both () and [] for sub-ingredients
+    def split_top_level(text):
+        tokens = []
+        buf = ''
+        level = 0
+        for char in text:
+            if char in '([':
+                level += 1
+                buf += char
+            elif char in ')]':
+                level -= 1
+                buf += char
+            elif char == ',' and level == 0:
+                if buf.strip():
+                    tokens.append(buf.strip())
+                buf = ''
+            else:
+                buf += char
+        if buf.strip():
+            tokens.append(buf.strip())
+        return tokens
+
+    def parse_token(token):
+        # Check for parentheses or brackets
+        m = re.match(r'^(.*?)\((.*)\)$',
+                     token) or re.match(r'^(.*?)\[(.*)\]$', token)
+        if m:
+            parent = m.group(1).strip()
+            inside = m.group(2).strip()
+            sub_tokens = split_top_level(inside)
+            subs = []
+            for t in sub_tokens:
+                subs += re.split(r'\s+AND/OR\s+|\s+AND\s+|\s+OR\s+', t)
+            subs = [s.strip() for s in subs if s.strip()]
+            return [(parent, subs)]
+        else:
+            # Split AND/OR at top level
+            parts = re.split(r'\s+AND/OR\s+|\s+AND\s+|\s+OR\s+', token)
+            return [(p.strip(), []) for p in parts if p.strip()]
+
+    # Main parsing
+    top_tokens = split_top_level(s)
+    result = []
+    for tok in top_tokens:
+        result += parse_token(tok)
+
+    # Final clean-up
+    cleaned = []
+    for ing, subs in result:
+        ing = ing.strip()
+        subs = [s.strip() for s in subs if s.strip()]
+        if ing:
+            cleaned.append((ing, subs))
+
+    return cleaned
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark parallel ingredient parsing for the bulk import (backend/ingest.py).
+
+Generates synthetic branded-food ingredient statements (nested
+parentheses, AND/OR lists, "CONTAINS 2% OR LESS OF" disclaimers) and
+parses them with parallel_parse at increasing worker counts, checking that
+every run returns exactly what a serial parse does. Reports foods/sec and
+speedup over one worker. The parse cache is cleared before every run so
+workers don't inherit results parsed by an earlier one.
+
+Usage: python -m benchmarks.bench_parse_parallel [--foods 200000] [--workers 1 2 4]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.ingest import available_cpus, parallel_parse
+from backend.parse_cache import clear_parse_cache
+
+ITEMS = ['WATER', 'SUGAR', 'SALT', 'WHEAT FLOUR', 'SOYBEAN OIL', 'CORN SYRUP', 'MILK',
+         'NATURAL FLAVOR', 'CITRIC ACID', 'YEAST', 'EGGS', 'BUTTER', 'CREAM', 'COCOA',
+         'VINEGAR', 'GARLIC POWDER', 'ONION POWDER', 'PAPRIKA', 'XANTHAN GUM', 'PECTIN']
+GROUPS = ['ENRICHED FLOUR (WHEAT FLOUR, NIACIN, REDUCED IRON, THIAMINE MONONITRATE)',
+          'CHOCOLATE CHIPS (SUGAR, CHOCOLATE LIQUOR, COCOA BUTTER, SOY LECITHIN)',
+          'CHEESE (PASTEURIZED MILK, CHEESE CULTURES, SALT, ENZYMES)',
+          'VEGETABLE OIL (CANOLA AND/OR SUNFLOWER OIL)',
+          'SPICES (PAPRIKA, CUMIN [GROUND], OREGANO)']
+DISCLAIMERS = ['CONTAINS 2% OR LESS OF', 'LESS THAN 2% OF', 'CONTAINS ONE OR MORE OF THE FOLLOWING:']
+
+
+def make_texts(n, seed=0):
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n):
+        parts = list(rng.choice(ITEMS, rng.integers(2, 10)))
+        parts[rng.integers(0, len(parts))] = str(rng.choice(GROUPS))
+        if rng.random() < 0.5:
+            parts.insert(rng.integers(1, len(parts)), str(rng.choice(DISCLAIMERS)))
+        texts.append(', '.join(parts) + '.')
+    return texts
+
+
+def main():
+    cores = available_cpus()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--foods', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, min(2, cores), min(4, cores), cores}))
+    args = parser.parse_args()
+
+    texts = make_texts(args.foods)
+    fdc_ids = list(range(1, len(texts) + 1))
+    batches = [(fdc_ids[i:i + args.batch_size], texts[i:i + args.batch_size])
+               for i in range(0, len(texts), args.batch_size)]
+    print(f"{args.foods} foods in {len(batches)} batches, {cores} cores available")
+
+    expected, base = None, None
+    for workers in args.workers:
+        clear_parse_cache()
+        started = time.perf_counter()
+        parsed = [row for batch, _, _ in parallel_parse(iter(batches), workers) for row in batch]
+        elapsed = time.perf_counter() - started
+        if expected is None:
+            expected, base = parsed, elapsed
+        assert parsed == expected, f"{workers} workers parsed differently"
+        print(f"{workers} workers: {elapsed:.2f}s, {args.foods / elapsed:,.0f} foods/s, "
+              f"{len(parsed)} ingredients, speedup {base / elapsed:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
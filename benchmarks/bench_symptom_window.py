@@ -0,0 +1,178 @@
+"""
+Benchmark the symptom exposure window join against the old per-symptom loop.
+
+Generates a synthetic user history (foods with ingredients/subingredients,
+food log entries spread over a year, symptoms) and checks that both
+implementations produce identical ingredient_frequency, food_frequency and
+symptom_details before timing them. The sparse exposure matrix is timed
+separately since it is built once per cached user, not per request.
+
+Usage: python -m benchmarks.bench_symptom_window [--sizes 10000 100000]
+"""
+import argparse
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend.analysis import ExposureMatrix, compute_symptom_exposures, food_ingredient_names
+
+
+def make_user_data(n_entries, n_foods=500, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = [f"INGREDIENT {i}" for i in range(2000)]
+
+    foods = pd.DataFrame({
+        'fdc_id': np.arange(1, n_foods + 1),
+        'description': [f"FOOD {i}" for i in range(1, n_foods + 1)],
+        'category': 'Snacks'
+    })
+
+    ing_rows, sub_rows = [], []
+    for fdc_id in foods['fdc_id']:
+        for name in rng.choice(vocab, size=rng.integers(3, 12), replace=False):
+            ing_id = len(ing_rows) + 1
+            ing_rows.append((ing_id, fdc_id, name))
+            if rng.random() < 0.2:
+                for sub in rng.choice(vocab, size=rng.integers(1, 4), replace=False):
+                    sub_rows.append((len(sub_rows) + 1, ing_id, sub))
+    ingredients = pd.DataFrame(ing_rows, columns=['id', 'fdc_id', 'ingredient'])
+    subingredients = pd.DataFrame(sub_rows, columns=['id', 'ingredient_id', 'sub_ingredient'])
+    name_ids = {name: i + 1 for i, name in enumerate(vocab)}  # ingredient_name ids
+    ingredients['name_id'] = ingredients['ingredient'].map(name_ids)
+    subingredients['name_id'] = subingredients['sub_ingredient'].map(name_ids)
+
+    start = pd.Timestamp('2024-01-01')
+    minutes = rng.integers(0, 365 * 24 * 60, size=n_entries)
+    stamps = start + pd.to_timedelta(np.sort(minutes), unit='min')
+    food_entries = pd.DataFrame({
+        'id': np.arange(1, n_entries + 1),
+        'fdc_id': rng.integers(1, n_foods + 1, size=n_entries),
+        'date': stamps.date,
+        'time': stamps.time,
+    })
+
+    n_symptoms = max(n_entries // 100, 1)
+    s_minutes = rng.integers(0, 365 * 24 * 60, size=n_symptoms)
+    s_stamps = start + pd.to_timedelta(s_minutes, unit='min')
+    symptom_logs = pd.DataFrame({
+        'id': np.arange(1, n_symptoms + 1),
+        'date': s_stamps.date,
+        'time': s_stamps.time,
+        'severity': rng.integers(1, 11, size=n_symptoms),
+        'notes': None,
+    })
+    return symptom_logs, food_entries, foods, ingredients, subingredients
+
+
+def prepare(symptom_logs, food_entries, foods):
+    food_entries = food_entries.copy()
+    food_entries['datetime'] = pd.to_datetime(
+        food_entries['date'].astype(str) + ' ' + food_entries['time'].astype(str))
+    food_entries = food_entries.merge(foods[['fdc_id', 'description']], on='fdc_id', how='left')
+    symptom_logs = symptom_logs.copy()
+    symptom_logs['datetime'] = pd.to_datetime(
+        symptom_logs['date'].astype(str) + ' ' + symptom_logs['time'].astype(str))
+    return symptom_logs, food_entries
+
+
+def legacy_exposures(symptom_logs, food_entries, foods, ingredients, subingredients):
+    """The per-symptom iterrows loop previously inlined in render_symptom_analysis"""
+    ingredients_with_food = ingredients.merge(foods[['fdc_id', 'description']], on='fdc_id', how='left')
+    subingredients_with_food = subingredients.merge(
+        ingredients[['id', 'fdc_id']], left_on='ingredient_id', right_on='id', how='left')
+    subingredients_with_food = subingredients_with_food.merge(
+        foods[['fdc_id', 'description']], on='fdc_id', how='left')
+
+    ingredient_frequency = {}
+    symptom_details = []
+    food_frequency = {}
+    for _, symptom_log in symptom_logs.iterrows():
+        symptom_datetime = pd.to_datetime(str(symptom_log['date']) + ' ' + str(symptom_log['time']))
+        start_time = symptom_datetime - timedelta(hours=24)
+        foods_in_window = food_entries[
+            (food_entries['datetime'] >= start_time) &
+            (food_entries['datetime'] < symptom_datetime)
+        ]
+        fdc_ids_in_window = foods_in_window['fdc_id'].unique()
+        ingredients_in_window = ingredients_with_food[
+            ingredients_with_food['fdc_id'].isin(fdc_ids_in_window)]
+        subingredients_in_window = subingredients_with_food[
+            subingredients_with_food['fdc_id'].isin(fdc_ids_in_window)]
+
+        consumed_ingredients = set()
+        ingredient_to_foods = {}
+        for _, row in ingredients_in_window.iterrows():
+            ing = row['ingredient']
+            consumed_ingredients.add(ing)
+            ingredient_to_foods.setdefault(ing, set()).add(row['description'])
+        for _, row in subingredients_in_window.iterrows():
+            ing = row['sub_ingredient']
+            consumed_ingredients.add(ing)
+            ingredient_to_foods.setdefault(ing, set()).add(row['description'])
+
+        for food_desc in foods_in_window['description'].unique():
+            food_frequency[food_desc] = food_frequency.get(food_desc, 0) + 1
+        for ingredient in consumed_ingredients:
+            ingredient_frequency[ingredient] = ingredient_frequency.get(ingredient, 0) + 1
+
+        symptom_details.append({
+            'datetime': symptom_datetime,
+            'date': symptom_log['date'],
+            'time': symptom_log['time'],
+            'severity': symptom_log['severity'],
+            'notes': symptom_log['notes'],
+            'ingredients': consumed_ingredients,
+            'ingredient_to_foods': ingredient_to_foods
+        })
+    return {
+        'ingredient_frequency': ingredient_frequency,
+        'food_frequency': food_frequency,
+        'symptom_details': symptom_details
+    }
+
+
+def same_result(a, b):
+    if a['ingredient_frequency'] != b['ingredient_frequency']:
+        return False
+    if a['food_frequency'] != b['food_frequency']:
+        return False
+    if len(a['symptom_details']) != len(b['symptom_details']):
+        return False
+    for x, y in zip(a['symptom_details'], b['symptom_details']):
+        if x['datetime'] != y['datetime'] or x['ingredients'] != y['ingredients']:
+            return False
+        if x['ingredient_to_foods'] != y['ingredient_to_foods']:
+            return False
+    return True
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'symptoms':>8} {'legacy s':>10} {'matrix s':>9} "
+          f"{'vectorized s':>13} {'speedup':>8}  match")
+    for n in args.sizes:
+        symptom_logs, food_entries, foods, ingredients, subingredients = make_user_data(n)
+        symptom_logs, food_entries = prepare(symptom_logs, food_entries, foods)
+
+        old, old_s = timed(legacy_exposures, symptom_logs, food_entries, foods,
+                           ingredients, subingredients)
+        matrix, build_s = timed(ExposureMatrix, food_entries, foods,
+                                food_ingredient_names(ingredients, subingredients))
+        new, new_s = timed(compute_symptom_exposures, symptom_logs, matrix)
+        print(f"{n:>8} {len(symptom_logs):>8} {old_s:>10.2f} {build_s:>9.3f} {new_s:>13.3f} "
+              f"{old_s / new_s:>7.1f}x  {same_result(old, new)}")
+
+
+if __name__ == '__main__':
+    main()
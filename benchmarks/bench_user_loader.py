@@ -0,0 +1,132 @@
+"""
+Benchmark the single round-trip get_user_data loader against the old
+six-query loader.
+
+Needs the PostgreSQL database configured in backend/.env. Counts the
+statements each loader sends (one round trip each) and times repeated cold
+loads for the given users, checking both loaders return the same rows.
+
+Usage: python -m benchmarks.bench_user_loader USER_ID [USER_ID ...] [--repeat 5]
+"""
+import argparse
+import time
+
+import pandas as pd
+import psycopg2.extensions
+
+from backend.analysis import food_ingredient_names
+from backend.cache import _load_user_data, USER_FRAMES
+from backend.compact import compact_frame
+from backend.utils import get_db_connection
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    executes = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.executes += 1
+        return super().execute(query, vars)
+
+
+def legacy_load(user_id):
+    """The six read_sql_query calls get_user_data used to run"""
+    with get_db_connection() as conn:
+        frames = {}
+        frames['daily_logs'] = pd.read_sql_query('''
+            SELECT id, date, user_id
+            FROM "dailylog"
+            WHERE user_id = %s
+        ''', conn, params=(user_id,))
+        frames['food_log_entries'] = pd.read_sql_query('''
+            SELECT fle.id, fle.daily_log_id, fle.meal_id, fle.fdc_id,
+                   fle.time, fle.notes, dl.date
+            FROM "foodlogentry" fle
+            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+            WHERE dl.user_id = %s
+        ''', conn, params=(user_id,))
+        frames['symptom_log_entries'] = pd.read_sql_query('''
+            SELECT sle.id, sle.daily_log_id, sle.symptom_id, sle.time,
+                   sle.severity, sle.notes, dl.date, s.name as symptom_name
+            FROM "symptomlogentry" sle
+            JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+            JOIN "symptom" s ON sle.symptom_id = s.id
+            WHERE dl.user_id = %s
+        ''', conn, params=(user_id,))
+        frames['foods'] = pd.read_sql_query('''
+            SELECT DISTINCT f.fdc_id, f.description, f.category
+            FROM "food" f
+            JOIN "foodlogentry" fle ON f.fdc_id = fle.fdc_id
+            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+            WHERE dl.user_id = %s
+        ''', conn, params=(user_id,))
+        ingredients = pd.read_sql_query('''
+            SELECT DISTINCT i.id, i.fdc_id, i.name_id, n.name AS ingredient
+            FROM "ingredient" i
+            JOIN "ingredient_name" n ON n.id = i.name_id
+            JOIN "foodlogentry" fle ON i.fdc_id = fle.fdc_id
+            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+            WHERE dl.user_id = %s
+        ''', conn, params=(user_id,))
+        subingredients = pd.read_sql_query('''
+            SELECT DISTINCT si.id, si.ingredient_id, si.name_id, n.name AS sub_ingredient
+            FROM "subingredient" si
+            JOIN "ingredient" i ON si.ingredient_id = i.id
+            JOIN "ingredient_name" n ON n.id = si.name_id
+            JOIN "foodlogentry" fle ON i.fdc_id = fle.fdc_id
+            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+            WHERE dl.user_id = %s
+        ''', conn, params=(user_id,))
+        frames['food_ingredients'] = food_ingredient_names(ingredients, subingredients)
+    return frames
+
+
+def same_frames(legacy, b):
+    for name in USER_FRAMES:
+        x, y = compact_frame(name, legacy[name]), b[name]
+        key = {'foods': ['fdc_id'], 'food_ingredients': ['fdc_id', 'name_id']}.get(name, ['id'])
+        if len(x) != len(y):
+            return False
+        if len(x) and not x.sort_values(key).reset_index(drop=True).astype(str).equals(
+                y[x.columns].sort_values(key).reset_index(drop=True).astype(str)):
+            return False
+    return True
+
+
+def measure(load, user_id, repeat):
+    """Return (result, round trips per load, best wall time)"""
+    # The pool hands back the most recently returned connection, so in this
+    # single-threaded script every load runs on the connection patched here
+    with get_db_connection() as conn:
+        previous = conn.cursor_factory
+        conn.cursor_factory = CountingCursor
+    CountingCursor.executes = 0
+    best = float('inf')
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = load(user_id)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        with get_db_connection() as conn:
+            conn.cursor_factory = previous
+    return result, CountingCursor.executes / repeat, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('user_ids', type=int, nargs='+')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'user':>6} {'entries':>8} {'legacy trips':>12} {'legacy ms':>10} "
+          f"{'bulk trips':>10} {'bulk ms':>8} {'speedup':>8}  match")
+    for user_id in args.user_ids:
+        old, old_trips, old_s = measure(legacy_load, user_id, args.repeat)
+        new, new_trips, new_s = measure(_load_user_data, user_id, args.repeat)
+        print(f"{user_id:>6} {len(new['food_log_entries']):>8} {old_trips:>12.0f} "
+              f"{old_s * 1000:>10.1f} {new_trips:>10.0f} {new_s * 1000:>8.1f} "
+              f"{old_s / new_s:>7.1f}x  {same_frames(old, new)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 from scipy import stats
 from backend.utils import get_db_connection
+from backend.analysis import ExposureMatrix, compute_symptom_exposures
 
 dash.register_page(__name__, path='/analysis', order=4)
 
@@ -74,16 +75,15 @@ def populate_symptoms(user_id):
     if not user_id:
         return []
 
-    conn = get_db_connection()
-    df = pd.read_sql_query('''
-        SELECT DISTINCT s.name 
-        FROM "symptom" s
-        JOIN "symptomlogentry" sle ON s.id = sle.symptom_id
-        JOIN "dailylog" dl ON sle.daily_log_id = dl.id
-        WHERE dl.user_id = %s
-        ORDER BY s.name
-    ''', conn, params=(user_id,))
-    conn.close()
+    with get_db_connection() as conn:
+        df = pd.read_sql_query('''
+            SELECT DISTINCT s.name 
+            FROM "symptom" s
+            JOIN "symptomlogentry" sle ON s.id = sle.symptom_id
+            JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+            WHERE dl.user_id = %s
+            ORDER BY s.name
+        ''', conn, params=(user_id,))
 
     return [{'label': name, 'value': name} for name in df['name'].tolist()]
 
@@ -111,32 +111,70 @@ def render_analysis(view_mode, symptom_name, user_id):
 
 def render_overview(user_id):
     """Render overview dashboard with general health statistics"""
-    conn = get_db_connection()
-
-    # Get total counts
-    total_meals = pd.read_sql_query('''
-        SELECT COUNT(DISTINCT meal_id) as count
-        FROM "foodlogentry" fle
-        JOIN "dailylog" dl ON fle.daily_log_id = dl.id
-        WHERE dl.user_id = %s AND fle.meal_id IS NOT NULL
-    ''', conn, params=(user_id,))['count'].iloc[0]
-
-    total_symptoms = pd.read_sql_query('''
-        SELECT COUNT(*) as count
-        FROM "symptomlogentry" sle
-        JOIN "dailylog" dl ON sle.daily_log_id = dl.id
-        WHERE dl.user_id = %s
-    ''', conn, params=(user_id,))['count'].iloc[0]
-
-    # Symptom frequency over time
-    symptom_timeline = pd.read_sql_query('''
-        SELECT dl.date, s.name, sle.severity
-        FROM "symptomlogentry" sle
-        JOIN "dailylog" dl ON sle.daily_log_id = dl.id
-        JOIN "symptom" s ON sle.symptom_id = s.id
-        WHERE dl.user_id = %s
-        ORDER BY dl.date
-    ''', conn, params=(user_id,))
+    with get_db_connection() as conn:
+        # Get total counts
+        total_meals = pd.read_sql_query('''
+            SELECT COUNT(DISTINCT meal_id) as count
+            FROM "foodlogentry" fle
+            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+            WHERE dl.user_id = %s AND fle.meal_id IS NOT NULL
+        ''', conn, params=(user_id,))['count'].iloc[0]
+
+        total_symptoms = pd.read_sql_query('''
+            SELECT COUNT(*) as count
+            FROM "symptomlogentry" sle
+            JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+            WHERE dl.user_id = %s
+        ''', conn, params=(user_id,))['count'].iloc[0]
+
+        # Symptom frequency over time
+        symptom_timeline = pd.read_sql_query('''
+            SELECT dl.date, s.name, sle.severity
+            FROM "symptomlogentry" sle
+            JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+            JOIN "symptom" s ON sle.symptom_id = s.id
+            WHERE dl.user_id = %s
+            ORDER BY dl.date
+        ''', conn, params=(user_id,))
+
+        # Most common symptoms
+        common_symptoms = pd.read_sql_query('''
+            SELECT s.name, COUNT(*) as count, AVG(sle.severity) as avg_severity
+            FROM "symptomlogentry" sle
+            JOIN "symptom" s ON sle.symptom_id = s.id
+            JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+            WHERE dl.user_id = %s
+            GROUP BY s.name
+            ORDER BY count DESC
+            LIMIT 10
+        ''', conn, params=(user_id,))
+
+        # Most consumed ingredients
+        top_ingredients = pd.read_sql_query('''
+            SELECT n.name AS ingredient, top.count
+            FROM (
+                SELECT i.name_id, COUNT(*) as count
+                FROM "ingredient" i
+                JOIN "foodlogentry" fle ON i.fdc_id = fle.fdc_id
+                JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+                WHERE dl.user_id = %s
+                GROUP BY i.name_id
+                ORDER BY count DESC
+                LIMIT 15
+            ) top
+            JOIN "ingredient_name" n ON n.id = top.name_id
+            ORDER BY top.count DESC
+        ''', conn, params=(user_id,))
+
+        # Meals per day trend
+        meals_per_day = pd.read_sql_query('''
+            SELECT dl.date, COUNT(DISTINCT fle.meal_id) as meal_count
+            FROM "dailylog" dl
+            LEFT JOIN "foodlogentry" fle ON dl.id = fle.daily_log_id AND fle.meal_id IS NOT NULL
+            WHERE dl.user_id = %s
+            GROUP BY dl.date
+            ORDER BY dl.date
+        ''', conn, params=(user_id,))
 
     # Add color mapping for severity (orange to red gradient)
     if not symptom_timeline.empty:
@@ -149,42 +187,6 @@ def render_overview(user_id):
         else:
             symptom_timeline['color_val'] = 0.5
 
-    # Most common symptoms
-    common_symptoms = pd.read_sql_query('''
-        SELECT s.name, COUNT(*) as count, AVG(sle.severity) as avg_severity
-        FROM "symptomlogentry" sle
-        JOIN "symptom" s ON sle.symptom_id = s.id
-        JOIN "dailylog" dl ON sle.daily_log_id = dl.id
-        WHERE dl.user_id = %s
-        GROUP BY s.name
-        ORDER BY count DESC
-        LIMIT 10
-    ''', conn, params=(user_id,))
-
-    # Most consumed ingredients
-    top_ingredients = pd.read_sql_query('''
-        SELECT i.ingredient, COUNT(*) as count
-        FROM "ingredient" i
-        JOIN "foodlogentry" fle ON i.fdc_id = fle.fdc_id
-        JOIN "dailylog" dl ON fle.daily_log_id = dl.id
-        WHERE dl.user_id = %s
-        GROUP BY i.ingredient
-        ORDER BY count DESC
-        LIMIT 15
-    ''', conn, params=(user_id,))
-
-    # Meals per day trend
-    meals_per_day = pd.read_sql_query('''
-        SELECT dl.date, COUNT(DISTINCT fle.meal_id) as meal_count
-        FROM "dailylog" dl
-        LEFT JOIN "foodlogentry" fle ON dl.id = fle.daily_log_id AND fle.meal_id IS NOT NULL
-        WHERE dl.user_id = %s
-        GROUP BY dl.date
-        ORDER BY dl.date
-    ''', conn, params=(user_id,))
-
-    conn.close()
-
     # Create visualizations
     graphs = []
 
@@ -272,181 +274,38 @@ def render_overview(user_id):
 
 def render_symptom_analysis(user_id, symptom_name):
     """Render detailed analysis for a specific symptom - analyzing ingredients consumed 24h before each symptom"""
-    from backend.cache import get_user_data
+    from backend.cache import get_user_data, get_user_derived
     
     # Get cached user data (fast!)
     user_data = get_user_data(user_id)
     
-    # Filter symptom log entries for this specific symptom
+    # Filter symptom log entries for this specific symptom (sorted by datetime)
     symptom_logs = user_data['symptom_log_entries'][
         user_data['symptom_log_entries']['symptom_name'] == symptom_name
-    ].copy()
+    ]
 
     if symptom_logs.empty:
         return html.Div("No occurrences of this symptom found. Log symptoms to see analysis.",
                         style={'textAlign': 'center', 'padding': '40px', 'color': '#666'})
 
-    # Get all food log entries, ingredients, and subingredients from cache
-    food_entries = user_data['food_log_entries'].copy()
-    foods = user_data['foods'].copy()
-    ingredients = user_data['ingredients'].copy()
-    subingredients = user_data['subingredients'].copy()
-    
-    # Create datetime column for food entries
-    food_entries['datetime'] = pd.to_datetime(food_entries['date'].astype(str) + ' ' + food_entries['time'].astype(str))
-    
-    # Merge to get food descriptions and ingredients
-    food_entries = food_entries.merge(foods[['fdc_id', 'description']], on='fdc_id', how='left')
-    ingredients_with_food = ingredients.merge(foods[['fdc_id', 'description']], on='fdc_id', how='left')
-    subingredients_with_food = subingredients.merge(ingredients[['id', 'fdc_id']], left_on='ingredient_id', right_on='id', how='left')
-    subingredients_with_food = subingredients_with_food.merge(foods[['fdc_id', 'description']], on='fdc_id', how='left')
-    
-    # Count how many times each ingredient appeared before symptoms
-    ingredient_frequency = {}
-    symptom_details = []
-    food_frequency = {}
-
-    for _, symptom_log in symptom_logs.iterrows():
-        symptom_datetime = pd.to_datetime(str(symptom_log['date']) + ' ' + str(symptom_log['time']))
-        start_time = symptom_datetime - timedelta(hours=24)
-
-        # Filter food entries in 24h window
-        foods_in_window = food_entries[
-            (food_entries['datetime'] >= start_time) & 
-            (food_entries['datetime'] < symptom_datetime)
-        ]
-        
-        # Get unique fdc_ids consumed in window
-        fdc_ids_in_window = foods_in_window['fdc_id'].unique()
-        
-        # Get ingredients for these foods
-        ingredients_in_window = ingredients_with_food[
-            ingredients_with_food['fdc_id'].isin(fdc_ids_in_window)
-        ]
-        
-        # Get subingredients for these foods
-        subingredients_in_window = subingredients_with_food[
-            subingredients_with_food['fdc_id'].isin(fdc_ids_in_window)
-        ]
-        
-        # Collect all ingredients and map to foods
-        consumed_ingredients = set()
-        ingredient_to_foods = {}
-        
-        for _, row in ingredients_in_window.iterrows():
-            ing = row['ingredient']
-            consumed_ingredients.add(ing)
-            if ing not in ingredient_to_foods:
-                ingredient_to_foods[ing] = set()
-            ingredient_to_foods[ing].add(row['description'])
-        
-        for _, row in subingredients_in_window.iterrows():
-            ing = row['sub_ingredient']
-            consumed_ingredients.add(ing)
-            if ing not in ingredient_to_foods:
-                ingredient_to_foods[ing] = set()
-            ingredient_to_foods[ing].add(row['description'])
-        
-        # Track food frequency
-        for food_desc in foods_in_window['description'].unique():
-            food_frequency[food_desc] = food_frequency.get(food_desc, 0) + 1
-        
-        # Update ingredient frequency count
-        for ingredient in consumed_ingredients:
-            ingredient_frequency[ingredient] = ingredient_frequency.get(ingredient, 0) + 1
-
-        # Store details for this symptom occurrence
-        symptom_details.append({
-            'datetime': symptom_datetime,
-            'date': symptom_log['date'],
-            'time': symptom_log['time'],
-            'severity': symptom_log['severity'],
-            'notes': symptom_log['notes'],
-            'ingredients': consumed_ingredients,
-            'ingredient_to_foods': ingredient_to_foods
-        })
-
-    # Calculate statistics for each ingredient
-    total_symptom_occurrences = len(symptom_logs)
-
-    ingredient_stats = []
-    for ingredient, frequency in ingredient_frequency.items():
-        percentage = (frequency / total_symptom_occurrences) * 100
-
-        ingredient_stats.append({
-            'ingredient': ingredient,
-            'times_before_symptom': frequency,
-            'total_occurrences': total_symptom_occurrences,
-            'percentage': percentage
-        })
-
-    # Initial dataframe (will be sorted after correlation calculation)
-    ingredient_stats_df = pd.DataFrame(ingredient_stats)
-
-    # Get total consumption count for ALL ingredients using cached data
-    all_ingredient_consumption = {}
-
-    if ingredient_frequency:
-        # Merge ingredients with food entries to count total consumption
-        # Rename id columns to avoid conflicts
-        ingredients_merged = ingredients_with_food.merge(
-            food_entries[['fdc_id', 'id']].rename(columns={'id': 'entry_id'}), 
-            on='fdc_id', how='inner'
-        )
-        
-        # Count occurrences for each ingredient
-        ingredient_counts = ingredients_merged.groupby('ingredient')['entry_id'].nunique().to_dict()
-        
-        # Count occurrences for each subingredient
-        subingredients_merged = subingredients_with_food.merge(
-            food_entries[['fdc_id', 'id']].rename(columns={'id': 'entry_id'}), 
-            on='fdc_id', how='inner'
-        )
-        subingredient_counts = subingredients_merged.groupby('sub_ingredient')['entry_id'].nunique().to_dict()
-        
-        # Combine counts
-        for ingredient in ingredient_frequency.keys():
-            total = ingredient_counts.get(ingredient, 0) + subingredient_counts.get(ingredient, 0)
-            all_ingredient_consumption[ingredient] = max(total, ingredient_frequency[ingredient])
-
-    # Add correlation metric (times before symptom / total times consumed)
-    for i, row in ingredient_stats_df.iterrows():
-        ingredient = row['ingredient']
-        total_consumed = all_ingredient_consumption.get(
-            ingredient, row['times_before_symptom'])
-        correlation_rate = (row['times_before_symptom'] /
-                            total_consumed * 100) if total_consumed > 0 else 0
-        ingredient_stats_df.at[i, 'total_consumed'] = total_consumed
-        ingredient_stats_df.at[i, 'correlation_rate'] = correlation_rate
+    # Join every symptom to the foods/ingredients consumed in the 24h before it,
+    # using the user's sparse exposure matrix (built once per cached user data).
+    # The detail list keeps the order the entries were logged in (by id, as the
+    # unordered query used to return them), not the frame's datetime order
+    exposures = compute_symptom_exposures(
+        symptom_logs.sort_values('id', kind='stable'),
+        get_user_derived(user_id, user_data, 'exposure_matrix', ExposureMatrix.from_user_data),
+        detail_limit=10)
+    ingredient_frequency = exposures['ingredient_frequency']
+    symptom_details = exposures['symptom_details']
 
     # Sort by correlation rate (highest correlation = most likely culprit)
-    ingredient_stats_df = ingredient_stats_df.sort_values(
+    ingredient_stats_df = exposures['ingredient_stats'].sort_values(
         'correlation_rate', ascending=False)
 
-    # Calculate food culprits (foods ranked by how often they appeared before symptoms)
-    food_culprits = []
-    if food_frequency:
-        # Count total consumption for each food using cached data
-        food_consumption_counts = food_entries.groupby('description')['id'].nunique().to_dict()
-        
-        # Calculate correlation rates
-        for food_name, freq in food_frequency.items():
-            total_consumed = food_consumption_counts.get(food_name, freq)
-            correlation_rate = (freq / total_consumed * 100) if total_consumed > 0 else 0
-
-            food_culprits.append({
-                'food': food_name,
-                'times_before_symptom': freq,
-                'total_consumed': total_consumed,
-                'correlation_rate': correlation_rate
-            })
-
-    food_culprits_df = pd.DataFrame(food_culprits).sort_values(
-        'correlation_rate', ascending=False).head(10) if food_culprits else pd.DataFrame()
-
-    # Symptom timeline (already has datetime from cache)
-    symptom_logs['datetime'] = pd.to_datetime(
-        symptom_logs['date'].astype(str) + ' ' + symptom_logs['time'].astype(str))
+    # Food culprits (foods ranked by how often they appeared before symptoms)
+    food_culprits_df = exposures['food_stats'].sort_values(
+        'correlation_rate', ascending=False).head(10)
 
     # Create visualizations
     graphs = []
@@ -486,9 +345,8 @@ def render_symptom_analysis(user_id, symptom_name):
 
     # Severity timeline
     if not symptom_logs.empty:
-        # Sort by datetime for proper line chart
-        symptom_logs_sorted = symptom_logs.sort_values('datetime')
-        fig_severity = px.line(symptom_logs_sorted, x='datetime', y='severity',
+        # Cached entries are already sorted by datetime for the line chart
+        fig_severity = px.line(symptom_logs, x='datetime', y='severity',
                                title=f'{symptom_name} Severity Over Time',
                                labels={'datetime': 'Date',
                                        'severity': 'Severity'},
@@ -1,9 +1,17 @@
+import os
 import dash
 from backend.utils import get_db_connection
+from backend.calendar_cache import (calendar_range, shift_date, get_calendar_entries,
+                                    prefetch_adjacent_ranges, invalidate_calendar_cache,
+                                    calendar_payload)
+from backend.settings import CALENDAR_RENDERING
 import calendar
 from datetime import datetime, date, timedelta
 import pandas as pd
-from dash import html, dcc, Input, Output, State, callback, ALL, MATCH
+from dash import html, dcc, Input, Output, State, callback, ALL, MATCH, ClientsideFunction
+
+# 'client': the grid is built by assets/calendar.js (see backend/settings.py)
+CLIENT_RENDERING = os.getenv('calendar_rendering', CALENDAR_RENDERING) == 'client'
 
 
 def get_entry_style(entry_type):
@@ -35,6 +43,16 @@ def get_entry_style(entry_type):
         return {}
 
 
+def calendar_callback(*args, client=False, **kwargs):
+    """
+    callback() that is only registered when the calendar renders on the
+    server, or with client=True only when it renders in the browser
+    """
+    if client != CLIENT_RENDERING:
+        return lambda func: func
+    return callback(*args, **kwargs)
+
+
 # Callback to update calendar-date based on navigation and view mode
 
 
@@ -75,6 +93,10 @@ layout = html.Div([
     dcc.Store(id='modal-close-store', data=0),
     dcc.Store(id='previous-view-mode', data='month'),
     dcc.Store(id='scroll-trigger', data=0),
+    # Client-side rendering: ranges to fetch, fetched ranges, ranges held
+    dcc.Store(id='calendar-range-request'),
+    dcc.Store(id='calendar-range-response'),
+    dcc.Store(id='calendar-range-cache', data={}),
     dcc.Store(id='modal-edit-mode', data=False),
     dcc.Store(id='modal-entry-data', data={}),
     html.Div(
@@ -106,7 +128,7 @@ layout = html.Div([
     Output('user-info', 'children'),
     Input('current-user-id', 'data')
 )
-@callback(
+@calendar_callback(
     Output('calendar-view', 'children'),
     Output('calendar-date', 'data', allow_duplicate=True),
     Output('previous-view-mode', 'data'),
@@ -138,83 +160,11 @@ def calendar_view(user_id, refresh_trigger, view_mode, current_date, pathname, p
     else:
         base_date = date.fromisoformat(current_date)
 
-    # Determine date range for query
-    if view_mode == 'day':
-        start_date = end_date = base_date
-    elif view_mode == 'week':
-        start_date = base_date - timedelta(days=base_date.weekday())
-        end_date = start_date + timedelta(days=6)
-    else:  # month
-        start_date = date(base_date.year, base_date.month, 1)
-        last_day = calendar.monthrange(base_date.year, base_date.month)[1]
-        end_date = date(base_date.year, base_date.month, last_day)
-
-    # Query individual entries for the range
-    conn = get_db_connection()
-
-    # Query food entries
-    print(
-        f"DEBUG: user_id={user_id}, start_date={start_date}, end_date={end_date}")
-    food_df = pd.read_sql_query('''
-        SELECT dl.date, fle.id as entry_id, f.description as name, fle.time, fle.notes, fle.meal_id
-        FROM "dailylog" dl
-        JOIN "foodlogentry" fle ON dl.id = fle.daily_log_id
-        JOIN "food" f ON fle.fdc_id = f.fdc_id
-        WHERE dl.user_id = %s AND dl.date BETWEEN %s AND %s
-        ORDER BY dl.date, fle.time
-    ''', conn, params=(user_id, start_date.isoformat(), end_date.isoformat()))
-    print(f"DEBUG: food_df rows={len(food_df)}")
-
-    symptom_df = pd.read_sql_query('''
-        SELECT dl.date, sle.id as entry_id, s.name, sle.time, sle.severity, sle.notes
-        FROM "dailylog" dl
-        JOIN "symptomlogentry" sle ON dl.id = sle.daily_log_id
-        JOIN "symptom" s ON sle.symptom_id = s.id
-        WHERE dl.user_id = %s AND dl.date BETWEEN %s AND %s
-        ORDER BY dl.date, sle.time
-    ''', conn, params=(user_id, start_date.isoformat(), end_date.isoformat()))
-    print(f"DEBUG: symptom_df rows={len(symptom_df)}")
-    conn.close()
-    # Group by date
-    entries = {}
-    for _, row in food_df.iterrows():
-        d = row['date'].isoformat() if hasattr(
-            row['date'], 'isoformat') else str(row['date'])
-        if d not in entries:
-            entries[d] = {'meals': {}, 'symptoms': [], 'foods': []}
-        meal_id = row['meal_id']
-        # Only treat as meal if meal_id is a real, non-null, non-empty, non-zero value
-        if meal_id is not None and str(meal_id).strip() not in ('', 'None', 'none', 'null', '0') and meal_id != 0:
-            if meal_id not in entries[d]['meals']:
-                entries[d]['meals'][meal_id] = {
-                    'time': row['time'].strftime('%H:%M') if hasattr(row['time'], 'strftime') else str(row['time']),
-                    'foods': []
-                }
-            entries[d]['meals'][meal_id]['foods'].append({
-                'id': row['entry_id'],
-                'name': row['name'],
-                'notes': row['notes']
-            })
-        else:
-            entries[d]['foods'].append({
-                'id': row['entry_id'],
-                'name': row['name'],
-                'time': row['time'].strftime('%H:%M') if hasattr(row['time'], 'strftime') else str(row['time']),
-                'notes': row['notes']
-            })
-
-    for _, row in symptom_df.iterrows():
-        d = row['date'].isoformat() if hasattr(
-            row['date'], 'isoformat') else str(row['date'])
-        if d not in entries:
-            entries[d] = {'meals': {}, 'symptoms': [], 'foods': []}
-        entries[d]['symptoms'].append({
-            'id': row['entry_id'],
-            'name': row['name'],
-            'time': row['time'].strftime('%H:%M') if hasattr(row['time'], 'strftime') else str(row['time']),
-            'severity': row['severity'],
-            'notes': row['notes']
-        })
+    # Entries for the visible range; the neighbouring periods are loaded in
+    # the background so prev/next navigation is served from the cache
+    start_date, end_date = calendar_range(view_mode, base_date)
+    entries = get_calendar_entries(user_id, start_date, end_date)
+    prefetch_adjacent_ranges(user_id, view_mode, base_date)
 
     def create_entry_cards(entry_list, entry_type):
         cards = []
@@ -930,6 +880,66 @@ def calendar_view(user_id, refresh_trigger, view_mode, current_date, pathname, p
         return the_div, date_output, prev_output, scroll_output
 
 
+@calendar_callback(
+    Output('calendar-range-response', 'data'),
+    Input('calendar-range-request', 'data'),
+    State('current-user-id', 'data'),
+    prevent_initial_call=True,
+    client=True
+)
+def fetch_calendar_ranges(request, user_id):
+    """
+    Columnar entries for the ranges the client-side calendar doesn't have yet.
+    The user comes from the session store; the request's user_id is ignored.
+    """
+    if not request or not user_id:
+        return dash.no_update
+    ranges = {}
+    for start, end in request['ranges']:
+        start_date, end_date = date.fromisoformat(start), date.fromisoformat(end)
+        ranges[f"{start}/{end}"] = calendar_payload(
+            get_calendar_entries(user_id, start_date, end_date), start_date)
+    return {'user_id': user_id, 'refresh': request['refresh'], 'ranges': ranges}
+
+
+if CLIENT_RENDERING:
+    dash.clientside_callback(
+        ClientsideFunction(namespace='calendar', function_name='switchView'),
+        Output('calendar-date', 'data', allow_duplicate=True),
+        Output('previous-view-mode', 'data'),
+        Input('calendar-view-mode', 'value'),
+        State('previous-view-mode', 'data'),
+        prevent_initial_call=True
+    )
+    dash.clientside_callback(
+        ClientsideFunction(namespace='calendar', function_name='request'),
+        Output('calendar-range-request', 'data'),
+        Input('calendar-view-mode', 'value'),
+        Input('calendar-date', 'data'),
+        Input('calendar-refresh', 'data'),
+        Input('current-user-id', 'data'),
+        State('calendar-range-cache', 'data')
+    )
+    dash.clientside_callback(
+        ClientsideFunction(namespace='calendar', function_name='merge'),
+        Output('calendar-range-cache', 'data'),
+        Input('calendar-range-response', 'data'),
+        State('calendar-range-cache', 'data'),
+        prevent_initial_call=True
+    )
+    dash.clientside_callback(
+        ClientsideFunction(namespace='calendar', function_name='render'),
+        Output('calendar-view', 'children'),
+        Output('scroll-trigger', 'data'),
+        Input('calendar-range-cache', 'data'),
+        Input('calendar-date', 'data'),
+        Input('calendar-view-mode', 'value'),
+        Input('calendar-refresh', 'data'),
+        Input('current-user-id', 'data'),
+        State('scroll-trigger', 'data')
+    )
+
+
 @callback(
     Output('entry-modal', 'style'),
     Output('modal-title-row', 'children'),
@@ -973,252 +983,252 @@ def manage_entry_modal(entry_clicks, close_clicks, current_style, refresh_data,
                 entry_id = id_dict['entry_id']
                 print(f"DEBUG: entry_type={entry_type}, entry_id={entry_id}")
 
-                conn = get_db_connection()
-                if entry_type == 'meal':
-                    # Only show meal details if meal_id is not None/null/empty
-                    if entry_id is None or str(entry_id).lower() == 'none' or str(entry_id).strip() == '' or str(entry_id).lower() == 'null':
-                        details = "Meal not found"
-                    else:
-                        meal_id_str = str(entry_id)
-                        foods_df = pd.read_sql_query('''
-                            SELECT fle.id as food_entry_id, f.description, fle.time, fle.notes, fle.fdc_id
+                with get_db_connection() as conn:
+                    if entry_type == 'meal':
+                        # Only show meal details if meal_id is not None/null/empty
+                        if entry_id is None or str(entry_id).lower() == 'none' or str(entry_id).strip() == '' or str(entry_id).lower() == 'null':
+                            details = "Meal not found"
+                        else:
+                            meal_id_str = str(entry_id)
+                            foods_df = pd.read_sql_query('''
+                                SELECT fle.id as food_entry_id, f.description, fle.time, fle.notes, fle.fdc_id
+                                FROM "foodlogentry" fle
+                                JOIN "food" f ON fle.fdc_id = f.fdc_id
+                                WHERE fle.meal_id = %s
+                                ORDER BY fle.time
+                            ''', conn, params=(meal_id_str,))
+                            if not foods_df.empty:
+                                food_items = []
+                                foods_list = []
+                                for idx, row in foods_df.iterrows():
+                                    # Remove seconds from time
+                                    time_str = str(row['time'])[:5] if len(
+                                        str(row['time'])) > 5 else str(row['time'])
+                                    time_display = "" if time_str == '00:00' else f" ({time_str})"
+                                    notes_display = f" - {row['notes']}" if row['notes'] and row['notes'].strip(
+                                    ) else ""
+
+                                    food_items.append(html.Li(
+                                        f"{row['description']}{time_display}{notes_display}",
+                                        style={'marginBottom': '8px',
+                                               'fontSize': '14px'}
+                                    ))
+
+                                    # Store food data for editing
+                                    foods_list.append({
+                                        'food_entry_id': int(row['food_entry_id']),
+                                        'description': row['description'],
+                                        'time': time_str,
+                                        'fdc_id': int(row['fdc_id'])
+                                    })
+
+                                food_names = ', '.join(
+                                    foods_df['description'].tolist())
+                                meal_time = str(foods_df.iloc[0]['time'])[:5] if len(
+                                    str(foods_df.iloc[0]['time'])) > 5 else str(foods_df.iloc[0]['time'])
+
+                                # Build content parts list
+                                content_parts = []
+
+                                # Only add time if not 00:00
+                                if meal_time != '00:00':
+                                    content_parts.append(
+                                        html.Div([
+                                            html.Strong("Time:", style={
+                                                        'color': '#666', 'fontSize': '14px'}),
+                                            html.Span(meal_time, style={
+                                                      'fontSize': '16px', 'marginLeft': '8px'})
+                                        ], style={'marginBottom': '16px'})
+                                    )
+
+                                # Add foods list
+                                content_parts.append(
+                                    html.Div([
+                                        html.Strong("Foods in this meal:", style={
+                                                    'color': '#666', 'fontSize': '14px', 'marginBottom': '8px', 'display': 'block'}),
+                                        html.Ul(food_items, style={
+                                                'paddingLeft': '20px', 'marginTop': '8px'})
+                                    ], style={'marginBottom': '16px'})
+                                )
+
+                                details = {'content': html.Div(content_parts, style={
+                                                               'padding': '8px'}), 'title': food_names, 'entry_type': 'meal', 'entry_id': entry_id, 'time': meal_time, 'foods': foods_list}
+                            else:
+                                details = {'content': "Meal not found",
+                                           'title': 'Meal Details'}
+                    elif entry_type == 'food':
+                        # Get food entry details with ingredients
+                        food_df = pd.read_sql_query('''
+                            SELECT f.description, f.fdc_id, fle.time, fle.notes, dl.date,
+                                   (SELECT array_agg(n.name ORDER BY u.pos)
+                                    FROM "food_ingredient_set" fs
+                                    CROSS JOIN LATERAL unnest(fs.ingredient_ids)
+                                        WITH ORDINALITY AS u (name_id, pos)
+                                    JOIN "ingredient_name" n ON n.id = u.name_id
+                                    WHERE fs.fdc_id = f.fdc_id) AS ingredients
                             FROM "foodlogentry" fle
                             JOIN "food" f ON fle.fdc_id = f.fdc_id
-                            WHERE fle.meal_id = %s
-                            ORDER BY fle.time
-                        ''', conn, params=(meal_id_str,))
-                        if not foods_df.empty:
-                            food_items = []
-                            foods_list = []
-                            for idx, row in foods_df.iterrows():
-                                # Remove seconds from time
-                                time_str = str(row['time'])[:5] if len(
-                                    str(row['time'])) > 5 else str(row['time'])
-                                time_display = "" if time_str == '00:00' else f" ({time_str})"
-                                notes_display = f" - {row['notes']}" if row['notes'] and row['notes'].strip(
-                                ) else ""
-
-                                food_items.append(html.Li(
-                                    f"{row['description']}{time_display}{notes_display}",
-                                    style={'marginBottom': '8px',
-                                           'fontSize': '14px'}
-                                ))
-
-                                # Store food data for editing
-                                foods_list.append({
-                                    'food_entry_id': int(row['food_entry_id']),
-                                    'description': row['description'],
-                                    'time': time_str,
-                                    'fdc_id': int(row['fdc_id'])
-                                })
-
-                            food_names = ', '.join(
-                                foods_df['description'].tolist())
-                            meal_time = str(foods_df.iloc[0]['time'])[:5] if len(
-                                str(foods_df.iloc[0]['time'])) > 5 else str(foods_df.iloc[0]['time'])
-
-                            # Build content parts list
+                            JOIN "dailylog" dl ON fle.daily_log_id = dl.id
+                            WHERE fle.id = %s
+                        ''', conn, params=(entry_id,))
+
+                        if not food_df.empty:
+                            food_row = food_df.iloc[0]
+                            food_name = food_row['description']
+                            ingredients = food_row['ingredients'] or []
+
+                            # Format time
+                            time_str = str(food_row['time'])[:5] if len(
+                                str(food_row['time'])) > 5 else str(food_row['time'])
+
                             content_parts = []
 
                             # Only add time if not 00:00
-                            if meal_time != '00:00':
+                            if time_str != '00:00':
                                 content_parts.append(
                                     html.Div([
                                         html.Strong("Time:", style={
                                                     'color': '#666', 'fontSize': '14px'}),
-                                        html.Span(meal_time, style={
+                                        html.Span(time_str, style={
                                                   'fontSize': '16px', 'marginLeft': '8px'})
+                                    ], style={'marginBottom': '12px'})
+                                )
+
+                            # Add ingredients section if they exist
+                            if ingredients:
+                                ingredient_items = [html.Li(ing, style={'fontSize': '14px', 'marginBottom': '4px'})
+                                                    for ing in ingredients]
+                                content_parts.append(
+                                    html.Div([
+                                        html.Strong("Ingredients:", style={
+                                                    'color': '#666', 'fontSize': '14px', 'marginBottom': '8px', 'display': 'block'}),
+                                        html.Ul(ingredient_items, style={
+                                                'paddingLeft': '20px', 'marginTop': '8px'})
                                     ], style={'marginBottom': '16px'})
                                 )
 
-                            # Add foods list
-                            content_parts.append(
-                                html.Div([
-                                    html.Strong("Foods in this meal:", style={
-                                                'color': '#666', 'fontSize': '14px', 'marginBottom': '8px', 'display': 'block'}),
-                                    html.Ul(food_items, style={
-                                            'paddingLeft': '20px', 'marginTop': '8px'})
-                                ], style={'marginBottom': '16px'})
-                            )
+                            # Add notes if they exist
+                            if food_row['notes'] and str(food_row['notes']).strip():
+                                content_parts.append(
+                                    html.Div([
+                                        html.Strong("Notes:", style={
+                                                    'color': '#666', 'fontSize': '14px'}),
+                                        html.Div(str(food_row['notes']), style={
+                                                 'marginTop': '4px', 'padding': '8px', 'backgroundColor': '#f8f9fa', 'borderRadius': '4px', 'fontSize': '14px'})
+                                    ], style={'marginBottom': '16px'})
+                                )
 
-                            details = {'content': html.Div(content_parts, style={
-                                                           'padding': '8px'}), 'title': food_names, 'entry_type': 'meal', 'entry_id': entry_id, 'time': meal_time, 'foods': foods_list}
+                            details = {'content': html.Div([c for c in content_parts if c is not None], style={
+                                                           'padding': '8px'}), 'title': food_name, 'entry_type': 'food', 'entry_id': entry_id, 'time': time_str}
                         else:
-                            details = {'content': "Meal not found",
-                                       'title': 'Meal Details'}
-                elif entry_type == 'food':
-                    # Get food entry details with ingredients
-                    food_df = pd.read_sql_query('''
-                        SELECT f.description, f.fdc_id, fle.time, fle.notes, dl.date
-                        FROM "foodlogentry" fle
-                        JOIN "food" f ON fle.fdc_id = f.fdc_id
-                        JOIN "dailylog" dl ON fle.daily_log_id = dl.id
-                        WHERE fle.id = %s
-                    ''', conn, params=(entry_id,))
-
-                    if not food_df.empty:
-                        food_row = food_df.iloc[0]
-                        food_name = food_row['description']
-                        fdc_id = food_row['fdc_id']
-
-                        # Get ingredients
-                        ingredients_df = pd.read_sql_query('''
-                            SELECT ingredient FROM "ingredient" WHERE fdc_id = %s
-                        ''', conn, params=(fdc_id,))
-
-                        # Format time
-                        time_str = str(food_row['time'])[:5] if len(
-                            str(food_row['time'])) > 5 else str(food_row['time'])
-
-                        content_parts = []
-
-                        # Only add time if not 00:00
-                        if time_str != '00:00':
-                            content_parts.append(
-                                html.Div([
-                                    html.Strong("Time:", style={
-                                                'color': '#666', 'fontSize': '14px'}),
-                                    html.Span(time_str, style={
-                                              'fontSize': '16px', 'marginLeft': '8px'})
-                                ], style={'marginBottom': '12px'})
-                            )
+                            details = {'content': "Food entry not found",
+                                       'title': 'Food Details'}
+
+                    elif entry_type == 'symptom':
+                        df = pd.read_sql_query('''
+                            SELECT s.name, sle.time, sle.severity, sle.notes, sle.id, dl.date
+                            FROM "symptomlogentry" sle
+                            JOIN "symptom" s ON sle.symptom_id = s.id
+                            JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+                            WHERE sle.id = %s
+                        ''', conn, params=(entry_id,))
+                        if not df.empty:
+                            row = df.iloc[0]
+                            symptom_date = row['date']
+
+                            # Format time display (hide if 00:00, remove seconds)
+                            # If time is 00:00, check for date range
+                            time_str = str(row['time'])[:5] if len(
+                                str(row['time'])) > 5 else str(row['time'])
+
+                            if time_str != '00:00':
+                                time_display = f"Time: {time_str}"
+                            else:
+                                # Find date range for this symptom with 00:00 time
+                                try:
+                                    # Get the symptom_id and current date for this entry
+                                    with conn.cursor() as cur:
+                                        cur.execute(
+                                            'SELECT symptom_id, daily_log_id FROM "symptomlogentry" WHERE id = %s', (entry_id,))
+                                        symptom_info = cur.fetchone()
+                                        symptom_id = symptom_info[0]
+                                        daily_log_id = symptom_info[1]
+
+                                        cur.execute(
+                                            'SELECT date FROM "dailylog" WHERE id = %s', (daily_log_id,))
+                                        current_date = cur.fetchone()[0]
+
+                                    # Calculate date range
+                                    from datetime import timedelta
+                                    start_range = current_date - timedelta(days=30)
+                                    end_range = current_date + timedelta(days=30)
+
+                                    range_df = pd.read_sql_query('''
+                                        SELECT MIN(dl.date) as start_date, MAX(dl.date) as end_date, COUNT(*) as days
+                                        FROM "symptomlogentry" sle
+                                        JOIN "dailylog" dl ON sle.daily_log_id = dl.id
+                                        WHERE sle.symptom_id = %s
+                                        AND sle.time = '00:00'
+                                        AND sle.severity = %s
+                                        AND dl.date BETWEEN %s AND %s
+                                    ''', conn, params=(int(symptom_id), int(row['severity']), start_range, end_range))
+
+                                    if not range_df.empty and range_df.iloc[0]['days'] > 1:
+                                        start = range_df.iloc[0]['start_date']
+                                        end = range_df.iloc[0]['end_date']
+                                        days = range_df.iloc[0]['days']
+                                        time_display = f"Duration: {start.strftime('%b %d')} - {end.strftime('%b %d, %Y')} ({days} days)"
+                                    else:
+                                        time_display = None
+                                except Exception as e:
+                                    print(f"Error getting date range: {e}")
+                                    time_display = None
 
-                        # Add ingredients section if they exist
-                        if not ingredients_df.empty:
-                            ingredient_items = [html.Li(ing, style={'fontSize': '14px', 'marginBottom': '4px'})
-                                                for ing in ingredients_df['ingredient'].tolist()]
-                            content_parts.append(
-                                html.Div([
-                                    html.Strong("Ingredients:", style={
-                                                'color': '#666', 'fontSize': '14px', 'marginBottom': '8px', 'display': 'block'}),
-                                    html.Ul(ingredient_items, style={
-                                            'paddingLeft': '20px', 'marginTop': '8px'})
-                                ], style={'marginBottom': '16px'})
-                            )
+                            # Severity emoji mapping
+                            severity_emojis = {
+                                1: '', 2: '🙁', 3: '', 4: '😕', 5: '', 6: '😟', 7: '', 8: '😣', 9: '', 10: '😫'}
+                            severity_emoji = severity_emojis.get(
+                                row['severity'], '')
 
-                        # Add notes if they exist
-                        if food_row['notes'] and str(food_row['notes']).strip():
-                            content_parts.append(
-                                html.Div([
-                                    html.Strong("Notes:", style={
-                                                'color': '#666', 'fontSize': '14px'}),
-                                    html.Div(str(food_row['notes']), style={
-                                             'marginTop': '4px', 'padding': '8px', 'backgroundColor': '#f8f9fa', 'borderRadius': '4px', 'fontSize': '14px'})
-                                ], style={'marginBottom': '16px'})
-                            )
+                            # Build content components
+                            content_parts = []
 
-                        details = {'content': html.Div([c for c in content_parts if c is not None], style={
-                                                       'padding': '8px'}), 'title': food_name, 'entry_type': 'food', 'entry_id': entry_id, 'time': time_str}
-                    else:
-                        details = {'content': "Food entry not found",
-                                   'title': 'Food Details'}
-
-                elif entry_type == 'symptom':
-                    df = pd.read_sql_query('''
-                        SELECT s.name, sle.time, sle.severity, sle.notes, sle.id, dl.date
-                        FROM "symptomlogentry" sle
-                        JOIN "symptom" s ON sle.symptom_id = s.id
-                        JOIN "dailylog" dl ON sle.daily_log_id = dl.id
-                        WHERE sle.id = %s
-                    ''', conn, params=(entry_id,))
-                    if not df.empty:
-                        row = df.iloc[0]
-                        symptom_date = row['date']
-
-                        # Format time display (hide if 00:00, remove seconds)
-                        # If time is 00:00, check for date range
-                        time_str = str(row['time'])[:5] if len(
-                            str(row['time'])) > 5 else str(row['time'])
-
-                        if time_str != '00:00':
-                            time_display = f"Time: {time_str}"
-                        else:
-                            # Find date range for this symptom with 00:00 time
-                            try:
-                                # Get the symptom_id and current date for this entry
-                                with conn.cursor() as cur:
-                                    cur.execute(
-                                        'SELECT symptom_id, daily_log_id FROM "symptomlogentry" WHERE id = %s', (entry_id,))
-                                    symptom_info = cur.fetchone()
-                                    symptom_id = symptom_info[0]
-                                    daily_log_id = symptom_info[1]
-
-                                    cur.execute(
-                                        'SELECT date FROM "dailylog" WHERE id = %s', (daily_log_id,))
-                                    current_date = cur.fetchone()[0]
-
-                                # Calculate date range
-                                from datetime import timedelta
-                                start_range = current_date - timedelta(days=30)
-                                end_range = current_date + timedelta(days=30)
-
-                                range_df = pd.read_sql_query('''
-                                    SELECT MIN(dl.date) as start_date, MAX(dl.date) as end_date, COUNT(*) as days
-                                    FROM "symptomlogentry" sle
-                                    JOIN "dailylog" dl ON sle.daily_log_id = dl.id
-                                    WHERE sle.symptom_id = %s
-                                    AND sle.time = '00:00'
-                                    AND sle.severity = %s
-                                    AND dl.date BETWEEN %s AND %s
-                                ''', conn, params=(int(symptom_id), int(row['severity']), start_range, end_range))
-
-                                if not range_df.empty and range_df.iloc[0]['days'] > 1:
-                                    start = range_df.iloc[0]['start_date']
-                                    end = range_df.iloc[0]['end_date']
-                                    days = range_df.iloc[0]['days']
-                                    time_display = f"Duration: {start.strftime('%b %d')} - {end.strftime('%b %d, %Y')} ({days} days)"
-                                else:
-                                    time_display = None
-                            except Exception as e:
-                                print(f"Error getting date range: {e}")
-                                time_display = None
-
-                        # Severity emoji mapping
-                        severity_emojis = {
-                            1: '', 2: '🙁', 3: '', 4: '😕', 5: '', 6: '😟', 7: '', 8: '😣', 9: '', 10: '😫'}
-                        severity_emoji = severity_emojis.get(
-                            row['severity'], '')
-
-                        # Build content components
-                        content_parts = []
-
-                        # Add severity
-                        if row['severity']:
-                            content_parts.append(
-                                html.Div([
-                                    html.Strong("Severity:", style={
-                                                'color': '#666', 'fontSize': '14px'}),
-                                    html.Span(f" {severity_emoji} {row['severity']}/10", style={
-                                              'fontSize': '16px', 'marginLeft': '8px'})
-                                ], style={'marginBottom': '12px'})
-                            )
+                            # Add severity
+                            if row['severity']:
+                                content_parts.append(
+                                    html.Div([
+                                        html.Strong("Severity:", style={
+                                                    'color': '#666', 'fontSize': '14px'}),
+                                        html.Span(f" {severity_emoji} {row['severity']}/10", style={
+                                                  'fontSize': '16px', 'marginLeft': '8px'})
+                                    ], style={'marginBottom': '12px'})
+                                )
 
-                        # Add time/duration only if it exists
-                        if time_display:
-                            content_parts.append(
-                                html.Div([
-                                    html.Strong(time_display, style={
-                                                'color': '#666', 'fontSize': '14px'})
-                                ], style={'marginBottom': '12px'})
-                            )
+                            # Add time/duration only if it exists
+                            if time_display:
+                                content_parts.append(
+                                    html.Div([
+                                        html.Strong(time_display, style={
+                                                    'color': '#666', 'fontSize': '14px'})
+                                    ], style={'marginBottom': '12px'})
+                                )
 
-                        # Only add notes section if notes exist
-                        if row['notes'] and row['notes'].strip():
-                            content_parts.append(
-                                html.Div([
-                                    html.Strong("Notes:", style={
-                                                'color': '#666', 'fontSize': '14px'}),
-                                    html.Div(row['notes'], style={
-                                             'marginTop': '4px', 'padding': '8px', 'backgroundColor': '#f8f9fa', 'borderRadius': '4px', 'fontSize': '14px'})
-                                ], style={'marginBottom': '16px'})
-                            )
+                            # Only add notes section if notes exist
+                            if row['notes'] and row['notes'].strip():
+                                content_parts.append(
+                                    html.Div([
+                                        html.Strong("Notes:", style={
+                                                    'color': '#666', 'fontSize': '14px'}),
+                                        html.Div(row['notes'], style={
+                                                 'marginTop': '4px', 'padding': '8px', 'backgroundColor': '#f8f9fa', 'borderRadius': '4px', 'fontSize': '14px'})
+                                    ], style={'marginBottom': '16px'})
+                                )
 
-                        details = {'content': html.Div([c for c in content_parts if c is not None], style={
-                                                       'padding': '8px'}), 'title': row['name'], 'entry_type': 'symptom', 'entry_id': entry_id, 'time': time_str, 'severity': int(row['severity'])}
-                    else:
-                        details = {'content': "Entry not found",
-                                   'title': 'Entry Details'}
-                conn.close()
+                            details = {'content': html.Div([c for c in content_parts if c is not None], style={
+                                                           'padding': '8px'}), 'title': row['name'], 'entry_type': 'symptom', 'entry_id': entry_id, 'time': time_str, 'severity': int(row['severity'])}
+                        else:
+                            details = {'content': "Entry not found",
+                                       'title': 'Entry Details'}
                 # Return with dynamic title and delete button in title row
                 if isinstance(details, dict) and 'entry_type' in details:
                     title_row = html.Div([
@@ -1268,8 +1278,7 @@ def delete_entry(delete_clicks, user_id, current_refresh):
     entry_type = id_dict['entry_type']
     entry_id = id_dict['entry_id']
 
-    conn = get_db_connection()
-    with conn.cursor() as cur:
+    with get_db_connection() as conn, conn.cursor() as cur:
         if entry_type == 'meal':
             cur.execute(
                 'DELETE FROM "foodlogentry" WHERE meal_id = %s AND daily_log_id IN (SELECT id FROM "dailylog" WHERE user_id = %s)',
@@ -1283,11 +1292,11 @@ def delete_entry(delete_clicks, user_id, current_refresh):
                 'DELETE FROM "symptomlogentry" WHERE id = %s AND daily_log_id IN (SELECT id FROM "dailylog" WHERE user_id = %s)',
                 (entry_id, user_id))
         conn.commit()
-    conn.close()
     
     # Invalidate user cache to reflect the deletion
     from backend.cache import invalidate_user_cache
     invalidate_user_cache(user_id)
+    invalidate_calendar_cache(user_id)
     
     return {'display': 'none'}, (current_refresh or 0) + 1
 
@@ -1331,8 +1340,7 @@ def handle_edit_mode(edit_clicks, save_clicks, cancel_clicks, edit_mode, entry_d
             severity_values) > 0 else None
 
         # Update database
-        conn = get_db_connection()
-        with conn.cursor() as cur:
+        with get_db_connection() as conn, conn.cursor() as cur:
             entry_type = entry_data.get('entry_type')
             entry_id = entry_data.get('entry_id')
 
@@ -1367,11 +1375,11 @@ def handle_edit_mode(edit_clicks, save_clicks, cancel_clicks, edit_mode, entry_d
                 # If no foods remain, the meal is deleted (handled by the delete cascade)
                 if remaining_count == 0:
                     conn.commit()
-                    conn.close()
                     
                     # Invalidate user cache to reflect the deletion
                     from backend.cache import invalidate_user_cache
                     invalidate_user_cache(entry_data.get('user_id'))
+                    invalidate_calendar_cache(entry_data.get('user_id'))
                     
                     # Close modal and refresh
                     return dash.no_update, False, {}, (refresh_data or 0) + 1
@@ -1395,11 +1403,11 @@ def handle_edit_mode(edit_clicks, save_clicks, cancel_clicks, edit_mode, entry_d
                         (int(new_severity), entry_id))
 
             conn.commit()
-        conn.close()
         
         # Invalidate user cache to reflect the update
         from backend.cache import invalidate_user_cache
         invalidate_user_cache(entry_data.get('user_id'))
+        invalidate_calendar_cache(entry_data.get('user_id'))
 
         # Update entry_data with new values
         if new_time:
@@ -1607,27 +1615,9 @@ def navigate_calendar(prev_clicks, next_clicks, today_clicks, current_date, view
 
     # Navigate based on view mode and button clicked
     if trigger_id == 'calendar-prev-btn':
-        if view_mode == 'day':
-            new_date = base_date - timedelta(days=1)
-        elif view_mode == 'week':
-            new_date = base_date - timedelta(weeks=1)
-        else:  # month
-            # Go to previous month
-            if base_date.month == 1:
-                new_date = date(base_date.year - 1, 12, 1)
-            else:
-                new_date = date(base_date.year, base_date.month - 1, 1)
+        new_date = shift_date(view_mode, base_date, -1)
     elif trigger_id == 'calendar-next-btn':
-        if view_mode == 'day':
-            new_date = base_date + timedelta(days=1)
-        elif view_mode == 'week':
-            new_date = base_date + timedelta(weeks=1)
-        else:  # month
-            # Go to next month
-            if base_date.month == 12:
-                new_date = date(base_date.year + 1, 1, 1)
-            else:
-                new_date = date(base_date.year, base_date.month + 1, 1)
+        new_date = shift_date(view_mode, base_date, 1)
     else:
         return dash.no_update
 
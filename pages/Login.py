@@ -82,12 +82,10 @@ layout = html.Div([
 def login(n_clicks, username, password):
     if n_clicks > 0 and username and password:
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cur:
+            with get_db_connection() as conn, conn.cursor() as cur:
                 cur.execute(
                     'SELECT id FROM "user" WHERE username = %s AND password = %s', (username, password))
                 user = cur.fetchone()
-            conn.close()
             if user:
                 user_id = user[0]
                 # Pre-load user data into cache for fast subsequent access
@@ -115,12 +113,10 @@ def login(n_clicks, username, password):
 def signup(n_clicks, username, email, password):
     if n_clicks > 0 and username and email and password:
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cur:
+            with get_db_connection() as conn, conn.cursor() as cur:
                 cur.execute('INSERT INTO "user" (username, email, password) VALUES (%s, %s, %s)',
                             (username, email, password))
                 conn.commit()
-            conn.close()
             return "Account created successfully! Please login."
         except psycopg2.IntegrityError:
             return "Username already exists"
@@ -62,11 +62,9 @@ layout = html.Div([
 def load_user_settings(user_id):
     if not user_id:
         return "", ""
-    conn = get_db_connection()
-    with conn.cursor() as cur:
+    with get_db_connection() as conn, conn.cursor() as cur:
         cur.execute('SELECT username, email FROM "user" WHERE id = %s', (user_id,))
         user = cur.fetchone()
-    conn.close()
     if user:
         return user[0], user[1]
     return "", ""
@@ -85,8 +83,7 @@ def save_user_settings(n_clicks, username, email, password, user_id):
     if not user_id:
         return "Please log in to save settings."
     if n_clicks > 0 and username:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
+        with get_db_connection() as conn, conn.cursor() as cur:
             # Update user with or without password
             if password and password.strip():
                 # Update with new password
@@ -97,7 +94,6 @@ def save_user_settings(n_clicks, username, email, password, user_id):
                 cur.execute('UPDATE "user" SET username = %s, email = %s WHERE id = %s',
                           (username, email, user_id))
             conn.commit()
-        conn.close()
         return "✓ Settings saved!"
     return ""
 
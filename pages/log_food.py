@@ -3,7 +3,15 @@ from dash import html, dcc, Input, Output, State, callback, ALL
 import psycopg2
 import pandas as pd
 from datetime import datetime
-from backend.utils import get_db_connection
+from backend.utils import get_db_connection, fetchone_dict
+from backend.search import (search_foods, search_page, count_matches, trigram_available,
+                            invalidate_search_cache)
+from backend.settings import (FOOD_SEARCH_PAGE_SIZE, FOOD_SEARCH_COUNT_LIMIT,
+                              FOOD_SUGGESTION_LIMIT, FOOD_SUGGESTION_MIN_CHARS)
+from backend.food_index import get_food_index, food_added
+from backend.ingredient_bitmap import has_ingredients, set_has_ingredients, preload_ingredient_bitmap
+from backend.ingredient_names import refresh_food_ingredient_sets
+from backend.calendar_cache import invalidate_calendar_cache
 
 dash.register_page(__name__, path='/log-food', order=2)
 
@@ -18,6 +26,7 @@ layout = html.Div([
                 html.Button('Search', id='food-search-btn',
                             n_clicks=0, style={'width': '100px'})
             ], style={'display': 'flex', 'alignItems': 'center', 'marginBottom': '16px'}),
+            html.Ul(id='food-suggestions', style={'listStyle': 'none', 'padding': '0', 'margin': '0 0 16px 0'}),
             dcc.Loading(
                 id='loading-search-results',
                 type='circle',
@@ -68,9 +77,7 @@ layout = html.Div([
     ], style={'maxWidth': '1000px', 'margin': '0 auto', 'padding': '24px'}),
 
     dcc.Store(id='selected-foods', data=[]),
-    dcc.Store(id='search-results', data=[]),
-    dcc.Store(id='current-page', data=1),
-    dcc.Store(id='total-pages', data=1),
+    dcc.Store(id='search-state', data=None),
     dcc.Store(id='viewed-ingredients', data=None),
     dcc.Store(id='saved-meal-fdc', data=None),
     dcc.Store(id='add-entry-click-data', data={}, storage_type='session'),
@@ -88,6 +95,11 @@ def populate_from_url_params(pathname, search):
     """Populate date and time from URL query parameters when first loading the page"""
     print(f"DEBUG log_food: pathname={pathname}, URL search params: {search}")
 
+    if pathname == '/log-food':
+        # Start loading the type-ahead index and ingredient bitmap in the background
+        get_food_index()
+        preload_ingredient_bitmap()
+
     # Only process if we're on the log-food page and have URL params
     if pathname == '/log-food' and search:
         from urllib.parse import parse_qs
@@ -105,39 +117,33 @@ def populate_from_url_params(pathname, search):
     return dash.no_update, dash.no_update
 
 
-def create_paginated_table(results, current_page, total_pages, viewed_ingredients=None):
-    start_idx = (current_page - 1) * 10
-    end_idx = start_idx + 10
-    page_results = results[start_idx:end_idx]
+def new_search_state(query):
+    """Search state kept in the browser: the query and one cursor per visited page"""
+    trigram = trigram_available()
+    return {'query': query, 'trigram': trigram, 'total': count_matches(query, use_trigram=trigram),
+            'cursors': [None], 'next': None}
 
-    # Get all fdc_ids for this page and check which have ingredients in ONE query
-    fdc_ids = [row['fdc_id'] for row in page_results]
-    foods_with_ingredients = set()
 
-    if fdc_ids:
-        try:
-            conn = get_db_connection()
-            placeholders = ', '.join(['%s'] * len(fdc_ids))
-            with conn.cursor() as cur:
-                cur.execute(
-                    f'SELECT DISTINCT fdc_id FROM "ingredient" WHERE fdc_id IN ({placeholders})',
-                    fdc_ids
-                )
-                foods_with_ingredients = {row[0] for row in cur.fetchall()}
-            conn.close()
-        except psycopg2.Error:
-            pass
+def load_search_page(state):
+    """Fetch the current page; returns its rows and the state with the next-page cursor"""
+    page, next_cursor = search_page(state['query'], after=state['cursors'][-1],
+                                    use_trigram=state['trigram'])
+    return page.to_dict('records'), {**state, 'next': next_cursor}
+
+
+def create_paginated_table(page_results, state, viewed_ingredients=None):
+    current_page = len(state['cursors'])
+    total = state['total']
+    total_text = f"{total}+" if total >= FOOD_SEARCH_COUNT_LIMIT else str(total)
 
     # Create table with add and view ingredients buttons
     table_rows = []
     for row in page_results:
-        has_ingredients = row['fdc_id'] in foods_with_ingredients
-
         buttons = [html.Button('Add to Meal', id={
                                'type': 'add-to-meal', 'fdc_id': row['fdc_id']}, n_clicks=0,
                                className='btn-primary',
                                style={'padding': '6px 12px', 'fontSize': '13px'})]
-        if has_ingredients:
+        if row['has_ingredients']:
             button_text = 'Hide Ingredients' if viewed_ingredients == row[
                 'fdc_id'] else 'View Ingredients'
             buttons.append(html.Button(button_text, id={
@@ -163,19 +169,23 @@ def create_paginated_table(results, current_page, total_pages, viewed_ingredient
 
     # Pagination controls
     pagination_controls = []
-    if total_pages > 1:
+    if current_page > 1 or state['next'] is not None:
         prev_disabled = current_page <= 1
-        next_disabled = current_page >= total_pages
+        next_disabled = state['next'] is None
+        total_pages = -(-total // FOOD_SEARCH_PAGE_SIZE)
+        page_text = f"Page {current_page}" if total >= FOOD_SEARCH_COUNT_LIMIT \
+            else f"Page {current_page} of {total_pages}"
 
         pagination_controls.append(html.Button(
             'Previous', id='prev-page-btn', n_clicks=0, disabled=prev_disabled))
         pagination_controls.append(
-            html.Span(f"Page {current_page} of {total_pages}", style={'margin': '0 10px'}))
+            html.Span(page_text, style={'margin': '0 10px'}))
         pagination_controls.append(html.Button(
             'Next', id='next-page-btn', n_clicks=0, disabled=next_disabled))
 
+    first = (current_page - 1) * FOOD_SEARCH_PAGE_SIZE + 1
     content = [
-        html.Div(f"Showing {len(page_results)} of {len(results)} results", style={
+        html.Div(f"Showing {first}-{first + len(page_results) - 1} of {total_text} results", style={
                  'marginBottom': '10px'}),
         table,
         html.Div(pagination_controls, style={
@@ -185,15 +195,15 @@ def create_paginated_table(results, current_page, total_pages, viewed_ingredient
     # Add ingredients if viewing them
     if viewed_ingredients:
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cur:
+            with get_db_connection() as conn, conn.cursor() as cur:
                 cur.execute(
                     'SELECT description FROM "food" WHERE fdc_id = %s', (viewed_ingredients,))
                 food_desc = cur.fetchone()
                 if food_desc:
                     food_desc = food_desc[0]
                     cur.execute(
-                        'SELECT ingredient FROM "ingredient" WHERE fdc_id = %s ORDER BY ingredient', (viewed_ingredients,))
+                        'SELECT n.name FROM "ingredient" i JOIN "ingredient_name" n ON n.id = i.name_id '
+                        'WHERE i.fdc_id = %s ORDER BY n.name', (viewed_ingredients,))
                     ingredients = cur.fetchall()
                     if ingredients:
                         ingredients_list = [html.Li(row[0])
@@ -202,7 +212,6 @@ def create_paginated_table(results, current_page, total_pages, viewed_ingredient
                             html.H4(f"Ingredients for: {food_desc}"),
                             html.Ul(ingredients_list)
                         ])
-            conn.close()
         except psycopg2.Error as e:
             content.append(html.Div(f"Database error: {e}"))
 
@@ -229,8 +238,7 @@ def save_combination_to_database(n_clicks, meal_name, selected_foods):
         meal_name = meal_name.strip()
 
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cur:
+            with get_db_connection() as conn, conn.cursor() as cur:
                 # Check if a food with this name already exists
                 cur.execute(
                     'SELECT fdc_id FROM "food" WHERE description = %s', (meal_name,))
@@ -239,13 +247,12 @@ def save_combination_to_database(n_clicks, meal_name, selected_foods):
                 if existing:
                     return f"⚠️ A food item named '{meal_name}' already exists in the database.", dash.no_update, dash.no_update
 
-                # Collect all ingredients from selected foods
-                ingredients = set()
-                for item in selected_foods:
-                    if isinstance(item, dict) and 'fdc_id' in item:
-                        cur.execute(
-                            'SELECT ingredient FROM "ingredient" WHERE fdc_id = %s', (item['fdc_id'],))
-                        ingredients.update([row[0] for row in cur.fetchall()])
+                # Collect all ingredients (name ids) from selected foods
+                fdc_ids = [item['fdc_id'] for item in selected_foods
+                           if isinstance(item, dict) and 'fdc_id' in item]
+                cur.execute(
+                    'SELECT DISTINCT name_id FROM "ingredient" WHERE fdc_id = ANY(%s)', (fdc_ids,))
+                ingredients = [row[0] for row in cur.fetchall()]
 
                 # Create new food entry
                 cur.execute(
@@ -254,14 +261,18 @@ def save_combination_to_database(n_clicks, meal_name, selected_foods):
                 meal_fdc_id = cur.fetchone()[0]
 
                 # Add ingredients to the new food
-                for ing in ingredients:
+                for name_id in ingredients:
                     cur.execute(
-                        'INSERT INTO "ingredient" (fdc_id, ingredient) VALUES (%s, %s)',
-                        (meal_fdc_id, ing))
+                        'INSERT INTO "ingredient" (fdc_id, name_id) VALUES (%s, %s)',
+                        (meal_fdc_id, name_id))
+                refresh_food_ingredient_sets(cur, [meal_fdc_id])
 
                 conn.commit()
-            conn.close()
 
+            food_added(meal_fdc_id, meal_name, 'Meal')
+            if ingredients:
+                set_has_ingredients(meal_fdc_id)
+            invalidate_search_cache()
             return f"✓ '{meal_name}' saved to database successfully!", meal_fdc_id, ""
 
         except psycopg2.Error as e:
@@ -271,66 +282,85 @@ def save_combination_to_database(n_clicks, meal_name, selected_foods):
 
 
 @callback(
-    Output('search-results', 'data'),
-    Output('current-page', 'data'),
-    Output('total-pages', 'data'),
+    Output('search-state', 'data'),
     Output('food-search-results', 'children'),
     Input('food-search-btn', 'n_clicks'),
     State('food-search-input', 'value'),
     prevent_initial_call=True
 )
 def search_foods_for_log(n_clicks, query):
+    query = (query or '').strip()
     if not query:
-        return [], 1, 1, "Enter a search term and click Search."
+        return None, "Enter a search term and click Search."
 
     try:
-        conn = get_db_connection()
-        sql = '''
-            SELECT fdc_id, description, category
-            FROM "food"
-            WHERE description ILIKE %s
-            ORDER BY description
-        '''
-        df = pd.read_sql_query(sql, conn, params=(f'%{query}%',))
-        conn.close()
-
-        if df.empty:
-            return [], 1, 1, "No foods found."
-
-        results = df.to_dict('records')
-        total_pages = (len(results) + 9) // 10
-
-        return results, 1, total_pages, create_paginated_table(results, 1, total_pages, viewed_ingredients=None)
+        state = new_search_state(query)
+        if not state['total']:
+            return None, "No foods found."
+
+        page_results, state = load_search_page(state)
+        return state, create_paginated_table(page_results, state, viewed_ingredients=None)
     except psycopg2.Error as e:
-        return [], 1, 1, f"Database error: {e}"
+        return None, f"Database error: {e}"
 
 
 @callback(
-    Output('current-page', 'data', allow_duplicate=True),
+    Output('food-suggestions', 'children'),
+    Input('food-search-input', 'value'),
+    prevent_initial_call=True
+)
+def suggest_foods(query):
+    """Type-ahead: top matches from the in-process food index on every keystroke"""
+    query = (query or '').strip()
+    if len(query) < FOOD_SUGGESTION_MIN_CHARS:
+        return []
+
+    index = get_food_index()
+    if index is not None:
+        suggestions = index.search(query, FOOD_SUGGESTION_LIMIT)
+    else:
+        # Index still loading; ask the database this time
+        try:
+            suggestions = search_foods(query, limit=FOOD_SUGGESTION_LIMIT).to_dict('records')
+        except psycopg2.Error:
+            return []
+
+    return [html.Li([
+        html.Button('+', id={'type': 'add-suggestion', 'fdc_id': food['fdc_id']}, n_clicks=0,
+                    style={'padding': '2px 8px', 'marginRight': '8px', 'fontSize': '13px'}),
+        html.Span(food['description']),
+        html.Span(f"  {food['category']}" if food['category'] else '',
+                  style={'color': '#888', 'fontSize': '12px'}),
+    ], style={'padding': '4px 0'}) for food in suggestions]
+
+
+@callback(
+    Output('search-state', 'data', allow_duplicate=True),
     Output('food-search-results', 'children', allow_duplicate=True),
     Input('prev-page-btn', 'n_clicks'),
     Input('next-page-btn', 'n_clicks'),
-    State('current-page', 'data'),
-    State('total-pages', 'data'),
-    State('search-results', 'data'),
+    State('search-state', 'data'),
     State('viewed-ingredients', 'data'),
     prevent_initial_call=True
 )
-def handle_pagination(prev_clicks, next_clicks, current_page, total_pages, results, viewed_ingredients):
+def handle_pagination(prev_clicks, next_clicks, state, viewed_ingredients):
     ctx = dash.callback_context
-    if not ctx.triggered or not results:
-        return current_page, create_paginated_table(results, current_page, total_pages, viewed_ingredients)
+    if not ctx.triggered or not ctx.triggered[0]['value'] or not state:
+        return dash.no_update, dash.no_update
 
     triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    cursors = state['cursors']
 
-    if triggered_id == 'prev-page-btn' and current_page > 1:
-        new_page = current_page - 1
-    elif triggered_id == 'next-page-btn' and current_page < total_pages:
-        new_page = current_page + 1
-    else:
-        new_page = current_page
+    if triggered_id == 'prev-page-btn' and len(cursors) > 1:
+        cursors = cursors[:-1]
+    elif triggered_id == 'next-page-btn' and state['next'] is not None:
+        cursors = cursors + [state['next']]
 
-    return new_page, create_paginated_table(results, new_page, total_pages, viewed_ingredients)
+    try:
+        page_results, state = load_search_page({**state, 'cursors': cursors})
+    except psycopg2.Error as e:
+        return dash.no_update, f"Database error: {e}"
+    return state, create_paginated_table(page_results, state, viewed_ingredients)
 
 
 @callback(
@@ -340,16 +370,16 @@ def handle_pagination(prev_clicks, next_clicks, current_page, total_pages, resul
     Output('food-search-results', 'children', allow_duplicate=True),
     Input({'type': 'add-to-meal', 'fdc_id': ALL}, 'n_clicks'),
     Input({'type': 'view-ingredients', 'fdc_id': ALL}, 'n_clicks'),
+    Input({'type': 'add-suggestion', 'fdc_id': ALL}, 'n_clicks'),
     State({'type': 'add-to-meal', 'fdc_id': ALL}, 'id'),
     State({'type': 'view-ingredients', 'fdc_id': ALL}, 'id'),
+    State({'type': 'add-suggestion', 'fdc_id': ALL}, 'id'),
     State('selected-foods', 'data'),
     State('viewed-ingredients', 'data'),
-    State('search-results', 'data'),
-    State('current-page', 'data'),
-    State('total-pages', 'data'),
+    State('search-state', 'data'),
     prevent_initial_call=True
 )
-def handle_food_actions(add_clicks, view_clicks, add_ids, view_ids, selected, viewed_ingredients, results, current_page, total_pages):
+def handle_food_actions(add_clicks, view_clicks, suggestion_clicks, add_ids, view_ids, suggestion_ids, selected, viewed_ingredients, search_state):
     ctx = dash.callback_context
     if not ctx.triggered:
         return dash.no_update, dash.no_update, dash.no_update, dash.no_update
@@ -372,21 +402,21 @@ def handle_food_actions(add_clicks, view_clicks, add_ids, view_ids, selected, vi
     selected_changed = False
     viewed_changed = False
 
-    if button_type == 'add-to-meal':
+    if button_type in ('add-to-meal', 'add-suggestion'):
+        ids, clicks = (add_ids, add_clicks) if button_type == 'add-to-meal' else (
+            suggestion_ids, suggestion_clicks)
         idx = None
-        for i, id_dict in enumerate(add_ids):
+        for i, id_dict in enumerate(ids):
             if id_dict.get('type') == button_type and id_dict.get('fdc_id') == fdc_id:
                 idx = i
                 break
-        if fdc_id is not None and idx is not None and add_clicks[idx] > 0:
+        if fdc_id is not None and idx is not None and clicks[idx] > 0:
             if not any(item.get('fdc_id') == fdc_id for item in selected if isinstance(item, dict)):
                 try:
-                    conn = get_db_connection()
-                    with conn.cursor() as cur:
+                    with get_db_connection() as conn, conn.cursor() as cur:
                         cur.execute(
                             'SELECT description FROM "food" WHERE fdc_id = %s', (fdc_id,))
                         desc = cur.fetchone()
-                    conn.close()
                     if desc:
                         description = desc[0]
                     else:
@@ -408,6 +438,12 @@ def handle_food_actions(add_clicks, view_clicks, add_ids, view_ids, selected, vi
     if not selected_changed and not viewed_changed:
         return dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
+    selected_ids = [item['fdc_id'] for item in selected if isinstance(item, dict) and 'fdc_id' in item]
+    try:
+        with_ingredients = dict(zip(selected_ids, has_ingredients(selected_ids)))
+    except psycopg2.Error:
+        with_ingredients = {}
+
     foods_list = []
     for item in selected:
         if isinstance(item, dict) and 'description' in item and 'fdc_id' in item:
@@ -415,16 +451,7 @@ def handle_food_actions(add_clicks, view_clicks, add_ids, view_ids, selected, vi
                 html.Button('Remove', id={
                     'type': 'remove-from-meal', 'fdc_id': item['fdc_id']}, n_clicks=0, style={'marginLeft': '10px'})
             ]
-            try:
-                conn = get_db_connection()
-                with conn.cursor() as cur:
-                    cur.execute(
-                        'SELECT COUNT(*) FROM "ingredient" WHERE fdc_id = %s', (item['fdc_id'],))
-                    has_ingredients = cur.fetchone()[0] > 0
-                conn.close()
-            except psycopg2.Error:
-                has_ingredients = False
-            if has_ingredients:
+            if with_ingredients.get(item['fdc_id']):
                 button_text = 'View Ingredients'
                 buttons.append(html.Button(button_text, id={
                     'type': 'view-ingredients-meal', 'fdc_id': item['fdc_id']}, n_clicks=0, style={'marginLeft': '10px'}))
@@ -433,9 +460,13 @@ def handle_food_actions(add_clicks, view_clicks, add_ids, view_ids, selected, vi
                 *buttons
             ]))
 
-    if viewed_changed:
-        table = create_paginated_table(
-            results, current_page, total_pages, viewed_ingredients)
+    if viewed_changed and search_state:
+        try:
+            page_results, _ = load_search_page(search_state)
+            table = create_paginated_table(
+                page_results, search_state, viewed_ingredients)
+        except psycopg2.Error as e:
+            table = f"Database error: {e}"
     else:
         table = dash.no_update
 
@@ -512,8 +543,7 @@ def save_meal(n_clicks, selected_foods, user_id, meal_date, meal_time, saved_mea
             date = logged_time.date()
             time = logged_time.strftime('%H:%M')
 
-            conn = get_db_connection()
-            with conn.cursor() as cur:
+            with get_db_connection() as conn, conn.cursor() as cur:
                 cur.execute(
                     'INSERT INTO "dailylog" (user_id, date) VALUES (%s, %s) ON CONFLICT (user_id, date) DO NOTHING', (user_id, date))
                 cur.execute(
@@ -526,25 +556,27 @@ def save_meal(n_clicks, selected_foods, user_id, meal_date, meal_time, saved_mea
                 meal_id = (max_meal_id + 1) if max_meal_id is not None else 1
 
                 # If a saved meal fdc_id exists, log that instead of individual foods
-                if saved_meal_fdc:
-                    cur.execute('INSERT INTO "foodlogentry" (daily_log_id, fdc_id, time, notes, meal_id) VALUES (%s, %s, %s, %s, %s)',
-                                (daily_log_id, saved_meal_fdc, time, meal_notes, meal_id))
-                else:
-                    # Log individual foods
-                    for item in selected_foods:
-                        if isinstance(item, dict) and 'fdc_id' in item:
-                            cur.execute('INSERT INTO "foodlogentry" (daily_log_id, fdc_id, time, notes, meal_id) VALUES (%s, %s, %s, %s, %s)',
-                                        (daily_log_id, item['fdc_id'], time, meal_notes, meal_id))
+                fdc_ids = [saved_meal_fdc] if saved_meal_fdc else [
+                    item['fdc_id'] for item in selected_foods if isinstance(item, dict) and 'fdc_id' in item]
+                new_entries = []
+                for fdc_id in fdc_ids:
+                    cur.execute('INSERT INTO "foodlogentry" (daily_log_id, fdc_id, time, notes, meal_id) VALUES (%s, %s, %s, %s, %s) '
+                                'RETURNING id, daily_log_id, meal_id, fdc_id, time, notes',
+                                (daily_log_id, fdc_id, time, meal_notes, meal_id))
+                    new_entries.append(fetchone_dict(cur, date=date))
                 conn.commit()
-            conn.close()
-            
-            # Invalidate user cache so fresh data is loaded next time
-            from backend.cache import invalidate_user_cache
-            invalidate_user_cache(user_id)
-            
-            return f"Meal saved with {len(selected_foods)} foods!", [], []
         except psycopg2.Error as e:
             return f"Database error: {e}", selected_foods, []
+
+        # Saved: push the new rows into the user cache instead of reloading
+        # everything, and refresh the calendar. Both only warn on failure
+        from backend.cache import append_user_rows
+        append_user_rows(user_id,
+                         daily_logs=[{'id': daily_log_id, 'date': date, 'user_id': user_id}],
+                         food_log_entries=new_entries)
+        invalidate_calendar_cache(user_id)
+
+        return f"Meal saved with {len(selected_foods)} foods!", [], []
     return "", selected_foods, []
 
 
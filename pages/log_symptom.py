@@ -2,7 +2,8 @@ import dash
 from dash import html, dcc, Input, Output, State, callback
 import psycopg2
 from datetime import datetime
-from backend.utils import get_db_connection
+from backend.utils import get_db_connection, fetchone_dict
+from backend.calendar_cache import invalidate_calendar_cache
 
 
 @callback(
@@ -41,15 +42,13 @@ def populate_from_url_params(pathname, search):
     prevent_initial_call=True
 )
 def update_symptom_options(search_value, current_value):
-    conn = get_db_connection()
-    with conn.cursor() as cur:
+    with get_db_connection() as conn, conn.cursor() as cur:
         if search_value:
             cur.execute(
                 'SELECT name FROM "symptom" WHERE name ILIKE %s ORDER BY name', (f'%{search_value}%',))
         else:
             cur.execute('SELECT name FROM "symptom" ORDER BY name LIMIT 50')
         symptoms = cur.fetchall()
-    conn.close()
 
     options = [{"label": s[0], "value": s[0]} for s in symptoms]
 
@@ -78,12 +77,10 @@ def show_symptom_info(symptom_value):
 
     # Check if symptom exists in database
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
+        with get_db_connection() as conn, conn.cursor() as cur:
             cur.execute(
                 'SELECT name FROM "symptom" WHERE name = %s', (symptom_value,))
             exists = cur.fetchone() is not None
-        conn.close()
 
         if exists:
             return "✓ Existing symptom"
@@ -265,8 +262,7 @@ def save_symptom(n_clicks, symptom_name, severity, start_date, end_date, time, n
             # Convert symptom name to Title Case
             symptom_name = symptom_name.strip().title()
 
-            conn = get_db_connection()
-            with conn.cursor() as cur:
+            with get_db_connection() as conn, conn.cursor() as cur:
                 cur.execute(
                     'INSERT INTO "symptom" (name) VALUES (%s) ON CONFLICT (name) DO NOTHING', (symptom_name,))
                 cur.execute(
@@ -289,6 +285,7 @@ def save_symptom(n_clicks, symptom_name, severity, start_date, end_date, time, n
 
                         current_date = start
                         entries_created = 0
+                        new_logs, new_entries = [], []
 
                         while current_date <= end:
                             cur.execute(
@@ -301,20 +298,21 @@ def save_symptom(n_clicks, symptom_name, severity, start_date, end_date, time, n
 
                             # Use 00:00 for date range entries
                             cur.execute(
-                                'INSERT INTO "symptomlogentry" (daily_log_id, symptom_id, time, severity, notes) VALUES (%s, %s, %s, %s, %s)',
+                                'INSERT INTO "symptomlogentry" (daily_log_id, symptom_id, time, severity, notes) VALUES (%s, %s, %s, %s, %s) '
+                                'RETURNING id, daily_log_id, symptom_id, time, severity, notes',
                                 (daily_log_id, symptom_id, '00:00', severity, notes))
+                            new_entries.append(fetchone_dict(
+                                cur, date=current_date, symptom_name=symptom_name))
+                            new_logs.append(
+                                {'id': daily_log_id, 'date': current_date, 'user_id': user_id})
 
                             entries_created += 1
                             current_date += timedelta(days=1)
 
                         conn.commit()
-                        
-                        # Invalidate user cache so fresh data is loaded next time
-                        from backend.cache import invalidate_user_cache
-                        invalidate_user_cache(user_id)
-                        
+
                         days_text = "day" if entries_created == 1 else "days"
-                        return f"✓ Symptom '{symptom_name}' logged for {entries_created} {days_text}!"
+                        message = f"✓ Symptom '{symptom_name}' logged for {entries_created} {days_text}!"
 
                     except Exception as e:
                         return f"⚠️ Error processing date range: {e}"
@@ -341,17 +339,21 @@ def save_symptom(n_clicks, symptom_name, severity, start_date, end_date, time, n
                     daily_log_id = cur.fetchone()[0]
 
                     cur.execute(
-                        'INSERT INTO "symptomlogentry" (daily_log_id, symptom_id, time, severity, notes) VALUES (%s, %s, %s, %s, %s)',
+                        'INSERT INTO "symptomlogentry" (daily_log_id, symptom_id, time, severity, notes) VALUES (%s, %s, %s, %s, %s) '
+                        'RETURNING id, daily_log_id, symptom_id, time, severity, notes',
                         (daily_log_id, symptom_id, symptom_time, severity, notes))
+                    new_entries = [fetchone_dict(
+                        cur, date=symptom_date, symptom_name=symptom_name)]
+                    new_logs = [{'id': daily_log_id, 'date': symptom_date, 'user_id': user_id}]
                     conn.commit()
-                    
-                    # Invalidate user cache so fresh data is loaded next time
-                    from backend.cache import invalidate_user_cache
-                    invalidate_user_cache(user_id)
-                    
-                    return f"✓ Symptom '{symptom_name}' logged!"
-
-            conn.close()
+                    message = f"✓ Symptom '{symptom_name}' logged!"
         except psycopg2.Error as e:
             return f"⚠️ Database error: {e}"
+
+        # Saved: push the new rows into the user cache and refresh the calendar.
+        # Both only warn on failure, so they can't turn the save into an error
+        from backend.cache import append_user_rows
+        append_user_rows(user_id, daily_logs=new_logs, symptom_log_entries=new_entries)
+        invalidate_calendar_cache(user_id)
+        return message
     return ""
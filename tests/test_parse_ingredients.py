@@ -0,0 +1,161 @@
+"""
+Expected output of backend/utils.parse_ingredients_uncached for ingredient
+statements as they appear in branded_food.csv, including the parser's known
+quirks (unbalanced brackets, "OR" left over from a stripped disclaimer), so
+any change to what it returns shows up here.
+"""
+import pytest
+
+from backend.utils import parse_ingredients_uncached as parse_ingredients
+
+GOLDEN = [
+    ('Ingredients: Enriched Flour (Wheat Flour, Niacin, Reduced Iron, Thiamine Mononitrate, '
+     'Riboflavin, Folic Acid), Sugar, Soybean Oil, Contains 2% or Less of: Salt, Baking Soda.',
+     [('ENRICHED FLOUR', ['WHEAT FLOUR', 'NIACIN', 'REDUCED IRON', 'THIAMINE MONONITRATE',
+                          'RIBOFLAVIN', 'FOLIC ACID']),
+      ('SUGAR', []), ('SOYBEAN OIL', []), ('OR  SALT', []), ('BAKING SODA', [])]),
+    ('WATER, SUGAR, APPLE JUICE CONCENTRATE, CITRIC ACID, NATURAL FLAVOR, VITAMIN C (ASCORBIC ACID).',
+     [('WATER', []), ('SUGAR', []), ('APPLE JUICE CONCENTRATE', []), ('CITRIC ACID', []),
+      ('NATURAL FLAVOR', []), ('VITAMIN C', ['ASCORBIC ACID'])]),
+    ('MILK CHOCOLATE (SUGAR, COCOA BUTTER, CHOCOLATE, SKIM MILK, LACTOSE, MILKFAT, SOY LECITHIN, '
+     'PGPR, EMULSIFIER, VANILLIN, ARTIFICIAL FLAVOR), PEANUTS, CORN SYRUP, SALT. MAY CONTAIN TREE NUTS.',
+     [('MILK CHOCOLATE', ['SUGAR', 'COCOA BUTTER', 'CHOCOLATE', 'SKIM MILK', 'LACTOSE', 'MILKFAT',
+                          'SOY LECITHIN', 'PGPR', 'EMULSIFIER', 'VANILLIN', 'ARTIFICIAL FLAVOR']),
+      ('PEANUTS', []), ('CORN SYRUP', []), ('SALT', [])]),
+    ('CHICKEN BREAST WITH RIB MEAT, WATER, SEASONING (SALT, SPICES, DEHYDRATED GARLIC), SODIUM PHOSPHATES. '
+     'CONTAINING UP TO 15% OF A SOLUTION OF WATER, SALT, SODIUM PHOSPHATES.',
+     [('CHICKEN BREAST WITH RIB MEAT', []), ('WATER', []),
+      ('SEASONING', ['SALT', 'SPICES', 'DEHYDRATED GARLIC']), ('SODIUM PHOSPHATES', []),
+      ('SALT', []), ('SODIUM PHOSPHATES', [])]),
+    ('CULTURED PASTEURIZED GRADE A NONFAT MILK, SUGAR, STRAWBERRIES, CONTAINS LESS THAN 1% OF: '
+     'PECTIN, NATURAL FLAVORS, BLACK CARROT JUICE CONCENTRATE (FOR COLOR).',
+     [('CULTURED PASTEURIZED GRADE A NONFAT MILK', []), ('SUGAR', []), ('STRAWBERRIES', []),
+      ('PECTIN', []), ('NATURAL FLAVORS', []), ('BLACK CARROT JUICE CONCENTRATE', [])]),
+    ('TOMATO PUREE (WATER, TOMATO PASTE), SOYBEAN OIL AND/OR CANOLA OIL, SALT, SPICES, ONION POWDER.',
+     [('TOMATO PUREE', ['WATER', 'TOMATO PASTE']), ('SOYBEAN OIL', []), ('CANOLA OIL', []),
+      ('SALT', []), ('SPICES', []), ('ONION POWDER', [])]),
+    ('INGREDIENTS: CHEESE [PASTEURIZED MILK, CHEESE CULTURE, SALT, ENZYMES, ANNATTO (COLOR)], '
+     'POTATO STARCH AND POWDERED CELLULOSE (TO PREVENT CAKING), NATAMYCIN (A NATURAL MOLD INHIBITOR).',
+     [('CHEESE', ['PASTEURIZED MILK', 'CHEESE CULTURE', 'SALT', 'ENZYMES', 'ANNATTO (COLOR)']),
+      ('POTATO STARCH AND POWDERED CELLULOSE', ['TO PREVENT CAKING']),
+      ('NATAMYCIN', ['A NATURAL MOLD INHIBITOR'])]),
+    ('PORK, WATER, SALT, SUGAR, SODIUM PHOSPHATE, SODIUM ERYTHORBATE, SODIUM NITRITE. '
+     'BASTED WITH UP TO 16% SOLUTION OF WATER AND SALT.',
+     [('PORK', []), ('WATER', []), ('SALT', []), ('SUGAR', []), ('SODIUM PHOSPHATE', []),
+      ('SODIUM ERYTHORBATE', []), ('SODIUM NITRITE', []), ('WATER', []), ('SALT', [])]),
+    ('MECHANICALLY SEPARATED CHICKEN, PORK, WATER, CORN SYRUP, CONTAINS 2% OR LESS OF SALT, '
+     'POTASSIUM LACTATE, SODIUM PHOSPHATES, FLAVORINGS.',
+     [('CHICKEN', []), ('PORK', []), ('WATER', []), ('CORN SYRUP', []), ('OR LESS OF SALT', []),
+      ('POTASSIUM LACTATE', []), ('SODIUM PHOSPHATES', []), ('FLAVORINGS', [])]),
+    ('Made from: Organic Rolled Oats, Organic Cane Sugar, Organic Sunflower Oil, Sea Salt.',
+     [('ORGANIC ROLLED OATS', []), ('ORGANIC CANE SUGAR', []), ('ORGANIC SUNFLOWER OIL', []),
+      ('SEA SALT', [])]),
+    ('ROASTED PEANUTS, SUGAR, HYDROGENATED VEGETABLE OILS (COTTONSEED, SOYBEAN AND RAPESEED) '
+     'TO PREVENT SEPARATION, SALT.',
+     [('ROASTED PEANUTS', []), ('SUGAR', []),
+      ('HYDROGENATED VEGETABLE OILS (COTTONSEED, SOYBEAN', []),
+      ('RAPESEED) TO PREVENT SEPARATION', []), ('SALT', [])]),
+    ('BREADED WITH: WHEAT FLOUR, WATER, YELLOW CORN FLOUR, SALT, SPICES. PREBROWNED IN VEGETABLE OIL.',
+     [(': WHEAT FLOUR', []), ('WATER', []), ('YELLOW CORN FLOUR', []), ('SALT', []),
+      ('SPICES', []), ('VEGETABLE OIL', [])]),
+    ('POTATOES, VEGETABLE OIL (CONTAINS ONE OR MORE OF THE FOLLOWING: CANOLA, CORN, COTTONSEED, '
+     'SOYBEAN OR SUNFLOWER OIL), SALT. CONTAINS: MILK.',
+     [('POTATOES', []),
+      ('VEGETABLE OIL', ['CONTAINS ONE', 'MORE OF THE FOLLOWING: CANOLA', 'CORN', 'COTTONSEED',
+                         'SOYBEAN', 'SUNFLOWER OIL']),
+      ('SALT', []), ('MILK', [])]),
+    ('WATER, CORN SYRUP, HIGH FRUCTOSE CORN SYRUP, LESS THAN 2% OF: CITRIC ACID, SODIUM BENZOATE '
+     '(ADDED AS A PRESERVATIVE), RED 40, BLUE 1.',
+     [('WATER', []), ('CORN SYRUP', []), ('HIGH FRUCTOSE CORN SYRUP', []),
+      ('LESS THAN 2% OF: CITRIC ACID', []), ('SODIUM BENZOATE', []), ('RED 40', []),
+      ('BLUE 1', [])]),
+    ('GROUND BEEF (NOT LESS THAN 80% LEAN). SOLUTION INGREDIENTS: WATER, SALT.',
+     [('GROUND BEEF', ['NOT LESS THAN 80% LEAN']), ('WATER', []), ('SALT', [])]),
+    ('SPICES, SALT, GARLIC, SILICON DIOXIDE (NOT MORE THAN 2% SILICON DIOXIDE ADDED TO PREVENT CAKING).',
+     [('SPICES', []), ('SALT', []), ('GARLIC', []), ('SILICON DIOXIDE', [])]),
+    ('CANOLA OIL, ROSEMARY EXTRACT (ADDED TO PROTECT FLAVOR), TOCOPHEROLS.',
+     [('CANOLA OIL', []), ('ROSEMARY EXTRACT', []), ('TOCOPHEROLS', [])]),
+    ('FLOUR, SUGAR, EGGS*, BUTTER*. *ORGANIC',
+     [('FLOUR', []), ('SUGAR', []), ('EGGS', []), ('BUTTER', []), ('ORGANIC', [])]),
+    ('ENRICHED MACARONI PRODUCT (DURUM WHEAT SEMOLINA, NIACIN, FERROUS SULFATE, THIAMIN MONONITRATE, '
+     'RIBOFLAVIN, FOLIC ACID), CHEESE SAUCE MIX (WHEY, MILKFAT, MILK PROTEIN CONCENTRATE, SALT, '
+     'SODIUM TRIPOLYPHOSPHATE, CONTAINS LESS THAN 2% OF CITRIC ACID, LACTIC ACID, SODIUM PHOSPHATE, '
+     'CALCIUM PHOSPHATE, YELLOW 5, YELLOW 6, ENZYMES, CHEESE CULTURE).',
+     [('ENRICHED MACARONI PRODUCT', ['DURUM WHEAT SEMOLINA', 'NIACIN', 'FERROUS SULFATE',
+                                     'THIAMIN MONONITRATE', 'RIBOFLAVIN', 'FOLIC ACID']),
+      ('CHEESE SAUCE MIX', ['WHEY', 'MILKFAT', 'MILK PROTEIN CONCENTRATE', 'SALT',
+                            'SODIUM TRIPOLYPHOSPHATE', 'CONTAINS LESS THAN 2% OF CITRIC ACID',
+                            'LACTIC ACID', 'SODIUM PHOSPHATE', 'CALCIUM PHOSPHATE', 'YELLOW 5',
+                            'YELLOW 6', 'ENZYMES', 'CHEESE CULTURE'])]),
+    ('Sugar, Palm Oil, Hazelnuts 13%, Skim Milk 8.7%, Fat-Reduced Cocoa 7.4%, Lecithin [Soy], Vanillin.',
+     [('SUGAR', []), ('PALM OIL', []), ('HAZELNUTS 13%', []), ('SKIM MILK 8', []), ('7%', []),
+      ('FAT-REDUCED COCOA 7', []), ('4%', []), ('LECITHIN', ['SOY']), ('VANILLIN', [])]),
+    ('WATER, SALT. CANADA GRADE A. MADE WITH SMILES',
+     [('WATER', []), ('SALT', [])]),
+    ('SEASONING INGREDIENTS: SALT, PAPRIKA, SPICE EXTRACTIVES. COATING INGREDIENTS: RICE FLOUR.',
+     [('SALT', []), ('PAPRIKA', []), ('SPICE EXTRACTIVES', []), ('RICE FLOUR', [])]),
+    ('WHEAT FLOUR, WATER, YEAST, CONTAINS UP TO 7% OF: SOYBEAN OIL, SALT, DOUGH CONDITIONERS '
+     '(SODIUM STEAROYL LACTYLATE, ASCORBIC ACID, ENZYMES)',
+     [('WHEAT FLOUR', []), ('WATER', []), ('YEAST', []), ('OF: SOYBEAN OIL', []), ('SALT', []),
+      ('DOUGH CONDITIONERS', ['SODIUM STEAROYL LACTYLATE', 'ASCORBIC ACID', 'ENZYMES'])]),
+    ('TURKEY, WATER, CONTAIN UP TO 18% SOLUTION OF WATER, SALT. IINGREDIENTS: SUGAR.',
+     [('TURKEY', []), ('WATER', []), ('SALT', []), ('SUGAR', [])]),
+    ('OATS, MADE WITH: HONEY, ALMONDS. EXCEPT FOR THE FOLLOWING, ALL INGREDIENTS ARE ORGANIC.',
+     [('OATS', []), ('HONEY', []), ('ALMONDS', [])]),
+    ('BEEF, BASTED NTE 16% ADDED SOLUTION OF WATER, SALT, 5% OR LESS OF THE FOLLOWING: SPICES.',
+     [('BEEF', []), ('WATER', []), ('SALT', []), ('SPICES', [])]),
+    ('CHEDDAR CHEESE ((PASTEURIZED MILK, SALT, ENZYMES), ANNATTO), CRACKERS [FLOUR (WHEAT), OIL]',
+     [('CHEDDAR CHEESE', ['(PASTEURIZED MILK, SALT, ENZYMES)', 'ANNATTO']),
+      ('CRACKERS', ['FLOUR (WHEAT)', 'OIL'])]),
+    ('SALT, SUGAR (CANE, BEET',
+     [('SALT', []), ('SUGAR (CANE, BEET', [])]),
+    ('PEANUTS), SALT, (OIL), [SOY]',
+     [('PEANUTS), SALT, (OIL),', ['SOY'])]),
+    ('DICED TOMATOES IN TOMATO JUICE, CONTAINS TRACES OF CELERY, MUSTARD\nAND SESAME',
+     [('DICED TOMATOES IN TOMATO JUICE', [])]),
+    ('FAT FREE MILK, SUGAR. ADDS A DIETARILY INSIGNIFICANT AMOUNT OF SATURATED FAT. '
+     'OF EACH OF THE FOLLOWING: VITAMIN A, VITAMIN D3.',
+     [('FAT FREE MILK', []), ('SUGAR', []), ('VITAMIN A', []), ('VITAMIN D3', [])]),
+    ('CHICKEN, WATER, BASTED WITH UP TO 16% ADDED SOLUTION OF CHICKEN BROTH, SALT. '
+     'CONTAINING UP TO 12% OF A SOLUTION OF WATER AND SALT.',
+     [('CHICKEN', []), ('WATER', []), ('CHICKEN BROTH', []), ('SALT', []), ('AND SALT', [])]),
+    ('', []),
+    ('   ', []),
+    ('WATER', [('WATER', [])]),
+]
+
+
+@pytest.mark.parametrize('statement, expected', GOLDEN)
+def test_golden(statement, expected):
+    assert parse_ingredients(statement) == expected
+
+
+def test_none():
+    assert parse_ingredients(None) == []
+
+
+@pytest.mark.parametrize('statement, expected', [
+    # The outer () or [] holds the subs; inner groups stay in the sub text
+    ('A (B (C, D), E)', [('A', ['B (C, D)', 'E'])]),
+    ('A [B [C], D (E)]', [('A', ['B [C]', 'D (E)'])]),
+    ('A ((B, C)), D', [('A', ['(B, C)']), ('D', [])]),
+    ('A [B (C, D)], E (F [G])', [('A', ['B (C, D)']), ('E', ['F [G]'])]),
+    # AND / OR split every sub, even inside a nested group
+    ('A (B AND C, D (E OR F))', [('A', ['B', 'C', 'D (E', 'F)'])]),
+])
+def test_nested_groups(statement, expected):
+    assert parse_ingredients(statement) == expected
+
+
+@pytest.mark.parametrize('statement, expected', [
+    ('SUGAR, SALT. MAY CONTAIN MILK, EGGS (AND SOY)', [('SUGAR', []), ('SALT', [])]),
+    ('may contain milk', []),
+    ('SALT, CONTAINS TRACES OF NUTS', [('SALT', [])]),
+    ('BEETS (FOR COLOR), SALT', [('BEETS', []), ('SALT', [])]),
+    ('CONTAINS: MILK, WHEAT', [('MILK', []), ('WHEAT', [])]),
+    ('INGREDIENTS: WATER', [('WATER', [])]),
+    ('WATER, INGREDIENTS: SALT', [('WATER', []), ('INGREDIENTS: SALT', [])]),
+    ('CONTAINS LESS THAN 2% OF: SALT, YEAST', [('SALT', []), ('YEAST', [])]),
+])
+def test_disclaimers(statement, expected):
+    assert parse_ingredients(statement) == expected